@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Response, status
+from fastapi.responses import ORJSONResponse
+
+from core.config import settings
+from services.signing_keys import signing_keys
+
+
+router = APIRouter()
+
+
+# /.well-known/jwks.json
+@router.get(
+    "/.well-known/jwks.json",
+    status_code=status.HTTP_200_OK,
+    summary="Открытые ключи подписи токенов (JWKS)",
+    description="Действующие и заранее опубликованные ключи; токен указывает свой ключ в kid",
+    tags=["Сервис"],
+)
+async def get_jwks() -> Response:
+    return ORJSONResponse(
+        content=signing_keys.jwks(),
+        headers={"Cache-Control": f"public, max-age={settings.jwks_max_age}"},
+    )
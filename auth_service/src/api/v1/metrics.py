@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from api.v1.service import check_jwt, is_superuser
+from core import metrics
+
+
+router = APIRouter()
+
+
+# /api/v1/metrics
+@router.get(
+    "",
+    status_code=status.HTTP_200_OK,
+    summary="Метрики сервиса",
+    description="Внутренние метрики воркера: пулы, кэши, фильтры. Только для суперпользователя",
+    tags=["Сервис"],
+)
+async def get_metrics(payload: dict = Depends(check_jwt)) -> dict:
+    # стоимость хеширования, пулы БД и реплики - сведения для атакующего
+    if not await is_superuser(payload):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This operation is forbidden for you",
+        )
+    return metrics.collect()
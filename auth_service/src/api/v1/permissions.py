@@ -6,7 +6,7 @@ from api.v1.schemas.roles import (
     PermissionsSchema,
     RolePermissionsParams,
 )
-from api.v1.service import allow_this_user
+from api.v1.service import allow_this_user, query_budget
 from services.permission import PermissionService, get_permission_service
 
 
@@ -22,6 +22,7 @@ router = APIRouter()
     description="Создание нового разрешения в системе",
     response_description="Результат операции: успешно или нет",
     tags=["Разрешения"],
+    dependencies=[Depends(query_budget(1))],
 )
 @allow_this_user
 async def create_permission(
@@ -48,6 +49,7 @@ async def create_permission(
     description="Назначение разрешения определенной роли в системе",
     response_description="Результат операции: успешно или нет",
     tags=["Разрешения"],
+    dependencies=[Depends(query_budget(1))],
 )
 @allow_this_user
 async def assign_permission_to_role(
@@ -71,6 +73,7 @@ async def assign_permission_to_role(
     description="Удаление разрешения из определенной роли в системе",
     response_description="Результат операции: успешно или нет",
     tags=["Разрешения"],
+    dependencies=[Depends(query_budget(1))],
 )
 @allow_this_user
 async def remove_permission_from_role(
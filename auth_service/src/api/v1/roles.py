@@ -11,7 +11,7 @@ from api.v1.schemas.roles import (
     RolesPermissionsSchema,
 )
 from services.role import RoleService, get_role_service
-from api.v1.service import allow_this_user
+from api.v1.service import allow_this_user, query_budget, read_replica
 
 
 router = APIRouter()
@@ -26,6 +26,7 @@ router = APIRouter()
     description="Создание новой роли",
     response_description="Ид, тип, разрешения",
     tags=["Роли"],
+    dependencies=[Depends(query_budget(1))],
 )
 @allow_this_user
 async def create(
@@ -72,6 +73,7 @@ async def delete(
     description="Редактирование существующей роли",
     response_description="Ид, тип, разрешения",
     tags=["Роли"],
+    dependencies=[Depends(query_budget(1))],
 )
 @allow_this_user
 async def change(
@@ -96,6 +98,7 @@ async def change(
     description="Список существующих ролей",
     response_description="Ид, тип, разрешения",
     tags=["Роли"],
+    dependencies=[Depends(query_budget(2)), Depends(read_replica)],
 )
 @allow_this_user
 async def list_roles(
@@ -128,6 +131,7 @@ async def list_roles(
     description="Назначение выбранной роли конкретному пользователю",
     response_description="Ид роли, Ид пользователя",
     tags=["Роли"],
+    dependencies=[Depends(query_budget(1))],
 )
 @allow_this_user
 async def add_user_role(
@@ -152,6 +156,7 @@ async def add_user_role(
     description="Удаление роли конкретного пользователю",
     response_description="Ид пользователя",
     tags=["Роли"],
+    dependencies=[Depends(query_budget(1))],
 )
 @allow_this_user
 async def del_user_role(
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Union
 
 from models.value_objects import UserID, AuthID
 
@@ -30,3 +31,17 @@ class AuthenticationData(BaseModel):
 class TokenParams(BaseModel):
     access_token: str
     refresh_token: str
+
+
+class RefreshTokenParams(BaseModel):
+    # access токен при обновлении необязателен: он мог истечь и быть удален клиентом
+    access_token: Union[str, None] = None
+    refresh_token: str
+
+
+class SessionSchema(BaseModel):
+    session_id: str
+    user_agent: Union[str, None]
+    created_at: datetime
+    last_seen: datetime
+    current: bool
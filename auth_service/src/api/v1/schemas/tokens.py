@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import Union
+
+from core.config import settings
+
+
+class IntrospectParams(BaseModel):
+    tokens: list[str] = Field(
+        description="Access или refresh токены", min_length=1, max_length=settings.introspect_max_tokens
+    )
+
+
+class TokenIntrospectionSchema(BaseModel):
+    active: bool
+    revoked: bool = False
+    token_type: Union[str, None] = None
+    exp: Union[int, None] = None
+    user_id: Union[str, None] = None
+    is_superuser: bool = False
+    role: Union[str, None] = None
+    permissions: list[str] = []
+    error: Union[str, None] = None
@@ -1,18 +1,27 @@
-from fastapi import status, HTTPException, Request, Depends
+import hmac
+
+from fastapi import status, HTTPException, Request, Depends, Security
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, Field
 from pydantic_core import ValidationError
+from datetime import datetime
 from functools import wraps
-from typing import Union
+from typing import AsyncIterator, Union
 from api.v1.schemas.auth import (
+    RefreshTokenParams,
     TokenParams,
 )
 
 
 from services.role import RoleService
 from services.permission import PermissionService
-from services.utils import decode_jwt, check_date_and_type_token
+from services.utils import decode_jwt, check_date_and_type_token, token_subject
 from services.user import UserService, get_user_service
 from models.value_objects import Role_names
+from core.config import page_max_size, settings
+from db import sql_profiler
+from db.postgres_db import replica_set
+from db.redis_db import RedisCache, get_redis
 
 
 class PaginationParams(BaseModel):
@@ -20,9 +29,46 @@ class PaginationParams(BaseModel):
     page_size: int = Field(1, ge=1)
 
 
-def get_tokens_from_cookie(request: Request) -> TokenParams:
+class CursorPaginationParams(BaseModel):
+    page_size: int = Field(10, ge=1, le=page_max_size)
+    cursor: Union[str, None] = Field(None, description="Курсор из заголовка X-Next-Cursor")
+    date_from: Union[datetime, None] = Field(None, description="Начало периода (включительно)")
+    date_to: Union[datetime, None] = Field(None, description="Конец периода (не включительно)")
+
+
+def query_budget(limit: int):
+    """Зависимость: объявленное для эндпоинта допустимое число SQL-команд.
+
+    Превышение пишется в лог и в заголовок X-DB-Query-Budget (при
+    SQL_DEBUG_HEADERS), по которому его проверяют функциональные тесты.
+    """
+    async def dependency() -> None:
+        profile = sql_profiler.current()
+        if profile is not None:
+            profile.budget = limit
+
+    return dependency
+
+
+async def read_replica(request: Request, cache: RedisCache = Depends(get_redis)) -> AsyncIterator[None]:
+    """Зависимость read-only эндпоинтов: чтения BaseService идут на реплику.
+
+    Субъект read-your-writes - пользователь из access токена; сам токен
+    проверяет эндпоинт, здесь он нужен только для выбора источника чтения.
+    """
+    subject = token_subject(request.headers) if replica_set.enabled else None
+    route = await replica_set.begin_read(cache, subject)
+    try:
+        yield
+    finally:
+        await replica_set.end_read(route)
+
+
+def get_tokens_from_cookie(
+    request: Request, params: type = TokenParams
+) -> Union[TokenParams, RefreshTokenParams]:
     try:
-        token = TokenParams(
+        token = params(
             access_token=request.cookies.get("access_token"),
             refresh_token=request.cookies.get("refresh_token"),
         )
@@ -42,9 +88,37 @@ async def check_jwt(request: Request, service: UserService = Depends(get_user_se
     payload = decode_jwt(jwt_token=tokens.access_token)
     if check_date_and_type_token(payload, "access"):
         # проверка access токена в блэк листе redis
-        if await service.get_from_black_list(tokens.access_token):
+        if await service.is_token_revoked(payload):
             raise credentials_exception
-    raise credentials_exception
+    return payload
+
+
+async def check_introspection_client(
+    credentials: Union[HTTPAuthorizationCredentials, None] = Security(HTTPBearer(auto_error=False)),
+    service: UserService = Depends(get_user_service),
+) -> None:
+    """Клиент проверки токенов (RFC 7662 требует его аутентификации):
+    токен сервиса из INTROSPECT_CLIENT_TOKENS или access токен суперпользователя."""
+    unauthorized = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Introspection client is not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if credentials is None:
+        raise unauthorized
+    token = credentials.credentials.encode()
+    if any(hmac.compare_digest(token, client.encode()) for client in settings.introspect_client_tokens):
+        return
+    try:
+        payload = decode_jwt(jwt_token=credentials.credentials)
+    except HTTPException:
+        raise unauthorized
+    if payload.get("type") != "access" or await service.is_token_revoked(payload):
+        raise unauthorized
+    if not payload.get("is_superuser"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="This operation is forbidden for you"
+        )
 
 
 async def is_admin(payload: dict) -> bool:
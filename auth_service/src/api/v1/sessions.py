@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from api.v1.schemas.auth import SessionSchema
+from api.v1.service import check_jwt, query_budget
+from services.user import UserService, get_user_service
+from .service import get_tokens_from_cookie
+
+router = APIRouter()
+
+
+# /api/v1/sessions
+@router.get(
+    "",
+    response_model=list[SessionSchema],
+    status_code=status.HTTP_200_OK,
+    summary="Сессии пользователя",
+    description="Устройства, на которых выполнен вход, от последних обновленных к старым",
+    tags=["Сессии"],
+    dependencies=[Depends(check_jwt), Depends(query_budget(0))],
+)
+async def list_sessions(
+    request: Request, user_service: UserService = Depends(get_user_service)
+) -> list[SessionSchema]:
+    tokens = get_tokens_from_cookie(request)
+    sessions = await user_service.list_sessions(tokens.access_token)
+    return [
+        SessionSchema(
+            session_id=session["session_id"],
+            user_agent=session["user_agent"],
+            created_at=datetime.fromtimestamp(session["created_at"]),
+            last_seen=datetime.fromtimestamp(session["last_seen"]),
+            current=session["current"],
+        )
+        for session in sessions
+    ]
+
+
+# /api/v1/sessions/logout_all
+@router.post(
+    "/logout_all",
+    response_model=int,
+    status_code=status.HTTP_200_OK,
+    summary="Выход со всех устройств",
+    description="Завершение всех сессий пользователя; keep_current - кроме текущей",
+    response_description="Число завершенных сессий",
+    tags=["Сессии"],
+    dependencies=[Depends(check_jwt), Depends(query_budget(0))],
+)
+async def logout_all(
+    request: Request,
+    keep_current: bool = False,
+    user_service: UserService = Depends(get_user_service),
+) -> int:
+    tokens = get_tokens_from_cookie(request)
+    return await user_service.logout_everywhere(tokens.access_token, keep_current)
+
+
+# /api/v1/sessions/{session_id}
+@router.delete(
+    "/{session_id}",
+    response_model=bool,
+    status_code=status.HTTP_200_OK,
+    summary="Завершение сессии",
+    description="Выход на одном устройстве",
+    tags=["Сессии"],
+    dependencies=[Depends(check_jwt), Depends(query_budget(0))],
+)
+async def end_session(
+    request: Request,
+    session_id: str,
+    user_service: UserService = Depends(get_user_service),
+) -> bool:
+    tokens = get_tokens_from_cookie(request)
+    if not await user_service.end_session(tokens.access_token, session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    return True
@@ -0,0 +1,30 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Body, Depends, status
+
+from api.v1.service import check_introspection_client, query_budget
+from api.v1.schemas.tokens import IntrospectParams, TokenIntrospectionSchema
+from services.tokens import TokenService, get_token_service
+
+router = APIRouter()
+
+
+# /api/v1/tokens/introspect
+@router.post(
+    "/introspect",
+    response_model=list[TokenIntrospectionSchema],
+    status_code=status.HTTP_200_OK,
+    summary="Проверка пачки токенов",
+    description="Действительность, отзыв, пользователь, роль и разрешения для каждого токена. "
+                "Доступно сервисам (Bearer токен из INTROSPECT_CLIENT_TOKENS) и суперпользователю",
+    response_description="Результаты в порядке переданных токенов",
+    tags=["Токены"],
+    # пользователи и роли, которых нет в кэше снимков, - по запросу (+ разрешения ролей)
+    dependencies=[Depends(check_introspection_client), Depends(query_budget(3))],
+)
+async def introspect(
+    params: Annotated[IntrospectParams, Body()],
+    token_service: TokenService = Depends(get_token_service),
+) -> list[TokenIntrospectionSchema]:
+    results = await token_service.introspect(params.tokens)
+    return [TokenIntrospectionSchema(**result) for result in results]
@@ -1,6 +1,11 @@
-from typing import Annotated
+import json
+import tempfile
+
+from uuid import UUID
+from typing import Annotated, Literal
 from fastapi import APIRouter, Depends, status, HTTPException, Security, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from api.v1.schemas.auth import (
@@ -8,13 +13,16 @@ from api.v1.schemas.auth import (
     TokenSchema,
     AuthenticationParams,
     AuthenticationData,
+    RefreshTokenParams,
 )
-from api.v1.service import check_jwt
+from core.config import settings
+from api.v1.service import check_jwt, is_superuser, query_budget, read_replica
 from api.v1.schemas.users import UserParams, UserSchema, UserEditParams
 from api.v1.schemas.roles import PermissionsParams
 from services.user import UserService, get_user_service
 from services.auth import AuthService, get_auth_service
-from .service import get_tokens_from_cookie, PaginationParams
+from services.user_import import UserImportService, get_user_import_service, iter_lines
+from .service import get_tokens_from_cookie, CursorPaginationParams
 
 router = APIRouter()
 
@@ -25,7 +33,8 @@ router = APIRouter()
     response_model=UserSchema,
     status_code=status.HTTP_202_ACCEPTED,
     summary="Кто я",
-    tags=['Пользователь']
+    tags=['Пользователь'],
+    dependencies=[Depends(query_budget(3)), Depends(read_replica)],
 )
 async def read_users_me(credentials: HTTPAuthorizationCredentials = Security(HTTPBearer()),
                         user_service: UserService = Depends(get_user_service)):
@@ -48,6 +57,7 @@ async def read_users_me(credentials: HTTPAuthorizationCredentials = Security(HTT
     description="Авторизцаия пользвателя по логину и паролю",
     response_description="Access и Refresh токены",
     tags=["Пользователи"],
+    dependencies=[Depends(query_budget(2))],
 )
 async def login(
     request: Request,
@@ -57,7 +67,7 @@ async def login(
 ) -> None:
     user_agent = request.headers.get("user-agent")
     tokens_resp, user = await user_service.login(
-        user_params.email, user_params.password
+        user_params.email, user_params.password, user_agent
     )
     user_agent_data = AuthenticationData(user_agent=user_agent, user_id=user.id)
     await auth_service.new_auth(user_agent_data)
@@ -84,6 +94,7 @@ async def login(
     description="Регистрация пользователя по логину, имени и паролю",
     response_description="Результат регистрации: успешно или нет",
     tags=["Пользователи"],
+    dependencies=[Depends(query_budget(1))],
 )
 async def user_registration(
     user_params: Annotated[UserParams, Depends()],
@@ -105,6 +116,74 @@ async def user_registration(
         )
 
 
+# /api/v1/users/import
+@router.post(
+    "/import",
+    status_code=status.HTTP_200_OK,
+    summary="Массовый импорт пользователей",
+    description="Импорт пользователей из NDJSON или CSV (с заголовком email,password,first_name,last_name). "
+                "Существующие email пропускаются",
+    response_description="NDJSON с результатом по каждой строке: created, exists или invalid",
+    tags=["Пользователи"],
+)
+async def import_users(
+    request: Request,
+    data_format: Literal["ndjson", "csv"] = "ndjson",
+    payload: dict = Depends(check_jwt),
+    import_service: UserImportService = Depends(get_user_import_service),
+) -> Response:
+    if not await is_superuser(payload):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This operation is forbidden for you",
+        )
+    # тело читается потоком и обрабатывается пачками; читать тело во время
+    # StreamingResponse starlette не позволяет, поэтому результаты копятся
+    # во временном файле (в памяти - до bulk_import_spool_size) и отдаются потоком
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.bulk_import_spool_size)
+    try:
+        async for result in import_service.import_users(iter_lines(request.stream()), data_format):
+            spool.write(json.dumps(result).encode() + b"\n")
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return StreamingResponse(
+        iter(lambda: spool.read(64 * 1024), b""),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(spool.close),
+    )
+
+
+# /api/v1/users/{user_id}/active
+@router.put(
+    "/{user_id}/active",
+    response_model=bool,
+    status_code=status.HTTP_200_OK,
+    summary="Активация и деактивация пользователя",
+    description="Деактивированный пользователь не может войти, его сессии завершаются, "
+                "кэши статуса пользователя в других сервисах сбрасываются",
+    response_description="Успешно или нет",
+    tags=["Пользователи"],
+    dependencies=[Depends(query_budget(1))],
+)
+async def set_user_active(
+    user_id: UUID,
+    active: bool,
+    payload: dict = Depends(check_jwt),
+    user_service: UserService = Depends(get_user_service),
+) -> bool:
+    if not await is_superuser(payload):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This operation is forbidden for you",
+        )
+    user = await user_service.set_user_active(str(user_id), active)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
+    return True
+
+
 # /api/v1/users/change_user_info
 @router.put(
     "/change_user_info",
@@ -114,7 +193,7 @@ async def user_registration(
     description="Редактирование логина, имени и пароля пользователя",
     response_description="Ид, логин, имя, дата регистрации",
     tags=["Пользователи"],
-    dependencies=[Depends(check_jwt)]
+    dependencies=[Depends(check_jwt), Depends(query_budget(1))]
 )
 async def change_user_info(
     request: Request,
@@ -141,7 +220,7 @@ async def change_user_info(
     summary="Выход пользователя",
     description="Выход текущего авторизованного пользователя",
     tags=["Пользователи"],
-    dependencies=[Depends(check_jwt)]
+    dependencies=[Depends(check_jwt), Depends(query_budget(0))]
 )
 async def logout(
     request: Request, user_service: UserService = Depends(get_user_service)
@@ -161,12 +240,13 @@ async def logout(
     description="Запрос access токена",
     response_description="Access токен",
     tags=["Пользователи"],
-    dependencies=[Depends(check_jwt)]
+    # access токен не проверяется: к моменту обновления он обычно уже истек
+    dependencies=[Depends(query_budget(1))]
 )
 async def refresh_token(
     request: Request, user_service: UserService = Depends(get_user_service)
 ) -> TokenSchema:
-    tokens = get_tokens_from_cookie(request)
+    tokens = get_tokens_from_cookie(request, RefreshTokenParams)
 
     new_tokens = await user_service.refresh_access_token(tokens.access_token,
                                                          tokens.refresh_token)
@@ -182,22 +262,28 @@ async def refresh_token(
     response_model=list[AuthenticationSchema],
     status_code=status.HTTP_200_OK,
     summary="История авторизаций",
-    description="Запрос истории авторизаций пользователя",
+    description="Запрос истории авторизаций пользователя, от новых к старым. "
+                "Курсор следующей страницы возвращается в заголовке X-Next-Cursor",
     response_description="Ид, ид пользователя, юзер агент, дата аутентификации",
     tags=["Пользователи"],
-    dependencies=[Depends(check_jwt)]
+    dependencies=[Depends(check_jwt), Depends(query_budget(1)), Depends(read_replica)]
 )
 async def get_login_history(
     request: Request,
+    response: Response,
     auth_service: Annotated[AuthService, Depends(get_auth_service)],
-    pagination_params: Annotated[PaginationParams, Depends()],
+    pagination_params: Annotated[CursorPaginationParams, Depends()],
 ) -> list[AuthenticationSchema]:
     tokens = get_tokens_from_cookie(request)
-    auth_data = await auth_service.login_history(
+    auth_data, next_cursor = await auth_service.login_history(
         tokens.access_token,
         pagination_params.page_size,
-        pagination_params.page_number
+        pagination_params.cursor,
+        pagination_params.date_from,
+        pagination_params.date_to,
     )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
 
     list_auth_scheme = []
     for item in auth_data:
@@ -220,7 +306,7 @@ async def get_login_history(
     description="Проверка разрешения опредленных действий пользователя",
     response_description="Результат проверки: успешно или нет",
     tags=["Пользователи"],
-    dependencies=[Depends(check_jwt)]
+    dependencies=[Depends(check_jwt), Depends(query_budget(3)), Depends(read_replica)]
 )
 async def check_permission(
     request: Request,
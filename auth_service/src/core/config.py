@@ -1,5 +1,7 @@
 import os
+from datetime import datetime
 from logging import config as logging_config
+from typing import Literal, Optional
 
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
@@ -16,7 +18,7 @@ class AuthJWT(BaseModel):
     secret_key: str = "secret-key"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 20 * 60
-    refresh_token_expire_minutes: int = 30 * 24 * 60 * 60  # 30 дней
+    refresh_token_expire_minutes: int = 30 * 24 * 60  # 30 дней
 
 
 class YandexSettings(BaseSettings):
@@ -34,6 +36,8 @@ class Settings(BaseSettings):
 
     service_port: int
     service_host: str
+    # Число воркеров gunicorn; по умолчанию cpu_count * 2 + 1
+    service_workers: Optional[int] = None
 
     # Настройки postgres
     db_name: str
@@ -41,23 +45,153 @@ class Settings(BaseSettings):
     db_password: str
     db_host: str
     db_port: int
+    # Пул соединений одного воркера; всего до workers * (pool_size + max_overflow)
+    db_pool_size: int = 5
+    db_max_overflow: int = 5
+    db_pool_timeout: float = 10.0
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 30 * 60
+    # Размер кеша prepared statements asyncpg (0 - отключен)
+    db_statement_cache_size: int = 100
+    # Подключение через PgBouncer в режиме transaction pooling
+    db_pgbouncer: bool = False
+    # Реплики для read-only эндпоинтов (полные DSN postgresql+asyncpg://...).
+    # Реплика исключается из чтения при отставании больше db_replica_max_lag секунд
+    # или ошибке проверки; после изменения данных пользователя чтения о нем
+    # db_read_your_writes_window секунд идут на primary
+    db_replica_dsns: list[str] = []
+    db_replica_max_lag: float = 1.0
+    db_replica_check_interval: float = 2.0
+    db_read_your_writes_window: int = 5
 
     # Настройки Redis
     redis_host: str
     redis_port: int
+    # Общий пул соединений воркера; подписки на каналы занимают по соединению.
+    # При исчерпании пула команда ждет соединение до redis_pool_timeout секунд
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0
+    redis_socket_timeout: float = 5.0
+    redis_socket_connect_timeout: float = 2.0
+    redis_health_check_interval: int = 30
+    # разбор ответов через hiredis, если он установлен
+    redis_hiredis: bool = True
 
     # Настройки jwt
     auth_jwt: AuthJWT = AuthJWT()
+    # Алгоритм подписи новых токенов: HS256 - общим секретом auth_jwt.secret_key,
+    # RS256/EdDSA - ключами из Redis с kid в заголовке; открытые ключи
+    # публикуются в /.well-known/jwks.json
+    jwt_algorithm: Literal["HS256", "RS256", "EdDSA"] = "RS256"
+    # ключ подписывает jwt_key_rotation_days дней и появляется в JWKS
+    # за jwt_key_publish_ahead секунд до начала подписи
+    jwt_key_rotation_days: int = 30
+    jwt_key_publish_ahead: int = 60 * 60
+    jwt_key_check_interval: int = 60
+    jwt_auto_rotate: bool = True
+    # пароль шифрования закрытых ключей в Redis; при RS256/EdDSA обязателен -
+    # с пустым сервис не запускается
+    jwt_keys_passphrase: str = ""
+    # принимать токены без kid, подписанные secret_key, - только на время перехода
+    # с HS256 и не позже jwt_hs256_accept_until (ISO 8601 с часовым поясом)
+    jwt_accept_hs256: bool = False
+    jwt_hs256_accept_until: Optional[datetime] = None
+    jwks_max_age: int = 5 * 60
+    # формат claims выдаваемых токенов: 2 - компактный с маской разрешений,
+    # 1 - прежний (пока не обновлены все сервисы, проверяющие токены);
+    # проверяются токены обоих форматов
+    jwt_claims_version: Literal[1, 2] = 2
     pwd_context: CryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
     oauth2_scheme: OAuth2PasswordBearer = OAuth2PasswordBearer(tokenUrl="token")
 
+    # Кэш снимков пользователей и ролей в Redis
+    snapshot_cache_enabled: bool = True
+    snapshot_cache_expire: int = 5 * 60
+
+    # Наибольшее число одновременных сессий пользователя (0 - без ограничения);
+    # при превышении завершается дольше всех не обновлявшаяся
+    sessions_max_per_user: int = 10
+    # повторное предъявление refresh токена позже этого срока после обмена
+    # считается кражей и завершает сессию; раньше - гонкой параллельных
+    # запросов клиента, такой запрос просто отклоняется
+    refresh_reuse_grace: float = 5.0
+
+    # Наибольшее число токенов в одном запросе /tokens/introspect
+    introspect_max_tokens: int = 100
+    # токены сервисов, которым доступен /tokens/introspect (Authorization: Bearer);
+    # кроме них - только суперпользователь со своим access токеном
+    introspect_client_tokens: list[str] = []
+
+    # Фильтр Блума отозванных токенов: емкость одного фильтра,
+    # вероятность ложного срабатывания одного фильтра и ширина корзины по exp, секунды
+    revocation_filter_capacity: int = 100000
+    revocation_filter_error_rate: float = 0.001
+    revocation_filter_bucket_seconds: int = 60 * 60
+
+    # Пул процессов для bcrypt: число процессов и допустимая очередь ожидания
+    password_hash_workers: int = 2
+    password_hash_queue: int = 64
+    # Схемы хеширования: первая - для новых паролей, остальные принимаются
+    # и пересчитываются при входе (например, ["argon2", "bcrypt"])
+    password_schemes: list[str] = ["bcrypt"]
+    # cost bcrypt; если не задан, подбирается при старте под целевое время проверки
+    password_bcrypt_rounds: Optional[int] = None
+    password_target_verify_ms: float = 50.0
+    # калибровка: медиана стольких проверок на каждый cost; результат хранится в Redis
+    # (password:bcrypt_rounds) и общий для всех воркеров - для перекалибровки ключ удаляют
+    password_calibration_samples: int = 5
+    # хеши с cost в пределах +-tolerance от текущего не пересчитываются при входе
+    password_bcrypt_rounds_tolerance: int = 1
+
+    # Массовый импорт пользователей: строк в одной пачке INSERT
+    bulk_import_batch_size: int = 1000
+    # пароли импорта хешируются в отдельном пуле процессов частями по chunk_size,
+    # пул и очередь проверки паролей при входе импорт не занимает
+    bulk_import_hash_workers: int = 1
+    bulk_import_hash_chunk_size: int = 50
+    # результаты импорта копятся в памяти до этого размера (байты), дальше - во временном файле
+    bulk_import_spool_size: int = 1024 * 1024
+
+    # Фоновая запись событий входа из Redis stream: максимальный размер
+    # пачки INSERT и максимальное время ожидания пачки (секунды)
+    login_events_batch_size: int = 500
+    login_events_flush_interval: float = 0.5
+    # как часто и через сколько секунд забирать записи stream, не подтвержденные
+    # упавшим воркером или после ошибки INSERT
+    login_events_recover_interval: float = 5.0
+    login_events_claim_idle: float = 60.0
+
+    # Профилирование SQL по запросам: число команд, время и повторы
+    # попадают в атрибуты span трассировки и в лог (N+1, превышение бюджета)
+    sql_profiler_enabled: bool = False
+    # Отладка: те же итоги в заголовках X-DB-* (используются функциональными
+    # тестами для контроля бюджета запросов)
+    sql_debug_headers: bool = False
+    # с какого числа повторов одной команды за запрос писать предупреждение
+    sql_repeat_warning: int = 5
+
     REQUEST_LIMIT_PER_MINUTE: int = os.getenv('REQUEST_LIMIT_PER_MINUTE', 20)
+    # Лимиты запросов (utils/limits.py): алгоритм, лимит по умолчанию
+    # (по умолчанию REQUEST_LIMIT_PER_MINUTE/minute), лимиты по префиксу пути
+    # и по клиенту ("user:<uuid>" или "ip:<адрес>"); формат лимита "20/minute"
+    rate_limit_enabled: bool = True
+    rate_limit_algorithm: Literal["sliding_window", "token_bucket"] = "sliding_window"
+    rate_limit_default: Optional[str] = None
+    rate_limit_routes: dict[str, str] = {}
+    rate_limit_identities: dict[str, str] = {}
+    # отклонять повторные запросы клиента сверх лимита без обращения к Redis
+    rate_limit_local_block: bool = True
 
     # Настройка трассировки
     tracer_host: str
     tracer_port: int
     enable_tracer: bool
 
+    @property
+    def sql_profiling(self) -> bool:
+        # заголовки X-DB-* без профилирования не имеют смысла
+        return self.sql_profiler_enabled or self.sql_debug_headers
+
     class Config:
         env_file = ".env"
 
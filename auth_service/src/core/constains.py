@@ -8,3 +8,37 @@ class RoleAccess(IntEnum):
 
 
 DEFAULT_ROLE_DATA = {"name": "user", "access_level": 1}
+
+# Кэш результатов проверки пользователя в других сервисах (content_service)
+USER_STATUS_KEY_PREFIX = "user_status:"
+USER_STATUS_CHANNEL = "user_status:invalidate"
+
+# Канал событий об изменении ролей и их разрешений
+ROLES_CHANNEL = "roles:changed"
+
+# Отозванные токены: sorted set self_uuid -> exp и канал новых отзывов
+REVOKED_TOKENS_KEY = "revoked_tokens"
+REVOKED_TOKENS_CHANNEL = "revoked_tokens:new"
+
+# Резервный поток событий входа: пишется, когда буфер воркера переполнен
+# или запись в Postgres не удалась, и разбирается группой воркеров
+LOGIN_EVENTS_STREAM = "login_events"
+LOGIN_EVENTS_GROUP = "login_events:writers"
+
+# Метки read-your-writes: пока метка жива, чтения о пользователе идут на primary
+READ_YOUR_WRITES_KEY_PREFIX = "read_your_writes:"
+
+# Лимиты запросов: журналы и маркерные ведра клиентов (utils/limits.py)
+RATE_LIMIT_KEY_PREFIX = "rate_limit:"
+
+# Ключи подписи токенов (hash kid -> ключ) и блокировка их ротации
+SIGNING_KEYS_KEY = "jwt:signing_keys"
+SIGNING_KEYS_LOCK = "jwt:signing_keys:lock"
+
+# Сессии: sorted set сессий пользователя и hash сессии (services/session_store.py)
+SESSIONS_KEY_PREFIX = "sessions:"
+SESSION_KEY_PREFIX = "session:"
+# Использованные refresh токены: для обнаружения повторного предъявления
+REFRESH_USED_KEY_PREFIX = "refresh_used:"
+# cost bcrypt, откалиброванный первым воркером
+BCRYPT_ROUNDS_KEY = "password:bcrypt_rounds"
@@ -0,0 +1,13 @@
+from typing import Callable
+
+
+# Источники метрик сервиса: имя -> функция, возвращающая словарь значений
+_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, provider: Callable[[], dict]) -> None:
+    _providers[name] = provider
+
+
+def collect() -> dict:
+    return {name: provider() for name, provider in _providers.items()}
@@ -0,0 +1,110 @@
+import bisect
+import time
+import uuid
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+# Границы корзин гистограммы ожидания соединения из пула, мс
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """Время ожидания свободного соединения и таймауты пула."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.histogram = [0] * (len(POOL_WAIT_BUCKETS_MS) + 1)
+        self.pool = None
+
+    def observe(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.histogram[bisect.bisect_left(POOL_WAIT_BUCKETS_MS, wait * 1000)] += 1
+
+    def stats(self) -> dict:
+        labels = [f"le_{bound}ms" for bound in POOL_WAIT_BUCKETS_MS] + ["inf"]
+        stats = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "wait": dict(zip(labels, self.histogram)),
+        }
+        if isinstance(self.pool, AsyncAdaptedQueuePool):
+            stats.update(
+                size=self.pool.size(),
+                checked_out=self.pool.checkedout(),
+                overflow=self.pool.overflow(),
+                checked_in=self.pool.checkedin(),
+            )
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeasuredQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время ожидания соединения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        pool_metrics.pool = self
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        pool_metrics.observe(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: float,
+    pool_pre_ping: bool,
+    pool_recycle: int,
+    statement_cache_size: int,
+    pgbouncer: bool,
+    measured: bool = True,
+) -> dict:
+    """Аргументы create_async_engine для пула и кеша prepared statements.
+
+    Каждый воркер gunicorn держит свой пул, поэтому на сервер приходится
+    до workers * (pool_size + max_overflow) соединений.
+    В режиме PgBouncer (transaction pooling) соединения пулит сам PgBouncer:
+    используется NullPool, кеши prepared statements отключены, а имена
+    statements уникальны, чтобы не конфликтовать на общих серверных соединениях.
+    measured=False - обычный пул без метрик ожидания (для реплик).
+    """
+    if pgbouncer:
+        return {
+            "poolclass": NullPool,
+            "pool_pre_ping": pool_pre_ping,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            },
+        }
+    return {
+        "poolclass": MeasuredQueuePool if measured else AsyncAdaptedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_pre_ping": pool_pre_ping,
+        "pool_recycle": pool_recycle,
+        "connect_args": {
+            # кеш prepared statements asyncpg и кеш диалекта SQLAlchemy
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        },
+    }
@@ -1,14 +1,43 @@
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
-from core.config import pg_config_data
+from core import metrics
+from core.config import pg_config_data, settings
+from db import sql_profiler
+from db.pool import engine_options, pool_metrics
+from db.replicas import ReplicaSet
 
 Base = declarative_base()
 dsn = (
     f"postgresql+asyncpg://{pg_config_data.user}:{pg_config_data.password}@{pg_config_data.host}:"
     f"{pg_config_data.port}/{pg_config_data.dbname}"
 )
-engine = create_async_engine(dsn, future=True)
+pool_settings = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle,
+    statement_cache_size=settings.db_statement_cache_size,
+    pgbouncer=settings.db_pgbouncer,
+)
+engine = create_async_engine(dsn, future=True, **engine_options(**pool_settings))
+# реплики для read-only эндпоинтов; без DB_REPLICA_DSNS все читается с primary
+replica_set = ReplicaSet(
+    [
+        create_async_engine(replica_dsn, future=True, **engine_options(**pool_settings, measured=False))
+        for replica_dsn in settings.db_replica_dsns
+    ],
+    max_lag=settings.db_replica_max_lag,
+    check_interval=settings.db_replica_check_interval,
+    read_your_writes_window=settings.db_read_your_writes_window,
+)
+if settings.sql_profiling:
+    sql_profiler.install(engine.sync_engine)
+    for replica in replica_set.replicas:
+        sql_profiler.install(replica.engine.sync_engine)
+metrics.register("db_pool", pool_metrics.stats)
+metrics.register("db_replicas", replica_set.stats)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -1,17 +1,21 @@
 import json
 
-from typing import Union
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, Union
 
 import backoff
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline, PubSub
 from redis.exceptions import ConnectionError as conn_err_redis
 
+from core import metrics
 from .cache import Cache
+from .redis_pool import redis_pool_metrics
 
 
 class RedisCache(Cache):
-    def __init__(self):
-        self.redis: Union[Redis, None]
+    def __init__(self, redis: Redis):
+        self.redis = redis
 
     @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
     async def get(self, key) -> Union[bytes, None]:
@@ -22,13 +26,69 @@ class RedisCache(Cache):
 
     @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
     async def set(self, key, value, expire=None):
-        await self.redis.set(key, value)
-        if expire:
-            await self.redis.expire(key, expire)
+        # SET ... EX - значение и время жизни записываются одной атомарной командой
+        await self.redis.set(key, value, ex=expire)
 
     @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
-    async def delete(self, key):
-        await self.redis.delete(key)
+    async def delete(self, *keys):
+        if keys:
+            await self.redis.delete(*keys)
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def get_many(self, keys: Iterable) -> list[Union[bytes, None]]:
+        keys = list(keys)
+        if not keys:
+            return []
+        return await self.redis.mget(keys)
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def set_many(self, mapping: dict, expire=None):
+        if not mapping:
+            return
+        async with self.batch() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=expire)
+
+    async def delete_many(self, keys: Iterable):
+        await self.delete(*keys)
+
+    @asynccontextmanager
+    async def batch(self, transaction: bool = True) -> AsyncIterator[Pipeline]:
+        """Пакет команд, отправляемый за один round trip.
+
+        При transaction=True команды выполняются в MULTI/EXEC атомарно.
+        Команды накапливаются в pipe и выполняются при выходе из контекста.
+        """
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            await pipe.execute()
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def stream_add(self, stream: str, entries: Iterable[dict]):
+        """XADD нескольких записей за один round trip."""
+        async with self.batch(transaction=False) as pipe:
+            for entry in entries:
+                pipe.xadd(stream, entry)
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def stream_ack(self, stream: str, group: str, ids: list):
+        """Подтверждает и удаляет обработанные записи потока."""
+        if not ids:
+            return
+        async with self.batch() as pipe:
+            pipe.xack(stream, group, *ids)
+            pipe.xdel(stream, *ids)
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def publish(self, channel: str, message):
+        await self.redis.publish(channel, message)
+
+    def pubsub(self) -> PubSub:
+        return self.redis.pubsub()
+
+    async def close(self):
+        # пул создан отдельно (db/redis_pool.py), закрываем и его
+        await self.redis.close(close_connection_pool=True)
 
     @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
     async def set_user_data(self, user_id, user_data):
@@ -40,7 +100,10 @@ class RedisCache(Cache):
         return json.loads(info.decode())
 
 
+# Единственный клиент Redis воркера (создается в main.lifespan): кеши,
+# белый и черный списки токенов, лимиты запросов и подписки
 redis: Union[RedisCache, None] = None
+metrics.register("redis_pool", redis_pool_metrics.stats)
 
 
 async def get_redis() -> RedisCache:
@@ -0,0 +1,107 @@
+import bisect
+import logging
+import time
+
+from redis.asyncio import Redis
+from redis.asyncio.connection import BlockingConnectionPool, HiredisParser, PythonParser
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.utils import HIREDIS_AVAILABLE
+
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы ожидания соединения из пула, мс
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+class RedisPoolMetrics:
+    """Использование пула соединений Redis и время ожидания соединения."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.histogram = [0] * (len(POOL_WAIT_BUCKETS_MS) + 1)
+        self.pool = None
+
+    def observe(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.histogram[bisect.bisect_left(POOL_WAIT_BUCKETS_MS, wait * 1000)] += 1
+
+    def stats(self) -> dict:
+        labels = [f"le_{bound}ms" for bound in POOL_WAIT_BUCKETS_MS] + ["inf"]
+        stats = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "wait": dict(zip(labels, self.histogram)),
+        }
+        if self.pool is not None:
+            created = len(self.pool._connections)
+            # в очереди пула лежат свободные соединения и None - еще не созданные
+            idle = sum(1 for connection in self.pool.pool._queue if connection is not None)
+            stats.update(
+                max_connections=self.pool.max_connections,
+                created=created,
+                in_use=created - idle,
+                idle=idle,
+            )
+        return stats
+
+
+redis_pool_metrics = RedisPoolMetrics()
+
+
+class MeasuredBlockingConnectionPool(BlockingConnectionPool):
+    """Пул, который при исчерпании ждет свободное соединение до timeout
+    вместо ошибки "Too many connections" и измеряет это ожидание."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        redis_pool_metrics.pool = self
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except RedisConnectionError as e:
+            if "No connection available" in str(e):
+                redis_pool_metrics.timeouts += 1
+            raise
+        redis_pool_metrics.observe(time.perf_counter() - started)
+        return connection
+
+
+def create_redis(
+    host: str,
+    port: int,
+    max_connections: int,
+    pool_timeout: float,
+    socket_timeout: float,
+    socket_connect_timeout: float,
+    health_check_interval: int,
+    hiredis: bool,
+) -> Redis:
+    """Клиент Redis на общем для воркера пуле соединений.
+
+    Подписки (pubsub) занимают соединение пула на все время работы,
+    max_connections должен их учитывать.
+    """
+    if hiredis and not HIREDIS_AVAILABLE:
+        logger.info("hiredis не установлен, ответы Redis разбираются на python")
+    pool = MeasuredBlockingConnectionPool(
+        host=host,
+        port=port,
+        max_connections=max_connections,
+        timeout=pool_timeout,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=socket_connect_timeout,
+        socket_keepalive=True,
+        health_check_interval=health_check_interval,
+        parser_class=HiredisParser if hiredis and HIREDIS_AVAILABLE else PythonParser,
+    )
+    return Redis(connection_pool=pool)
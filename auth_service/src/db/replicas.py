@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+import logging
+
+from contextvars import ContextVar
+from typing import Union
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from core.constains import READ_YOUR_WRITES_KEY_PREFIX
+from db.redis_db import RedisCache
+
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики в секундах; 0, если весь полученный WAL применен
+# (иначе на простаивающем primary отставание росло бы само по себе)
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+# Субъект read-your-writes для изменений, затрагивающих всех пользователей (роли, разрешения)
+ALL_SUBJECTS = "*"
+
+
+def pin_key(subject) -> str:
+    return READ_YOUR_WRITES_KEY_PREFIX + str(subject)
+
+
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        # до первой проверки реплика считается недоступной
+        self.healthy = False
+        self.lag: Union[float, None] = None
+        self.reads = 0
+        self.failures = 0
+        event.listen(engine.sync_engine, "handle_error", self._on_error)
+
+    def mark_down(self, reason) -> None:
+        if self.healthy:
+            logger.warning(f"Реплика {self.name} исключена из чтения: {reason}")
+        self.healthy = False
+        self.failures += 1
+
+    def _on_error(self, context) -> None:
+        # обрыв соединения посреди запроса: не ждем следующей проверки
+        if context.is_disconnect:
+            self.mark_down(context.original_exception)
+
+    async def check(self, max_lag: float, timeout: float) -> None:
+        try:
+            async with self.engine.connect() as connection:
+                lag = (await asyncio.wait_for(connection.execute(LAG_QUERY), timeout)).scalar()
+        except Exception as e:
+            self.lag = None
+            self.mark_down(e)
+            return
+        self.lag = float(lag) if lag is not None else None
+        if self.lag is None or self.lag > max_lag:
+            self.mark_down(f"отставание {self.lag} s")
+            return
+        if not self.healthy:
+            logger.info(f"Реплика {self.name} доступна для чтения, отставание {self.lag:.3f} s")
+        self.healthy = True
+
+
+class ReadRoute:
+    """Сессия для чтения в рамках одного запроса."""
+
+    def __init__(self, replica: Union[Replica, None]):
+        self.replica = replica
+        self.session: Union[AsyncSession, None] = None
+
+    def session_for(self, primary: AsyncSession) -> AsyncSession:
+        if self.replica is None:
+            return primary
+        if not self.replica.healthy:
+            # реплика отказала во время запроса - дочитываем с primary
+            self.replica = None
+            return primary
+        if self.session is None:
+            self.session = self.replica.session_factory()
+            self.replica.reads += 1
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+
+_route: ContextVar[Union[ReadRoute, None]] = ContextVar("read_route", default=None)
+
+
+def reader(primary: AsyncSession) -> AsyncSession:
+    """Сессия для read-only запросов BaseService.
+
+    Реплика - только внутри эндпоинтов, объявивших зависимость
+    api/v1/service.read_replica; во всех остальных случаях primary.
+    """
+    route = _route.get()
+    return primary if route is None else route.session_for(primary)
+
+
+class ReplicaSet:
+    """Реплики для чтения: round-robin по здоровым, проверка отставания.
+
+    Read-your-writes: после изменения данных пользователя в Redis ставится
+    метка с TTL read_your_writes_window, и пока она жива, чтения о нем
+    идут на primary. Метки общие для всех воркеров.
+    """
+
+    def __init__(
+        self,
+        engines: list[AsyncEngine],
+        max_lag: float,
+        check_interval: float,
+        read_your_writes_window: int,
+    ):
+        self.replicas = [Replica(f"replica{number}", engine) for number, engine in enumerate(engines)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes_window = read_your_writes_window
+        self._counter = itertools.count()
+        self.primary_reads = 0
+        self.pinned_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self) -> Union[Replica, None]:
+        count = len(self.replicas)
+        start = next(self._counter)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if replica.healthy:
+                return replica
+        return None
+
+    async def check(self) -> None:
+        await asyncio.gather(
+            *(replica.check(self.max_lag, self.check_interval) for replica in self.replicas)
+        )
+
+    async def run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def begin_read(self, cache: RedisCache, subject: Union[str, None]) -> ReadRoute:
+        """Выбирает источник чтений текущего запроса."""
+        replica = None
+        if self.enabled:
+            if await self._pinned(cache, subject):
+                self.pinned_reads += 1
+            else:
+                replica = self.pick()
+                if replica is None:
+                    self.primary_reads += 1
+        route = ReadRoute(replica)
+        _route.set(route)
+        return route
+
+    async def end_read(self, route: ReadRoute) -> None:
+        _route.set(None)
+        await route.close()
+
+    async def _pinned(self, cache: RedisCache, subject: Union[str, None]) -> bool:
+        keys = [pin_key(ALL_SUBJECTS)]
+        if subject is not None:
+            keys.append(pin_key(subject))
+        try:
+            return any(await cache.get_many(keys))
+        except Exception as e:
+            logger.warning(f"Не удалось проверить метки read-your-writes: {e}")
+            return True
+
+    async def mark_written(self, cache: Union[RedisCache, None], *subjects) -> None:
+        """Направляет чтения о subjects на primary на время read_your_writes_window."""
+        if not self.enabled or cache is None or not subjects:
+            return
+        await cache.set_many({pin_key(subject): 1 for subject in subjects}, self.read_your_writes_window)
+
+    def stats(self) -> dict:
+        return {
+            "replicas": {
+                replica.name: {
+                    "healthy": replica.healthy,
+                    "lag_s": replica.lag,
+                    "reads": replica.reads,
+                    "failures": replica.failures,
+                }
+                for replica in self.replicas
+            },
+            "primary_fallback_reads": self.primary_reads,
+            "read_your_writes_reads": self.pinned_reads,
+        }
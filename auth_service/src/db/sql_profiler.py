@@ -0,0 +1,78 @@
+import time
+
+from collections import Counter
+from contextvars import ContextVar
+from typing import Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class SQLProfile:
+    """SQL-команды одного запроса: число, суммарное время и повторы.
+
+    Одинаковый текст команды, выполненный несколько раз за запрос, -
+    типичный признак N+1 (параметры в тексте не участвуют).
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.by_statement: Counter = Counter()
+        # допустимое число команд, объявленное для эндпоинта (api/v1/service.query_budget)
+        self.budget: Union[int, None] = None
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.duration += duration
+        self.by_statement[statement] += 1
+
+    @property
+    def repeated(self) -> dict[str, int]:
+        return {statement: count for statement, count in self.by_statement.items() if count > 1}
+
+    @property
+    def repeated_count(self) -> int:
+        """Сколько команд выполнено сверх первого раза для повторяющихся."""
+        return sum(count - 1 for count in self.repeated.values())
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.statements > self.budget
+
+
+_current: ContextVar[Union[SQLProfile, None]] = ContextVar("sql_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("sql_profiler_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is None:
+        return
+    started = conn.info.get("sql_profiler_started")
+    if started:
+        profile.record(statement, time.perf_counter() - started.pop())
+
+
+def install(engine: Engine) -> None:
+    """Подключает профилирование к engine (для AsyncEngine - к его sync_engine).
+
+    Команды считаются только внутри start(), фоновые задачи не учитываются.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start() -> SQLProfile:
+    """Начинает профилирование для текущего контекста (запроса)."""
+    profile = SQLProfile()
+    _current.set(profile)
+    return profile
+
+
+def current() -> Union[SQLProfile, None]:
+    return _current.get()
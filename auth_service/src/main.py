@@ -5,9 +5,8 @@ import asyncio
 import functools as ft
 import sys
 
-from fastapi import FastAPI, Depends, Request, status
+from fastapi import FastAPI, Depends
 from fastapi.responses import ORJSONResponse
-from redis.asyncio import Redis
 from contextlib import asynccontextmanager
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
@@ -16,18 +15,57 @@ from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExport
 from opentelemetry.exporter.jaeger.thrift import JaegerExporter
 from opentelemetry.sdk.resources import Resource, SERVICE_NAME
 
-from api.v1 import users, roles, permissions, oauth
+from api.v1 import users, roles, permissions, oauth, metrics, jwks, tokens, sessions
 from db import postgres_db
 from db import redis_db
+from db.redis_pool import create_redis
 from core.config import settings
 from api.v1.service import check_jwt
 from utils.limits import check_limit
+from utils.middleware import RequestContextMiddleware
+from services.permission_index import permission_index
+from services.revocation_filter import revocation_filter
+from services.password import password_hasher
+from services.login_events import login_events
+from services.signing_keys import signing_keys
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    redis_db.redis = Redis(host=settings.redis_host, port=settings.redis_port)
+    redis_db.redis = redis_db.RedisCache(
+        create_redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            max_connections=settings.redis_max_connections,
+            pool_timeout=settings.redis_pool_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
+            health_check_interval=settings.redis_health_check_interval,
+            hiredis=settings.redis_hiredis,
+        )
+    )
+    await password_hasher.start(redis_db.redis)
+    # ключи подписи загружаются до приема запросов
+    await signing_keys.start(redis_db.redis)
+    key_rotation = asyncio.create_task(signing_keys.run())
+    # индекс загружается при подписке и далее обновляется по событиям
+    index_listener = asyncio.create_task(
+        permission_index.listen(redis_db.redis, postgres_db.async_session)
+    )
+    revocation_listener = asyncio.create_task(revocation_filter.listen(redis_db.redis))
+    await login_events.start(redis_db.redis, postgres_db.async_session)
+    replica_checker = None
+    if postgres_db.replica_set.enabled:
+        replica_checker = asyncio.create_task(postgres_db.replica_set.run())
     yield
+    if replica_checker is not None:
+        replica_checker.cancel()
+        await postgres_db.replica_set.dispose()
+    key_rotation.cancel()
+    index_listener.cancel()
+    revocation_listener.cancel()
+    await login_events.stop()
+    password_hasher.shutdown()
     await redis_db.redis.close()
 
 
@@ -62,31 +100,18 @@ app = FastAPI(
 )
 
 
-@app.middleware('http')
-async def before_request(request: Request, call_next):
-    user_id = request.headers.get('X-Forwarded-For')
-    request_id = request.headers.get('X-Request-Id')
-    result = await check_limit(user_id=user_id)
-    if result:
-        return ORJSONResponse(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            content={'detail': 'Too many requests'}
-        )
-    response = await call_next(request)
-    if not request_id:
-        return ORJSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={'detail': 'X-Request-Id is required'})
-    
-    if settings.enable_tracer:
-        tracer = trace.get_tracer(__name__)
-        with tracer.start_as_current_span('http', attributes={'http.request_id': request_id}):
-            response = await call_next(request=request)
-    else:
-        response = await call_next(request=request)
-        
-    return response
+app.add_middleware(
+    RequestContextMiddleware,
+    limiter=check_limit if settings.rate_limit_enabled else None,
+    enable_tracer=settings.enable_tracer,
+    profile_sql=settings.sql_profiling,
+    sql_headers=settings.sql_debug_headers,
+)
 
 
 def number_of_workers():
+    if settings.service_workers:
+        return settings.service_workers
     return (multiprocessing.cpu_count() * 2) + 1
 
 
@@ -115,6 +140,12 @@ app.include_router(users.router, prefix="/auth/api/v1/users")
 app.include_router(roles.router, prefix="/auth/api/v1/roles", dependencies=[Depends(check_jwt)])
 app.include_router(permissions.router, prefix="/auth/api/v1/permissions", dependencies=[Depends(check_jwt)])
 app.include_router(oauth.router, prefix="/auth/api/v1/oauth")
+app.include_router(metrics.router, prefix="/auth/api/v1/metrics")
+app.include_router(tokens.router, prefix="/auth/api/v1/tokens")
+app.include_router(sessions.router, prefix="/auth/api/v1/sessions")
+app.include_router(jwks.router, prefix="/auth")
+# стандартный путь для обращений внутри сети, минуя nginx
+app.include_router(jwks.router, include_in_schema=False)
 
 FastAPIInstrumentor.instrument_app(app)
 
@@ -166,8 +197,67 @@ async def create_superuser(email, password):
         click.echo(f"Superuser {email} created successfully!")
 
 
+@click.command()
+@click.option("--file", "file_path", required=True, type=click.Path(exists=True), help="NDJSON or CSV file")
+@click.option("--format", "data_format", type=click.Choice(["ndjson", "csv"]), default="ndjson")
+@click.option("--batch-size", default=settings.bulk_import_batch_size, help="Rows per INSERT")
+@async_cmd
+async def import_users(file_path, data_format, batch_size):
+    from services.user_import import UserImportService
+
+    async def read_lines():
+        with open(file_path, encoding="utf-8") as file:
+            for line in file:
+                yield line.rstrip("\r\n")
+
+    counters = {"created": 0, "exists": 0, "invalid": 0}
+    await password_hasher.start()
+    try:
+        async with postgres_db.async_session() as session:
+            service = UserImportService(None, session)
+            async for result in service.import_users(read_lines(), data_format, batch_size):
+                counters[result["status"]] += 1
+                if result["status"] == "invalid":
+                    click.echo(f"line {result['line']}: {result['error']}", err=True)
+    finally:
+        password_hasher.shutdown()
+    click.echo(", ".join(f"{name}: {count}" for name, count in counters.items()))
+
+
+@click.command()
+@async_cmd
+async def rotate_keys():
+    """Внеплановая ротация: новый ключ сразу публикуется в JWKS и вскоре начинает подписывать."""
+    cache = redis_db.RedisCache(create_redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        max_connections=2,
+        pool_timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_connect_timeout,
+        health_check_interval=settings.redis_health_check_interval,
+        hiredis=settings.redis_hiredis,
+    ))
+    if not signing_keys.asymmetric:
+        click.echo(f"JWT_ALGORITHM={signing_keys.algorithm} does not use signing keys", err=True)
+        return
+    signing_keys.cache = cache
+    try:
+        key = await signing_keys.rotate(force=True)
+    finally:
+        await cache.close()
+    if key is None:
+        click.echo("Rotation is already in progress", err=True)
+    else:
+        click.echo(f"New signing key {key.kid} ({key.algorithm})")
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == "import_users":
+        import_users(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "rotate_keys":
+        rotate_keys(sys.argv[2:])
+    elif len(sys.argv) > 1:
         create_superuser()
     else:
         options = {
@@ -0,0 +1,48 @@
+"""Add login history index
+
+Revision ID: 3c1f0a7d2b4e
+Revises: 9a5e9857fc94
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f0a7d2b4e'
+down_revision: Union[str, None] = '9a5e9857fc94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_authentication_user_id_date_auth"
+INDEX_COLUMNS = "(user_id, date_auth DESC, id DESC)"
+
+
+def upgrade() -> None:
+    # Индекс на родительской таблице создается невалидным (ON ONLY), индексы
+    # партиций строятся CONCURRENTLY без блокировки записи и присоединяются
+    # к нему. Новые партиции pg_partman получают индекс автоматически.
+    op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON ONLY public.authentication {INDEX_COLUMNS};")
+    partitions = op.get_bind().exec_driver_sql(
+        """SELECT child.relname
+           FROM pg_inherits
+           JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+           JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+           WHERE parent.relname = 'authentication';"""
+    ).scalars().all()
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_user_id_date_auth_idx "
+                f"ON public.{partition} {INDEX_COLUMNS};"
+            )
+            op.execute(
+                f"ALTER INDEX {INDEX_NAME} ATTACH PARTITION public.{partition}_user_id_date_auth_idx;"
+            )
+
+
+def downgrade() -> None:
+    # индексы партиций удаляются вместе с индексом родительской таблицы
+    op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME};")
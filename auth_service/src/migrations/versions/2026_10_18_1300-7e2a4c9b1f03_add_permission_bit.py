@@ -0,0 +1,35 @@
+"""Add permission bit
+
+Revision ID: 7e2a4c9b1f03
+Revises: 3c1f0a7d2b4e
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2a4c9b1f03'
+down_revision: Union[str, None] = '3c1f0a7d2b4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # номер бита разрешения в маске access токена; не меняется, новые биты
+    # выдает последовательность permissions_bit_seq (d41b7e93a6c2)
+    op.add_column('permissions', sa.Column('bit', sa.SmallInteger(), nullable=True))
+    op.execute(
+        """UPDATE permissions SET bit = numbered.bit
+           FROM (SELECT id, row_number() OVER (ORDER BY name) - 1 AS bit FROM permissions) AS numbered
+           WHERE permissions.id = numbered.id;"""
+    )
+    op.create_unique_constraint('permissions_bit_key', 'permissions', ['bit'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('permissions_bit_key', 'permissions', type_='unique')
+    op.drop_column('permissions', 'bit')
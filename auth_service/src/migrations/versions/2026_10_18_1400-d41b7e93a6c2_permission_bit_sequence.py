@@ -0,0 +1,36 @@
+"""Permission bit sequence
+
+Revision ID: d41b7e93a6c2
+Revises: 7e2a4c9b1f03
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41b7e93a6c2'
+down_revision: Union[str, None] = '7e2a4c9b1f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # биты выдает последовательность: бит удаленного разрешения не достанется
+    # новому, и маски в еще действующих токенах не дадут его права
+    op.execute("CREATE SEQUENCE permissions_bit_seq AS smallint MINVALUE 0 START 0 OWNED BY permissions.bit")
+    op.execute(
+        """SELECT setval('permissions_bit_seq', max(bit) + 1, false)
+           FROM permissions HAVING max(bit) IS NOT NULL"""
+    )
+    op.alter_column(
+        'permissions', 'bit', server_default=sa.text("nextval('permissions_bit_seq')")
+    )
+
+
+def downgrade() -> None:
+    op.alter_column('permissions', 'bit', server_default=None)
+    op.execute("DROP SEQUENCE permissions_bit_seq")
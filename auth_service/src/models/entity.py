@@ -2,7 +2,7 @@
 import uuid
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Boolean, DateTime, String, ForeignKey, or_, Text, UniqueConstraint
+from sqlalchemy import Boolean, DateTime, SmallInteger, String, ForeignKey, or_, Text, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import string
@@ -32,6 +32,11 @@ class Permissions(Base):
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
     name: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    # номер бита в маске разрешений access токена; выдается последовательностью
+    # permissions_bit_seq и не переиспользуется после удаления разрешения
+    bit: Mapped[Optional[int]] = mapped_column(
+        SmallInteger, unique=True, nullable=True, server_default=text("nextval('permissions_bit_seq')")
+    )
     role_id: Mapped[int] = mapped_column(
         ForeignKey("roles.id", ondelete="CASCADE"), default=None, nullable=True
     )
@@ -85,13 +90,15 @@ class User(Base):
     def __init__(
         self,
         email: str,
-        password: str,
+        password: str = None,
         first_name: str = None,
         last_name: str = None,
         is_superuser: bool = False,
+        hashed_password: str = None,
     ) -> None:
         self.email = email
-        self.password = hash_password(password)
+        # хеш может быть посчитан заранее вне event loop (services/password.py)
+        self.password = hashed_password or hash_password(password)
         self.first_name = first_name
         self.last_name = last_name
         self.is_superuser = is_superuser
@@ -125,5 +132,15 @@ class Authentication(Base):
     user_agent: Mapped[str] = mapped_column(String(255), nullable=False)
     date_auth: Mapped[DateTime] = mapped_column(DateTime, default=datetime.now)
 
+    # индекс под постраничную историю входов (миграция 3c1f0a7d2b4e)
+    __table_args__ = (
+        Index(
+            "ix_authentication_user_id_date_auth",
+            "user_id",
+            date_auth.desc(),
+            id.desc(),
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<Authentication {self.id}>"
@@ -1,39 +1,72 @@
+import base64
+import uuid
+
+from datetime import datetime
 from fastapi import Depends, HTTPException, status
 from functools import lru_cache
+from typing import Union
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.entity import Authentication
 from .base_service import BaseService
+from .login_events import login_events
 from .utils import decode_jwt
 
 from db.postgres_db import get_session
 from db.redis_db import RedisCache, get_redis
 
 
+def encode_cursor(auth: Authentication) -> str:
+    """Непрозрачный курсор: позиция последней записи страницы."""
+    raw = f"{auth.date_auth.isoformat()}|{auth.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_auth, auth_id = raw.split("|")
+        return datetime.fromisoformat(date_auth), uuid.UUID(auth_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
 class AuthService(BaseService):
     def __init__(self, cache: RedisCache, storage: AsyncSession):
         super().__init__(cache, storage)
         self.model = Authentication
 
     async def new_auth(self, auth_params) -> None:
-        # добавление в бд pg данных об аутентификации модель Authentication
-        await self.create_new_instance(auth_params)
+        # событие входа попадает в Redis stream, в authentication его
+        # пачками записывает фоновая задача
+        await login_events.submit(auth_params.user_id, auth_params.user_agent)
+        # история входов этого пользователя какое-то время читается с primary
+        await self._mark_written(auth_params.user_id)
 
     async def login_history(
-        self, access_token: str, limit: int = 10, page_number: int = 1
-    ) -> list[Authentication]:
-
+        self,
+        access_token: str,
+        limit: int = 10,
+        cursor: Union[str, None] = None,
+        date_from: Union[datetime, None] = None,
+        date_to: Union[datetime, None] = None,
+    ) -> tuple[list[Authentication], Union[str, None]]:
+        """Страница истории входов и курсор следующей страницы (None, если она последняя)."""
         payload = decode_jwt(jwt_token=access_token)
         user_uuid = payload.get("sub")
-        # получить историю авторизаций по id_user_history модель Authentication
+        # вход появляется в истории после записи фоновой задачей,
+        # не позже чем через login_events_flush_interval при живом Postgres
+        after = decode_cursor(cursor) if cursor else None
+        # запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
         auths_list = await self.get_login_history(
-            user_uuid, limit=limit, offset=limit * (page_number - 1)
+            user_uuid, limit=limit + 1, after=after, date_from=date_from, date_to=date_to
         )
-        if auths_list is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="user not found"
-            )
-        return auths_list
+        if len(auths_list) <= limit:
+            return auths_list, None
+        auths_list = auths_list[:limit]
+        return auths_list, encode_cursor(auths_list[-1])
 
 
 @lru_cache()
@@ -1,32 +1,82 @@
 import backoff
 import json
+import uuid
 
 from abc import ABC
+from datetime import datetime
+from sqlalchemy import any_, bindparam, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import DBAPIError
 from fastapi.encoders import jsonable_encoder
-from typing import Union
+from typing import Iterable, Union
 
 
 from redis.exceptions import ConnectionError as conn_err_redis
 from asyncpg.exceptions import PostgresConnectionError as conn_err_pg
+from db import replicas
 from db.redis_db import RedisCache
-from db.postgres_db import AsyncSession
+from db.postgres_db import AsyncSession, replica_set
 from models.entity import User, Authentication, Roles, Permissions
 from core.config import settings
+from core.constains import USER_STATUS_KEY_PREFIX, USER_STATUS_CHANNEL, ROLES_CHANNEL
 from services.utils import decode_jwt
+from services.token_store import TokenStore, WHITE_LIST, BLACK_LIST
+from services.snapshot import (
+    UserSnapshot,
+    RoleSnapshot,
+    user_snapshot_key,
+    role_snapshot_key,
+)
 
 
 class AbstractBaseService(ABC):
     pass
 
 
+def any_ids(ids: Iterable[str]):
+    """= ANY($1) с массивом UUID: один подготовленный запрос при любом числе id."""
+    return any_(bindparam(
+        "ids", [uuid.UUID(value) for value in ids], type_=ARRAY(PG_UUID(as_uuid=True))
+    ))
+
+
+def login_history_stmt(
+    user_uuid: str,
+    limit: int = 10,
+    after: Union[tuple[datetime, uuid.UUID], None] = None,
+    date_from: Union[datetime, None] = None,
+    date_to: Union[datetime, None] = None,
+):
+    """Запрос страницы истории входов; его же план проверяет функциональный тест.
+
+    after - (date_auth, id) последней записи предыдущей страницы.
+    Условия на date_auth задаются отдельно от сравнения кортежей:
+    по ним планировщик отсекает лишние партиции authentication.
+    """
+    stmt = select(Authentication).filter(Authentication.user_id == user_uuid)
+    if date_from is not None:
+        stmt = stmt.filter(Authentication.date_auth >= date_from)
+    if date_to is not None:
+        stmt = stmt.filter(Authentication.date_auth < date_to)
+    if after is not None:
+        after_date, after_id = after
+        stmt = stmt.filter(
+            Authentication.date_auth <= after_date,
+            tuple_(Authentication.date_auth, Authentication.id) < tuple_(after_date, after_id),
+        )
+    return stmt.order_by(
+        Authentication.date_auth.desc(), Authentication.id.desc()
+    ).limit(limit)
+
+
 class BaseService(AbstractBaseService):
     def __init__(self, cache: RedisCache, storage: AsyncSession):
         self.cache = cache
         self.storage = storage
         self.model = None
+        self.token_store = TokenStore(cache)
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def create_new_instance(self, model_params):
@@ -37,11 +87,13 @@ class BaseService(AbstractBaseService):
         instance = self.model(**models_dto)
         self.storage.add(instance)
         try:
+            # значения по умолчанию вычисляются на стороне python, серверные
+            # ORM забирает через INSERT ... RETURNING - refresh() не нужен
             await self.storage.commit()
         except Exception as e:
             print(f"Ошибка при создании объекта: {e}")
             return None
-        await self.storage.refresh(instance)
+        await self._mark_instance_written(instance)
         return instance
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
@@ -65,22 +117,37 @@ class BaseService(AbstractBaseService):
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def change_instance_data(self, instance_id: int, model_params: dict):
         try:
-            instance = await self.storage.get(self.model, instance_id)
-            if instance is None:
-                return None
-
             if not isinstance(model_params, dict):
                 updated_data = jsonable_encoder(model_params)
             else:
                 updated_data = model_params
 
-            for field, value in updated_data.items():
-                if field in ["email", "password"] and value is None:
-                    continue
-                setattr(instance, field, value)
+            columns = self.model.__table__.columns.keys()
+            values = {
+                field: value
+                for field, value in updated_data.items()
+                if field in columns
+                and field != "id"
+                and not (field in ["email", "password"] and value is None)
+            }
+            if values:
+                # UPDATE ... RETURNING: одна команда и сразу итоговая строка
+                stmt = (
+                    update(self.model)
+                    .where(self.model.id == instance_id)
+                    .values(**values)
+                    .returning(self.model)
+                )
+            else:
+                stmt = select(self.model).where(self.model.id == instance_id)
+            result = await self.storage.execute(stmt)
+            instance = result.scalars().first()
+            if instance is None:
+                return None
 
             await self.storage.commit()
-            await self.storage.refresh(instance)
+            await self._invalidate_instance_snapshot(instance)
+            await self._mark_instance_written(instance)
             return instance
         except DBAPIError:
             return None
@@ -114,8 +181,13 @@ class BaseService(AbstractBaseService):
         try:
             instance = await self.storage.get(self.model, id)
             if instance:
+                keys = await self._snapshot_keys_for_delete(instance)
                 await self.storage.delete(instance)
                 await self.storage.commit()
+                await self._invalidate_snapshots(*keys)
+                await self._mark_instance_written(instance)
+                if isinstance(instance, Roles):
+                    await self._notify_roles_changed(instance.id)
                 return True
             else:
                 return False
@@ -125,77 +197,112 @@ class BaseService(AbstractBaseService):
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def get_all_instance(self):
         stmt = select(Roles).options(selectinload(Roles.permissions))
-        result = await self.storage.execute(stmt)
+        result = await replicas.reader(self.storage).execute(stmt)
         instance = result.fetchall()
         return instance
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
-    async def get_login_history(self, user_uuid: str, limit: int = 10, offset: int = 0):
-        user = await self.storage.get(User, user_uuid)
-        if user is None:
-            return None
-
-        stmt = (
-            select(self.model)
-            .filter(self.model.user_id == user_uuid)
-            .offset(offset)
-            .limit(limit)
-        )
-        result = await self.storage.execute(stmt)
-        instance = result.scalars().all()
-        return instance
+    async def get_login_history(
+        self,
+        user_uuid: str,
+        limit: int = 10,
+        after: Union[tuple[datetime, uuid.UUID], None] = None,
+        date_from: Union[datetime, None] = None,
+        date_to: Union[datetime, None] = None,
+    ) -> list[Authentication]:
+        """Страница истории входов по ключу (date_auth DESC, id DESC)."""
+        stmt = login_history_stmt(user_uuid, limit, after, date_from, date_to)
+        result = await replicas.reader(self.storage).execute(stmt)
+        return list(result.scalars().all())
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def permission_to_role(self, permissions_id: str, role_id: str):
-        role = await self.storage.get(Roles, role_id)
-        permissions = await self.storage.get(Permissions, permissions_id)
-        if role is not None and permissions is not None:
-            permissions.role = role
-            self.storage.add(permissions)
+        """Назначает разрешение роли; возвращает id роли или None.
+
+        Одна команда UPDATE ... FROM ... RETURNING возвращает прежнюю роль
+        разрешения, существование новой роли проверяет внешний ключ.
+        """
+        previous = (
+            select(Permissions.id, Permissions.role_id.label("previous_role_id"))
+            .where(Permissions.id == permissions_id)
+            .with_for_update()
+            .subquery()
+        )
+        stmt = (
+            update(Permissions)
+            .where(Permissions.id == previous.c.id)
+            .values(role_id=role_id)
+            .returning(Permissions.role_id, previous.c.previous_role_id)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            row = (await self.storage.execute(stmt)).first()
+            if row is None:
+                return None
             await self.storage.commit()
-            await self.storage.refresh(permissions)
-            await self.storage.refresh(role)
-            return role
-        else:
+        except DBAPIError:
+            # роли не существует (внешний ключ) или id некорректен
+            await self.storage.rollback()
             return None
+        new_role_id, previous_role_id = row
+        # разрешение могло принадлежать другой роли - сбрасываем обе
+        role_ids = [new_role_id]
+        if previous_role_id is not None and previous_role_id != new_role_id:
+            role_ids.append(previous_role_id)
+        await self._invalidate_snapshots(*[role_snapshot_key(role_id) for role_id in role_ids])
+        await self._mark_written(replicas.ALL_SUBJECTS)
+        await self._notify_roles_changed(*role_ids)
+        return new_role_id
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def permission_from_role(self, permissions_id: str, role_id: str):
-        role = await self.storage.get(Roles, role_id)
-        permissions = await self.storage.get(Permissions, permissions_id)
-        if role is not None and permissions is not None:
-            if permissions.role_id == role.id:
-                permissions.role = None
-                await self.storage.commit()
-                return True
-            else:
-                return False
-        else:
+        stmt = (
+            update(Permissions)
+            .where(Permissions.id == permissions_id, Permissions.role_id == role_id)
+            .values(role_id=None)
+            .returning(Permissions.id)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            updated = (await self.storage.execute(stmt)).first()
+        except DBAPIError:
+            await self.storage.rollback()
+            return False
+        if updated is None:
             return False
+        await self.storage.commit()
+        await self._invalidate_snapshots(role_snapshot_key(role_id))
+        await self._mark_written(replicas.ALL_SUBJECTS)
+        await self._notify_roles_changed(role_id)
+        return True
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def set_user_role(self, user_id, role_id):
-        user: User = await self.storage.get(User, user_id)
-        role = await self.storage.get(Roles, role_id)
-        if user is not None and role is not None:
-            user.role = role
-            self.storage.add(user)
+        # существование роли проверяет внешний ключ users.role_id
+        stmt = update(User).where(User.id == user_id).values(role_id=role_id).returning(User)
+        try:
+            user = (await self.storage.execute(stmt)).scalars().first()
+            if user is None:
+                return None
             await self.storage.commit()
-            await self.storage.refresh(user)
-            return user
-        else:
+        except DBAPIError:
+            await self.storage.rollback()
             return None
+        await self._invalidate_snapshots(user_snapshot_key(user.id))
+        await self._mark_written(user.id)
+        return user
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def get_user_role(self, user_id):
-        user = await self.storage.get(User, user_id)
+        session = replicas.reader(self.storage)
+        user = await session.get(User, user_id)
         if user is not None and user.role_id is not None:
             stmt = (
                 select(Roles)
                 .options(selectinload(Roles.permissions))
                 .where(Roles.id == user.role_id)
             )
-            result = await self.storage.execute(stmt)
+            result = await session.execute(stmt)
             role = result.fetchone()
             if role is not None:
                 return role
@@ -206,15 +313,148 @@ class BaseService(AbstractBaseService):
 
     @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
     async def del_user_role(self, user_id):
-        user: User = await self.storage.get(User, user_id)
-        if user is not None:
-            user.role_id = None
-            self.storage.add(user)
-            await self.storage.commit()
-            await self.storage.refresh(user)
-            return True
-        else:
+        stmt = update(User).where(User.id == user_id).values(role_id=None).returning(User.id)
+        try:
+            updated = (await self.storage.execute(stmt)).first()
+        except DBAPIError:
+            await self.storage.rollback()
+            return False
+        if updated is None:
             return False
+        await self.storage.commit()
+        await self._invalidate_snapshots(user_snapshot_key(updated.id))
+        await self._mark_written(updated.id)
+        return True
+
+    @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
+    async def get_user_snapshot(self, user_id) -> Union[UserSnapshot, None]:
+        """Снимок пользователя: сначала из Redis, при промахе из Postgres."""
+        key = user_snapshot_key(user_id)
+        if settings.snapshot_cache_enabled:
+            data = await self.cache.get(key)
+            if data:
+                return UserSnapshot.model_validate_json(data)
+
+        user = await replicas.reader(self.storage).get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_orm_user(user)
+        if settings.snapshot_cache_enabled:
+            await self.cache.set(key, snapshot.dump(), settings.snapshot_cache_expire)
+        return snapshot
+
+    @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
+    async def get_role_snapshot(self, role_id) -> Union[RoleSnapshot, None]:
+        """Снимок роли с названиями разрешений: сначала из Redis, при промахе из Postgres."""
+        key = role_snapshot_key(role_id)
+        if settings.snapshot_cache_enabled:
+            data = await self.cache.get(key)
+            if data:
+                return RoleSnapshot.model_validate_json(data)
+
+        stmt = (
+            select(Roles)
+            .options(selectinload(Roles.permissions))
+            .where(Roles.id == role_id)
+        )
+        result = await replicas.reader(self.storage).execute(stmt)
+        role = result.scalars().first()
+        if role is None:
+            return None
+        snapshot = RoleSnapshot.from_orm_role(role)
+        if settings.snapshot_cache_enabled:
+            await self.cache.set(key, snapshot.dump(), settings.snapshot_cache_expire)
+        return snapshot
+
+    @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
+    async def get_user_snapshots(self, user_ids: Iterable[str]) -> dict[str, UserSnapshot]:
+        """Снимки нескольких пользователей: MGET из Redis, промахи - одним запросом."""
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        snapshots = await self._cached_snapshots(user_ids, user_snapshot_key, UserSnapshot)
+        missing = [user_id for user_id in user_ids if user_id not in snapshots]
+        if missing:
+            result = await self.storage.execute(select(User).where(User.id == any_ids(missing)))
+            loaded = {str(user.id): UserSnapshot.from_orm_user(user) for user in result.scalars().all()}
+            await self._cache_snapshots({user_snapshot_key(key): value for key, value in loaded.items()})
+            snapshots.update(loaded)
+        return snapshots
+
+    @backoff.on_exception(backoff.expo, conn_err_pg, max_tries=5)
+    async def get_role_snapshots(self, role_ids: Iterable[str]) -> dict[str, RoleSnapshot]:
+        """Снимки нескольких ролей: MGET из Redis, промахи - одним запросом."""
+        role_ids = list(dict.fromkeys(str(role_id) for role_id in role_ids))
+        snapshots = await self._cached_snapshots(role_ids, role_snapshot_key, RoleSnapshot)
+        missing = [role_id for role_id in role_ids if role_id not in snapshots]
+        if missing:
+            stmt = (
+                select(Roles)
+                .options(selectinload(Roles.permissions))
+                .where(Roles.id == any_ids(missing))
+            )
+            result = await self.storage.execute(stmt)
+            loaded = {str(role.id): RoleSnapshot.from_orm_role(role) for role in result.scalars().all()}
+            await self._cache_snapshots({role_snapshot_key(key): value for key, value in loaded.items()})
+            snapshots.update(loaded)
+        return snapshots
+
+    async def _cached_snapshots(self, ids: list[str], key, model) -> dict:
+        if not settings.snapshot_cache_enabled or not ids:
+            return {}
+        cached = await self.cache.get_many(key(snapshot_id) for snapshot_id in ids)
+        return {
+            snapshot_id: model.model_validate_json(data)
+            for snapshot_id, data in zip(ids, cached) if data
+        }
+
+    async def _cache_snapshots(self, snapshots: dict) -> None:
+        if settings.snapshot_cache_enabled and snapshots:
+            await self.cache.set_many(
+                {key: snapshot.dump() for key, snapshot in snapshots.items()},
+                settings.snapshot_cache_expire,
+            )
+
+    async def _snapshot_keys_for_delete(self, instance) -> list[str]:
+        if isinstance(instance, User):
+            return [user_snapshot_key(instance.id)]
+        if isinstance(instance, Roles):
+            # пользователи роли удаляются каскадно, их снимки тоже нужно сбросить
+            result = await self.storage.execute(
+                select(User.id).where(User.role_id == instance.id)
+            )
+            keys = [user_snapshot_key(user_id) for user_id in result.scalars().all()]
+            keys.append(role_snapshot_key(instance.id))
+            return keys
+        return []
+
+    async def _invalidate_instance_snapshot(self, instance):
+        if isinstance(instance, User):
+            await self._invalidate_snapshots(user_snapshot_key(instance.id))
+        elif isinstance(instance, Roles):
+            await self._invalidate_snapshots(role_snapshot_key(instance.id))
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def _invalidate_snapshots(self, *keys: str):
+        if self.cache is not None and keys:
+            await self.cache.delete(*keys)
+
+    async def _mark_instance_written(self, instance):
+        if isinstance(instance, User):
+            await self._mark_written(instance.id)
+        elif isinstance(instance, Roles):
+            await self._mark_written(replicas.ALL_SUBJECTS)
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def _mark_written(self, *subjects):
+        """Read-your-writes: ближайшие чтения о subjects пойдут на primary."""
+        await replica_set.mark_written(self.cache, *subjects)
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def _notify_roles_changed(self, *role_ids):
+        """Событие для индексов разрешений в воркерах (services/permission_index.py)."""
+        if self.cache is None:
+            return
+        for role_id in role_ids:
+            await self.cache.publish(ROLES_CHANNEL, str(role_id))
 
     @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
     async def _put_to_cache(
@@ -252,35 +492,40 @@ class BaseService(AbstractBaseService):
                 instance_data = self.model(**instance_data)
         return instance_data
 
-    async def add_to_white_list(self, token, token_type):
-        payload = decode_jwt(jwt_token=token)
-        key = "white_list:" + payload.get("self_uuid")
-        if token_type == "refresh":
-            expire = settings.auth_jwt.refresh_token_expire_minutes
-        else:
-            expire = settings.auth_jwt.access_token_expire_minutes
-        await self._put_to_cache(key, token, expire)
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def invalidate_user_status(self, user_id):
+        """Сброс закэшированного статуса пользователя в других сервисах."""
+        await self.cache.delete(USER_STATUS_KEY_PREFIX + str(user_id))
+        await self.cache.publish(USER_STATUS_CHANNEL, str(user_id))
+
+    async def add_to_white_list(self, token):
+        await self.token_store.add(WHITE_LIST, decode_jwt(jwt_token=token))
 
-    async def get_from_white_list(self, token):
-        payload = decode_jwt(jwt_token=token)
-        key = "white_list:" + payload.get("self_uuid")
-        return await self._get_from_cache(key)
+    async def get_from_white_list(self, token) -> bool:
+        return await self.token_store.contains(WHITE_LIST, decode_jwt(jwt_token=token))
 
     async def del_from_white_list(self, token):
-        payload = decode_jwt(jwt_token=token)
-        key = "white_list:" + payload.get("self_uuid")
-        await self._delete_from_cache(key)
-
-    async def add_to_black_list(self, token, token_type):
-        payload = decode_jwt(jwt_token=token)
-        key = "black_list:" + payload.get("self_uuid")
-        if token_type == "refresh":
-            expire = settings.auth_jwt.refresh_token_expire_minutes
-        else:
-            expire = settings.auth_jwt.access_token_expire_minutes
-        await self._put_to_cache(key, token, expire)
+        await self.token_store.remove(WHITE_LIST, decode_jwt(jwt_token=token))
+
+    async def add_to_black_list(self, token):
+        await self.token_store.add(BLACK_LIST, decode_jwt(jwt_token=token))
+
+    async def get_from_black_list(self, token) -> bool:
+        return await self.is_token_revoked(decode_jwt(jwt_token=token))
 
-    async def get_from_black_list(self, token):
-        payload = decode_jwt(jwt_token=token)
-        key = "black_list:" + payload.get("self_uuid")
-        return await self._get_from_cache(key)
+    async def is_token_revoked(self, payload: dict) -> bool:
+        return await self.token_store.contains(BLACK_LIST, payload)
+
+    @backoff.on_exception(backoff.expo, conn_err_redis, max_tries=5)
+    async def update_token_lists(
+        self,
+        black_list: Iterable[str] = (),
+        white_list: Iterable[str] = (),
+        del_white_list: Iterable[str] = (),
+    ):
+        """Изменение белого и черного списков одной транзакцией MULTI/EXEC."""
+        await self.token_store.update(
+            black_list=[decode_jwt(jwt_token=token) for token in black_list],
+            white_list=[decode_jwt(jwt_token=token) for token in white_list],
+            del_white_list=[decode_jwt(jwt_token=token) for token in del_white_list],
+        )
@@ -0,0 +1,234 @@
+import asyncio
+import bisect
+import logging
+import os
+import socket
+import time
+import uuid
+
+from datetime import datetime
+from typing import Callable, Union
+
+from redis.exceptions import ConnectionError as conn_err_redis, ResponseError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import metrics
+from core.config import settings
+from core.constains import LOGIN_EVENTS_STREAM, LOGIN_EVENTS_GROUP
+from db import postgres_db
+from db.redis_db import RedisCache
+from models.entity import Authentication
+
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм размера пачки и задержки записи, мс
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000)
+LAG_BUCKETS_MS = (10, 50, 100, 500, 1000, 5000, 30000)
+
+
+def _histogram(buckets: tuple) -> list[int]:
+    return [0] * (len(buckets) + 1)
+
+
+def _labels(buckets: tuple, unit: str = "") -> list[str]:
+    return [f"le_{bound}{unit}" for bound in buckets] + ["inf"]
+
+
+def _encode(event: dict) -> dict:
+    return {
+        "id": str(event["id"]),
+        "user_id": str(event["user_id"]),
+        "user_agent": event["user_agent"],
+        "date_auth": event["date_auth"].isoformat(),
+    }
+
+
+def _decode(fields: dict) -> dict:
+    return {
+        "id": uuid.UUID(fields[b"id"].decode()),
+        "user_id": uuid.UUID(fields[b"user_id"].decode()),
+        "user_agent": fields[b"user_agent"].decode(),
+        "date_auth": datetime.fromisoformat(fields[b"date_auth"].decode()),
+    }
+
+
+class LoginEventWriter:
+    """Фоновая пакетная запись истории входов в authentication.
+
+    /login добавляет событие в Redis stream (XADD) и не ждет Postgres.
+    Фоновая задача каждого воркера читает stream через группу потребителей,
+    пишет события одним многострочным INSERT, как только набралась пачка
+    или прошло flush_interval, и только после commit подтверждает записи
+    (XACK + XDEL). Записи упавшего воркера или неудавшегося INSERT остаются
+    в stream и забираются по XAUTOCLAIM; повторная вставка события
+    игнорируется по первичному ключу.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._task: Union[asyncio.Task, None] = None
+        self._stopping = False
+        self._cache: Union[RedisCache, None] = None
+        self._session_factory: Callable[[], AsyncSession] = postgres_db.async_session
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.direct = 0
+        self.recovered = 0
+        self.failed_batches = 0
+        self.batch_size_histogram = _histogram(BATCH_SIZE_BUCKETS)
+        self.lag_histogram = _histogram(LAG_BUCKETS_MS)
+        self.last_lag_ms = 0.0
+
+    async def start(self, cache: RedisCache, session_factory: Callable[[], AsyncSession]) -> None:
+        self._cache = cache
+        self._session_factory = session_factory
+        try:
+            await cache.redis.xgroup_create(LOGIN_EVENTS_STREAM, LOGIN_EVENTS_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._stopping = False
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу после записи текущей пачки.
+
+        Непрочитанные события остаются в stream для остальных воркеров.
+        """
+        # флаг вместо cancel(): отмена между INSERT и XACK приведет
+        # к повторной (пустой) вставке пачки после XAUTOCLAIM
+        self._stopping = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def submit(self, user_id, user_agent: str) -> None:
+        event = {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "user_agent": user_agent,
+            "date_auth": datetime.now(),
+        }
+        if self._task is None:
+            # writer не запущен (например, в CLI) - пишем сразу
+            await self._insert([event])
+            return
+        try:
+            await self._cache.stream_add(LOGIN_EVENTS_STREAM, [_encode(event)])
+        except conn_err_redis as e:
+            logger.warning(f"Redis недоступен, событие входа пишется в Postgres напрямую: {e}")
+            await self._insert([event])
+            self.direct += 1
+            return
+        self.submitted += 1
+
+    async def run(self) -> None:
+        next_recover = time.monotonic()
+        while not self._stopping:
+            try:
+                entries = await self._collect()
+                if entries:
+                    await self._write(entries)
+                if time.monotonic() >= next_recover:
+                    await self._recover()
+                    next_recover = time.monotonic() + settings.login_events_recover_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ошибка фоновой записи событий входа: {e}")
+                await asyncio.sleep(1)
+
+    async def _read(self, count: int, block_ms: int) -> list:
+        response = await self._cache.redis.xreadgroup(
+            LOGIN_EVENTS_GROUP, self.consumer, {LOGIN_EVENTS_STREAM: ">"}, count=count, block=block_ms
+        )
+        return response[0][1] if response else []
+
+    async def _collect(self) -> list:
+        """Ждет первые записи stream, затем добирает пачку до batch_size или flush_interval."""
+        entries = await self._read(self.batch_size, int(self.flush_interval * 1000))
+        if not entries:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(entries) < self.batch_size:
+            timeout_ms = int((deadline - time.monotonic()) * 1000)
+            if timeout_ms <= 0:
+                break
+            more = await self._read(self.batch_size - len(entries), timeout_ms)
+            if not more:
+                break
+            entries.extend(more)
+        return entries
+
+    async def _write(self, entries: list) -> int:
+        """INSERT пачки и подтверждение ее записей; при ошибке записи остаются в stream."""
+        ids = [entry_id for entry_id, _ in entries]
+        # записи, удаленные из stream до XAUTOCLAIM, приходят без полей
+        events = [_decode(fields) for _, fields in entries if fields]
+        if events:
+            try:
+                await self._insert(events)
+            except Exception as e:
+                logger.warning(f"Не удалось записать {len(events)} событий входа, повтор после XAUTOCLAIM: {e}")
+                self.failed_batches += 1
+                return 0
+        await self._cache.stream_ack(LOGIN_EVENTS_STREAM, LOGIN_EVENTS_GROUP, ids)
+        return len(events)
+
+    async def _insert(self, events: list[dict]) -> None:
+        async with self._session_factory() as session:
+            await session.execute(insert(Authentication).values(events).on_conflict_do_nothing(index_elements=["id"]))
+            await session.commit()
+        self._observe(events)
+
+    def _observe(self, events: list[dict]) -> None:
+        self.written += len(events)
+        self.batches += 1
+        self.batch_size_histogram[bisect.bisect_left(BATCH_SIZE_BUCKETS, len(events))] += 1
+        # задержка записи - возраст самого старого события пачки
+        lag_ms = (datetime.now() - min(event["date_auth"] for event in events)).total_seconds() * 1000
+        self.last_lag_ms = lag_ms
+        self.lag_histogram[bisect.bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+
+    async def _recover(self) -> None:
+        """Забирает записи, не подтвержденные упавшими воркерами или после ошибки INSERT."""
+        while not self._stopping:
+            _, entries, *_ = await self._cache.redis.xautoclaim(
+                LOGIN_EVENTS_STREAM,
+                LOGIN_EVENTS_GROUP,
+                self.consumer,
+                min_idle_time=int(settings.login_events_claim_idle * 1000),
+                count=self.batch_size,
+            )
+            if not entries:
+                return
+            written = await self._write(entries)
+            if not written and any(fields for _, fields in entries):
+                # Postgres все еще недоступен - следующая попытка через recover_interval
+                return
+            self.recovered += written
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "written_directly": self.direct,
+            "recovered_from_stream": self.recovered,
+            "batch_size": dict(zip(_labels(BATCH_SIZE_BUCKETS), self.batch_size_histogram)),
+            "lag": dict(zip(_labels(LAG_BUCKETS_MS, "ms"), self.lag_histogram)),
+            "last_lag_ms": self.last_lag_ms,
+        }
+
+
+login_events = LoginEventWriter(
+    batch_size=settings.login_events_batch_size,
+    flush_interval=settings.login_events_flush_interval,
+)
+metrics.register("login_events", login_events.stats)
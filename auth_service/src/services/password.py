@@ -0,0 +1,251 @@
+import asyncio
+import bisect
+import logging
+import statistics
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from core import metrics
+from core.config import settings
+from core.constains import BCRYPT_ROUNDS_KEY
+from db.redis_db import RedisCache
+
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени проверки пароля, мс
+VERIFY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+BCRYPT_MIN_ROUNDS = 4
+BCRYPT_MAX_ROUNDS = 16
+
+
+def build_context(schemes: list[str], bcrypt_rounds: Optional[int], tolerance: int = 0) -> CryptContext:
+    """Первая схема используется для новых хешей, остальные только проверяются.
+
+    Хеши устаревших схем и bcrypt-хеши с cost дальше tolerance от заданного
+    помечаются needs_update, поэтому при входе они пересчитываются как в большую,
+    так и в меньшую сторону; соседние значения cost пересчета не вызывают.
+    """
+    options = {}
+    if bcrypt_rounds is not None and "bcrypt" in schemes:
+        options.update(
+            bcrypt__default_rounds=bcrypt_rounds,
+            bcrypt__min_rounds=max(BCRYPT_MIN_ROUNDS, bcrypt_rounds - tolerance),
+            bcrypt__max_rounds=min(BCRYPT_MAX_ROUNDS, bcrypt_rounds + tolerance),
+        )
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+def configure(schemes: list[str], bcrypt_rounds: Optional[int], tolerance: int = 0) -> None:
+    # settings.pwd_context используют и синхронные хелперы из services/utils.py
+    settings.pwd_context = build_context(schemes, bcrypt_rounds, tolerance)
+
+
+def calibrate_bcrypt_rounds(target_ms: float, samples: int = 5) -> int:
+    """Наибольший cost bcrypt, при котором медиана samples проверок укладывается в target_ms."""
+    rounds = BCRYPT_MIN_ROUNDS
+    for candidate in range(BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS + 1):
+        context = build_context(["bcrypt"], candidate)
+        hashed = context.hash("calibration")
+        timings = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            context.verify("calibration", hashed)
+            timings.append((time.perf_counter() - started) * 1000)
+        if statistics.median(timings) > target_ms:
+            break
+        rounds = candidate
+    return rounds
+
+
+def _hash(password: str) -> str:
+    return settings.pwd_context.hash(password)
+
+
+def _hash_many(passwords: list[str]) -> list[str]:
+    return [settings.pwd_context.hash(password) for password in passwords]
+
+
+def _verify_and_update(hashed_password: str, password: str) -> tuple[bool, Optional[str], str, float]:
+    started = time.perf_counter()
+    try:
+        scheme = settings.pwd_context.identify(hashed_password)
+        valid, new_hash = settings.pwd_context.verify_and_update(password, hashed_password)
+    except ValueError:
+        scheme, valid, new_hash = "unknown", False, None
+    return valid, new_hash, scheme, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Хеширование и проверка паролей в пуле процессов.
+
+    bcrypt занимает десятки миллисекунд CPU и в обработчике блокировал бы
+    event loop. Число ожидающих задач ограничено: при переполнении
+    запрос отклоняется с 503, а не копится в очереди.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, import_workers: int = 1):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.import_workers = import_workers
+        self._executor: Union[ProcessPoolExecutor, None] = None
+        self._import_executor: Union[ProcessPoolExecutor, None] = None
+        self.schemes = list(settings.password_schemes)
+        self.bcrypt_rounds = settings.password_bcrypt_rounds
+        self.tolerance = settings.password_bcrypt_rounds_tolerance
+        self.in_flight = 0
+        self.import_in_flight = 0
+        self.imported = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.busy_time = 0.0
+        self.verify_histograms: dict[str, list[int]] = {}
+        self._started_at = time.monotonic()
+
+    async def start(self, cache: Optional[RedisCache] = None) -> None:
+        if self.bcrypt_rounds is None and "bcrypt" in self.schemes:
+            self.bcrypt_rounds = await self._calibrated_rounds(cache)
+        configure(self.schemes, self.bcrypt_rounds, self.tolerance)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=configure,
+            initargs=(self.schemes, self.bcrypt_rounds, self.tolerance),
+        )
+        # процессы пула создаются при первой задаче, то есть при первом импорте
+        self._import_executor = ProcessPoolExecutor(
+            max_workers=self.import_workers,
+            initializer=configure,
+            initargs=(self.schemes, self.bcrypt_rounds, self.tolerance),
+        )
+        self._started_at = time.monotonic()
+
+    async def _calibrated_rounds(self, cache: Optional[RedisCache]) -> int:
+        """cost bcrypt, общий для всех воркеров и экземпляров.
+
+        Калибрует первый запустившийся воркер, остальные берут его результат
+        из Redis: воркеры с разным cost пересчитывали бы хеши друг друга.
+        Без Redis (CLI) cost калибруется локально.
+        """
+        if cache is not None:
+            stored = await cache.get(BCRYPT_ROUNDS_KEY)
+            if stored is not None:
+                return int(stored)
+        rounds = calibrate_bcrypt_rounds(
+            settings.password_target_verify_ms, settings.password_calibration_samples
+        )
+        logger.info(f"bcrypt cost откалиброван: {rounds}")
+        if cache is not None:
+            # воркер, откалибровавший параллельно, принимает уже сохраненное значение
+            await cache.redis.set(BCRYPT_ROUNDS_KEY, rounds, nx=True)
+            rounds = int(await cache.get(BCRYPT_ROUNDS_KEY))
+        return rounds
+
+    def shutdown(self) -> None:
+        for executor in (self._executor, self._import_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._import_executor = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            # пул не запущен (например, в CLI) - выполняем синхронно
+            return func(*args)
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing is overloaded, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        started = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.busy_time += time.monotonic() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def hash_many(
+        self,
+        passwords: list[str],
+        chunk_size: int = settings.bulk_import_hash_chunk_size,
+    ) -> list[str]:
+        """Пакетное хеширование для импорта в отдельном пуле из import_workers процессов.
+
+        Пул проверки паролей и его очередь импорт не занимает: входы во время
+        импорта не ждут за пачкой хешей и сохраняют отказ 503 при перегрузке.
+        """
+        if self._import_executor is None:
+            return _hash_many(passwords)
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        loop = asyncio.get_running_loop()
+        self.import_in_flight += len(chunks)
+        try:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._import_executor, _hash_many, chunk) for chunk in chunks)
+            )
+        finally:
+            self.import_in_flight -= len(chunks)
+        self.imported += len(passwords)
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def verify(self, hashed_password: str, password: str) -> bool:
+        valid, _ = await self.verify_and_update(hashed_password, password)
+        return valid
+
+    async def verify_and_update(self, hashed_password: str, password: str) -> tuple[bool, Optional[str]]:
+        """Проверка пароля; при успехе и устаревшем хеше возвращает новый хеш."""
+        valid, new_hash, scheme, elapsed = await self._run(_verify_and_update, hashed_password, password)
+        self._observe(scheme, elapsed)
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def _observe(self, scheme: str, elapsed: float) -> None:
+        histogram = self.verify_histograms.setdefault(scheme, [0] * (len(VERIFY_BUCKETS_MS) + 1))
+        histogram[bisect.bisect_left(VERIFY_BUCKETS_MS, elapsed * 1000)] += 1
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self._started_at
+        labels = [f"le_{bound}ms" for bound in VERIFY_BUCKETS_MS] + ["inf"]
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.max_workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "import_workers": self.import_workers,
+            "import_in_flight": self.import_in_flight,
+            "imported": self.imported,
+            # доля времени, в течение которого воркеры пула были заняты (с учетом ожидания в очереди)
+            "utilization": self.busy_time / (uptime * self.max_workers) if uptime else 0.0,
+            "schemes": self.schemes,
+            "bcrypt_rounds": self.bcrypt_rounds,
+            "bcrypt_rounds_tolerance": self.tolerance,
+            "rehashed": self.rehashed,
+            "verify_time": {
+                scheme: dict(zip(labels, histogram))
+                for scheme, histogram in self.verify_histograms.items()
+            },
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_queue,
+    import_workers=settings.bulk_import_hash_workers,
+)
+metrics.register("password_hasher", password_hasher.stats)
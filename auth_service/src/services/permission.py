@@ -1,4 +1,5 @@
 from fastapi import Depends
+from fastapi.encoders import jsonable_encoder
 from functools import lru_cache
 
 from models.entity import Permissions
@@ -13,7 +14,8 @@ class PermissionService(BaseService):
         self.model = Permissions
 
     async def create_permission(self, params: dict) -> Permissions:
-        permission = await self.create_new_instance(params)
+        # бит в маске токена назначает БД (permissions_bit_seq)
+        permission = await self.create_new_instance(jsonable_encoder(params))
         return permission
 
     async def assign_permission_to_role(self, data: dict) -> bool:
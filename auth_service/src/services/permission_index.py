@@ -0,0 +1,123 @@
+import asyncio
+import logging
+
+from typing import Callable, Union
+
+from redis.exceptions import ConnectionError as conn_err_redis
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constains import ROLES_CHANNEL
+from db.redis_db import RedisCache
+from models.entity import Permissions, Roles
+
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionIndex:
+    """Индекс role_id -> frozenset названий разрешений в памяти воркера.
+
+    Загружается при старте и обновляется по событиям из канала ROLES_CHANNEL,
+    которые публикуют сервисы ролей и разрешений. Там же хранятся номера
+    битов разрешений для маски в access токене - они не меняются, поэтому
+    остаются верными и при потере канала.
+    """
+
+    def __init__(self):
+        self._roles: dict[str, frozenset[str]] = {}
+        self._types: dict[str, str] = {}
+        self._bits: dict[str, int] = {}
+        self.loaded = False
+
+    def get(self, role_id) -> Union[frozenset[str], None]:
+        """Разрешения роли или None, если роль индексу неизвестна."""
+        if not self.loaded or role_id is None:
+            return None
+        return self._roles.get(str(role_id))
+
+    def role_type(self, role_id) -> Union[str, None]:
+        """Название роли или None, если роль индексу неизвестна."""
+        if not self.loaded or role_id is None:
+            return None
+        return self._types.get(str(role_id))
+
+    def bit(self, name: str) -> Union[int, None]:
+        return self._bits.get(name)
+
+    def mask(self, role_id) -> Union[int, None]:
+        """Маска разрешений роли для access токена; None - роль неизвестна."""
+        if role_id is None:
+            return 0
+        permissions = self.get(role_id)
+        if permissions is None:
+            return None
+        mask = 0
+        for name in permissions:
+            bit = self._bits.get(name)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    async def load(self, session: AsyncSession) -> None:
+        result = await session.execute(select(Roles).options(selectinload(Roles.permissions)))
+        roles = result.scalars().all()
+        self._roles = {str(role.id): frozenset(perm.name for perm in role.permissions) for role in roles}
+        self._types = {str(role.id): role.type for role in roles}
+        bits = await session.execute(
+            select(Permissions.name, Permissions.bit).where(Permissions.bit.is_not(None))
+        )
+        self._bits = dict(bits.all())
+        self.loaded = True
+
+    async def refresh_role(self, session: AsyncSession, role_id: str) -> None:
+        stmt = (
+            select(Roles)
+            .options(selectinload(Roles.permissions))
+            .where(Roles.id == role_id)
+        )
+        result = await session.execute(stmt)
+        role = result.scalars().first()
+        if role is None:
+            self._roles.pop(str(role_id), None)
+            self._types.pop(str(role_id), None)
+        else:
+            self._roles[str(role.id)] = frozenset(perm.name for perm in role.permissions)
+            self._types[str(role.id)] = role.type
+            self._bits.update((perm.name, perm.bit) for perm in role.permissions if perm.bit is not None)
+
+    async def listen(self, redis: RedisCache, session_factory: Callable[[], AsyncSession]) -> None:
+        """Инкрементальное обновление индекса по событиям из Redis."""
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(ROLES_CHANNEL)
+                # события, пришедшие до подписки, могли потеряться - перечитываем все
+                async with session_factory() as session:
+                    await self.load(session)
+                while True:
+                    # ожидание с таймаутом: блокирующее чтение listen() упало бы
+                    # по socket_timeout общего пула соединений
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    role_id = message["data"].decode()
+                    async with session_factory() as session:
+                        await self.refresh_role(session, role_id)
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except conn_err_redis:
+                logger.warning("Потеряно соединение с каналом ролей, переподключение")
+                self.loaded = False
+                await pubsub.close()
+                await asyncio.sleep(1)
+            except Exception as e:
+                logger.error(f"Ошибка обновления индекса разрешений: {e}")
+                self.loaded = False
+                await pubsub.close()
+                await asyncio.sleep(1)
+
+
+permission_index = PermissionIndex()
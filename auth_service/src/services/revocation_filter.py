@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+
+from core import metrics
+from core.config import settings
+from core.constains import REVOKED_TOKENS_KEY, REVOKED_TOKENS_CHANNEL
+from db.redis_db import RedisCache
+from utils.bloom import RotatingBloomFilter
+
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationFilter:
+    """Локальный вероятностный фильтр отозванных токенов.
+
+    Ответ "не отозван" точный и не требует обращения к Redis, ответ
+    "возможно отозван" проверяется по черному списку в Redis.
+    Пока фильтр не синхронизирован, все проверки идут в Redis.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, bucket_seconds: int):
+        self.bloom = RotatingBloomFilter(capacity, error_rate, bucket_seconds)
+        self.synced = False
+        self.local_answers = 0
+        self.remote_checks = 0
+
+    def might_be_revoked(self, self_uuid: str) -> bool:
+        if self.synced and self_uuid not in self.bloom:
+            self.local_answers += 1
+            return False
+        self.remote_checks += 1
+        return True
+
+    def add(self, self_uuid: str, expire_at: float) -> None:
+        self.bloom.add(self_uuid, expire_at)
+
+    async def load(self, cache: RedisCache) -> None:
+        now = time.time()
+        await cache.redis.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", now)
+        self.bloom.clear()
+        async for member, score in cache.redis.zscan_iter(REVOKED_TOKENS_KEY, count=10000):
+            self.bloom.add(member.decode(), score)
+        self.synced = True
+
+    async def listen(self, cache: RedisCache) -> None:
+        """Синхронизация с Redis: полная загрузка и далее поток новых отзывов."""
+        while True:
+            pubsub = cache.pubsub()
+            try:
+                # подписываемся до загрузки, чтобы не потерять отзывы во время нее
+                await pubsub.subscribe(REVOKED_TOKENS_CHANNEL)
+                await self.load(cache)
+                next_rotate = time.time() + self.bloom.bucket_seconds
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self_uuid, expire_at = message["data"].decode().split(":")
+                        self.add(self_uuid, float(expire_at))
+                    if time.time() >= next_rotate:
+                        self.bloom.rotate()
+                        next_rotate = time.time() + self.bloom.bucket_seconds
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except Exception as e:
+                logger.warning(f"Фильтр отозванных токенов не синхронизирован: {e}")
+                self.synced = False
+                await pubsub.close()
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        stats = self.bloom.stats()
+        stats.update(
+            synced=self.synced,
+            local_answers=self.local_answers,
+            remote_checks=self.remote_checks,
+        )
+        return stats
+
+
+revocation_filter = RevocationFilter(
+    capacity=settings.revocation_filter_capacity,
+    error_rate=settings.revocation_filter_error_rate,
+    bucket_seconds=settings.revocation_filter_bucket_seconds,
+)
+metrics.register("revocation_filter", revocation_filter.stats)
@@ -26,10 +26,17 @@ class RoleService(BaseService):
 
     async def create(self, role_data: dict) -> Roles:
         """Создание роли."""
-        return await self.create_new_instance(role_data)
+        role = await self.create_new_instance(role_data)
+        if role is not None:
+            await self._notify_roles_changed(role.id)
+        return role
 
     async def update(self, role_id: str, update_data: dict) -> Roles:
-        return await self.change_instance_data(role_id, update_data)
+        role = await self.change_instance_data(role_id, update_data)
+        if role is not None:
+            # название роли хранится в индексе разрешений воркеров
+            await self._notify_roles_changed(role.id)
+        return role
 
     async def delete(self, role_id: str) -> Roles:
         """Удаление роли."""
@@ -0,0 +1,463 @@
+import math
+import time
+
+from typing import Awaitable, Callable, Optional, Union
+
+from redis.commands.core import AsyncScript
+
+from core import metrics
+from core.config import settings
+from core.constains import (
+    REFRESH_USED_KEY_PREFIX,
+    REVOKED_TOKENS_CHANNEL,
+    REVOKED_TOKENS_KEY,
+    SESSION_KEY_PREFIX,
+    SESSIONS_KEY_PREFIX,
+)
+from db.redis_db import RedisCache
+from services.token_store import BLACK_LIST, TOKEN_MARKER, WHITE_LIST, TokenStore
+
+
+# Сессия - цепочка refresh токенов одного входа (claim session_id).
+# sessions:<user_id> - sorted set session_id -> время последнего входа или
+# обновления токенов, мс; session:<session_id> - hash с устройством и
+# идентификаторами текущих access и refresh токенов сессии.
+# Оба ключа живут срок refresh токена с последнего обновления.
+
+# Общее начало скриптов: KEYS[1] - журнал отзывов, ARGV[1..3] - время, мс,
+# канал отзывов и значение записи черного списка.
+# Все ключи, которые трогает скрипт, передаются в KEYS (требование Redis
+# Cluster), поэтому ключи токенов сессий читаются до вызова: группа из трех
+# KEYS (session:<id>, white_list:<refresh>, black_list:<access>) и трех ARGV
+# (id сессии, refresh и access, прочитанные из hash) на сессию, группы - в
+# конце KEYS и ARGV. Если набор сессий или их токены изменились после
+# чтения, скрипт ничего не меняет и возвращает RETRY.
+# Токены завершаемых сессий отзываются тем же вызовом, что и удаляет сессию:
+# иначе обмен refresh токена между удалением сессии и отзывом ее токенов
+# восстановил бы сессию. Скрипт возвращает пары (access, exp) отозванных
+# токенов после собственного результата.
+SCRIPT_PRELUDE = """
+local RETRY = -2
+local now = tonumber(ARGV[1])
+local revoked = {}
+local cleaned = false
+local function revoke(key, access, exp)
+    if not access or access == '' or not exp or exp == '' then
+        return
+    end
+    -- exp токенов прежнего формата дробный (datetime.timestamp())
+    exp = math.ceil(tonumber(exp))
+    local ttl = exp - math.floor(now / 1000)
+    if ttl <= 0 then
+        return
+    end
+    if not cleaned then
+        redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now / 1000)
+        cleaned = true
+    end
+    redis.call('SET', key, ARGV[3], 'EX', ttl)
+    redis.call('ZADD', KEYS[1], exp, access)
+    redis.call('PUBLISH', ARGV[2], access .. ':' .. exp)
+    table.insert(revoked, access)
+    table.insert(revoked, exp)
+end
+local function session_groups(first_key, first_arg)
+    local groups = {}
+    for i = 0, (#KEYS - first_key + 1) / 3 - 1 do
+        table.insert(groups, {
+            key = KEYS[first_key + 3 * i], white = KEYS[first_key + 3 * i + 1], black = KEYS[first_key + 3 * i + 2],
+            id = ARGV[first_arg + 3 * i], refresh = ARGV[first_arg + 3 * i + 1], access = ARGV[first_arg + 3 * i + 2],
+        })
+    end
+    return groups
+end
+local function unchanged(groups)
+    for _, session in ipairs(groups) do
+        local tokens = redis.call('HMGET', session.key, 'refresh', 'access')
+        if (tokens[1] or '') ~= session.refresh or (tokens[2] or '') ~= session.access then
+            return false
+        end
+    end
+    return true
+end
+local function end_session(session)
+    local tokens = redis.call('HMGET', session.key, 'refresh', 'access', 'access_exp')
+    if tokens[1] then
+        redis.call('DEL', session.white)
+    end
+    revoke(session.black, tokens[2], tokens[3])
+    redis.call('DEL', session.key)
+end
+local function reply(status)
+    local result = {status}
+    for _, value in ipairs(revoked) do
+        table.insert(result, value)
+    end
+    return result
+end
+"""
+
+# Сохраняет сессию и завершает давно не обновлявшиеся сверх лимита.
+# KEYS[2] - sessions:<user_id>, KEYS[3] - session:<session_id>, далее группы
+# вытесняемых сессий (ARGV с 11-го). Результат - число вытесненных сессий.
+SAVE_SCRIPT = SCRIPT_PRELUDE + """
+local lifetime = tonumber(ARGV[5])
+local limit = tonumber(ARGV[6])
+local evicted = session_groups(4, 11)
+-- вытесняются самые давние из прочих живых сессий
+local expected = {}
+if limit > 0 then
+    local others = {}
+    for _, session in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '(' .. (now - lifetime), '+inf')) do
+        if session ~= ARGV[4] then
+            table.insert(others, session)
+        end
+    end
+    for i = 1, #others + 1 - limit do
+        expected[i] = others[i]
+    end
+end
+if #expected ~= #evicted then
+    return reply(RETRY)
+end
+for i, session in ipairs(evicted) do
+    if session.id ~= expected[i] then
+        return reply(RETRY)
+    end
+end
+if not unchanged(evicted) then
+    return reply(RETRY)
+end
+-- не обновлявшиеся дольше срока refresh токена сессии уже недействительны
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - lifetime)
+local created = redis.call('HGET', KEYS[3], 'created_at') or now
+redis.call('HSET', KEYS[3], 'created_at', created, 'last_seen', now,
+    'refresh', ARGV[7], 'access', ARGV[8], 'access_exp', ARGV[9])
+if ARGV[10] ~= '' then
+    redis.call('HSET', KEYS[3], 'user_agent', ARGV[10])
+end
+redis.call('PEXPIRE', KEYS[3], lifetime)
+redis.call('ZADD', KEYS[2], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[2], lifetime)
+for _, session in ipairs(evicted) do
+    redis.call('ZREM', KEYS[2], session.id)
+    end_session(session)
+end
+return reply(#evicted)
+"""
+
+# Удаляет сессии пользователя: ARGV[4] - одна сессия, пустая строка - все,
+# кроме ARGV[5]. KEYS[2] - sessions:<user_id>, далее группы удаляемых
+# сессий (ARGV с 6-го). Результат - число удаленных.
+REMOVE_SCRIPT = SCRIPT_PRELUDE + """
+local sessions = session_groups(3, 6)
+if ARGV[4] == '' then
+    local expected = {}
+    for _, session in ipairs(sessions) do
+        expected[session.id] = true
+    end
+    local count = 0
+    for _, session in ipairs(redis.call('ZRANGE', KEYS[2], 0, -1)) do
+        if session ~= ARGV[5] then
+            if not expected[session] then
+                return reply(RETRY)
+            end
+            count = count + 1
+        end
+    end
+    if count ~= #sessions then
+        return reply(RETRY)
+    end
+end
+if not unchanged(sessions) then
+    return reply(RETRY)
+end
+local removed = 0
+for _, session in ipairs(sessions) do
+    if redis.call('ZREM', KEYS[2], session.id) == 1 then
+        end_session(session)
+        removed = removed + 1
+    end
+end
+return reply(removed)
+"""
+
+# Обмен refresh токена сессии: проверка, погашение старого и выдача нового
+# за один вызов. KEYS[2] - white_list:<старый refresh>, KEYS[3] -
+# refresh_used:<старый refresh>, KEYS[4] - sessions:<user_id>, KEYS[5..7] -
+# группа сессии (ARGV[4..6]: session_id и ее текущие refresh и access),
+# KEYS[8] - white_list:<новый refresh>, KEYS[9] - black_list:<предъявленный
+# access>. Результат: 1 - обмен выполнен, 0 - токен недействителен, сессия
+# завершена или токен уже обменян параллельным запросом (в пределах grace),
+# -1 - повторное предъявление обменянного токена, сессия завершена.
+ROTATE_SCRIPT = SCRIPT_PRELUDE + """
+local session = {
+    key = KEYS[5], white = KEYS[6], black = KEYS[7], id = ARGV[4], refresh = ARGV[5], access = ARGV[6],
+}
+local current = redis.call('HMGET', session.key, 'refresh', 'access', 'access_exp')
+if (current[1] or '') ~= session.refresh or (current[2] or '') ~= session.access then
+    return reply(RETRY)
+end
+if redis.call('DEL', KEYS[2]) == 0 then
+    local used = redis.call('GET', KEYS[3])
+    if used and now - tonumber(used) >= tonumber(ARGV[7]) then
+        -- токен уже обменивали: его предъявляет кто-то, кроме владельца сессии
+        redis.call('ZREM', KEYS[4], session.id)
+        end_session(session)
+        return reply(-1)
+    end
+    return reply(0)
+end
+if ARGV[16] == '1' and not redis.call('ZSCORE', KEYS[4], session.id) then
+    -- сессию завершили: ее токен больше не обменивается
+    return reply(0)
+end
+redis.call('SET', KEYS[3], now, 'EX', ARGV[15])
+redis.call('SET', KEYS[8], ARGV[3], 'EX', ARGV[9])
+-- текущий access токен сессии и предъявленный вместе с refresh (если другой)
+revoke(session.black, current[2], current[3])
+if ARGV[12] ~= session.access then
+    revoke(KEYS[9], ARGV[12], ARGV[13])
+end
+redis.call('HSETNX', session.key, 'created_at', now)
+redis.call('HSET', session.key, 'last_seen', now,
+    'refresh', ARGV[8], 'access', ARGV[10], 'access_exp', ARGV[11])
+redis.call('PEXPIRE', session.key, ARGV[14])
+redis.call('ZADD', KEYS[4], now, session.id)
+redis.call('PEXPIRE', KEYS[4], ARGV[14])
+return reply(1)
+"""
+
+# Результат скрипта, если сессии изменились после чтения их ключей
+RETRY = -2
+# попыток вызова скрипта со свежим чтением ключей
+SCRIPT_ATTEMPTS = 10
+
+
+class SessionStats:
+    def __init__(self):
+        self.saved = 0
+        self.evicted = 0
+        self.removed = 0
+        self.rotated = 0
+        self.rotate_conflicts = 0
+        self.reused = 0
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            "evicted": self.evicted,
+            "removed": self.removed,
+            "rotated": self.rotated,
+            "rotate_conflicts": self.rotate_conflicts,
+            "reused": self.reused,
+        }
+
+
+session_stats = SessionStats()
+metrics.register("sessions", session_stats.stats)
+
+
+class SessionStore:
+    """Реестр сессий пользователя в Redis поверх белого и черного списков токенов.
+
+    Все операции адресуют ключи пользователя и сессии напрямую, без KEYS/SCAN,
+    и передают скриптам все затрагиваемые ключи в KEYS.
+    Выход со всех устройств - один вызов скрипта вместе с отзывом токенов.
+    """
+
+    def __init__(self, cache: RedisCache, token_store: TokenStore, max_sessions: int = settings.sessions_max_per_user):
+        self.cache = cache
+        self.token_store = token_store
+        self.max_sessions = max_sessions
+        self.lifetime = settings.auth_jwt.refresh_token_expire_minutes * 60
+        self._scripts: dict[str, AsyncScript] = {}
+
+    def script(self, source: str) -> AsyncScript:
+        # EVALSHA; при отсутствии скрипта на сервере redis-py загружает его сам
+        if source not in self._scripts:
+            self._scripts[source] = self.cache.redis.register_script(source)
+        return self._scripts[source]
+
+    @staticmethod
+    def key(user_id) -> str:
+        return f"{SESSIONS_KEY_PREFIX}{user_id}"
+
+    async def _call(self, source: str, build: Callable[[int, int], Awaitable[tuple[list, list]]]) -> int:
+        """Вызов скрипта с общим началом; возвращает его результат.
+
+        build(now, attempt) читает состояние сессий и возвращает KEYS и ARGV
+        скрипта; при RETRY чтение и вызов повторяются.
+        """
+        for attempt in range(SCRIPT_ATTEMPTS):
+            now = int(time.time() * 1000)
+            keys, args = await build(now, attempt)
+            result = await self.script(source)(
+                keys=[REVOKED_TOKENS_KEY, *keys],
+                args=[now, REVOKED_TOKENS_CHANNEL, TOKEN_MARKER, *args],
+            )
+            if int(result[0]) == RETRY:
+                continue
+            # свой воркер учитывает отзыв сразу, как в TokenStore.update
+            for access, exp in zip(result[1::2], result[2::2]):
+                self.token_store.revocation_filter.add(access.decode(), int(exp))
+            return int(result[0])
+        raise RuntimeError(f"Сессии изменялись во время всех {SCRIPT_ATTEMPTS} попыток вызова скрипта")
+
+    @staticmethod
+    def _group(session_id: str, refresh: str, access: str) -> tuple[list, list]:
+        """KEYS и ARGV группы сессии; ключ отсутствующего токена не используется скриптом."""
+        return (
+            [SESSION_KEY_PREFIX + session_id, f"{WHITE_LIST}:{refresh}", f"{BLACK_LIST}:{access}"],
+            [session_id, refresh, access],
+        )
+
+    async def _groups(self, session_ids: list[str]) -> tuple[list, list]:
+        """Группы сессий с токенами, прочитанными из их hash."""
+        async with self.cache.redis.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.hmget(SESSION_KEY_PREFIX + session_id, "refresh", "access")
+            results = await pipe.execute()
+        keys, args = [], []
+        for session_id, tokens in zip(session_ids, results):
+            group_keys, group_args = self._group(session_id, *(token.decode() if token else "" for token in tokens))
+            keys += group_keys
+            args += group_args
+        return keys, args
+
+    async def save(
+        self,
+        user_id,
+        session_id: str,
+        access_payload: dict,
+        refresh_payload: dict,
+        user_agent: Optional[str] = None,
+    ) -> int:
+        """Вход или обновление токенов сессии; возвращает число вытесненных сессий."""
+        lifetime_ms = self.lifetime * 1000
+
+        async def build(now: int, attempt: int) -> tuple[list, list]:
+            evicted = []
+            # первая попытка - без вытеснения, как при входе в пределах лимита
+            if attempt and self.max_sessions > 0:
+                alive = await self.cache.redis.zrangebyscore(self.key(user_id), f"({now - lifetime_ms}", "+inf")
+                others = [session.decode() for session in alive if session.decode() != session_id]
+                evicted = others[:max(len(others) + 1 - self.max_sessions, 0)]
+            keys, args = await self._groups(evicted)
+            return [self.key(user_id), SESSION_KEY_PREFIX + session_id, *keys], [
+                session_id,
+                lifetime_ms,
+                self.max_sessions,
+                refresh_payload["self_uuid"],
+                access_payload["self_uuid"],
+                math.ceil(access_payload["exp"]),
+                user_agent or "",
+                *args,
+            ]
+
+        evicted = await self._call(SAVE_SCRIPT, build)
+        session_stats.saved += 1
+        session_stats.evicted += evicted
+        return evicted
+
+    async def rotate(
+        self,
+        user_id,
+        session_id: str,
+        refresh_payload: dict,
+        new_access_payload: dict,
+        new_refresh_payload: dict,
+        access_payload: Optional[dict] = None,
+        new_session: bool = False,
+    ) -> int:
+        """Атомарный обмен refresh токена сессии на новую пару токенов.
+
+        Возвращает статус ROTATE_SCRIPT: 1 - обмен выполнен, 0 - токен
+        недействителен, -1 - повторное предъявление, сессия завершена.
+        new_session - токен выдан до появления сессий, session_id создан сейчас.
+        """
+        refresh = refresh_payload["self_uuid"]
+        access = access_payload["self_uuid"] if access_payload else ""
+
+        async def build(now: int, attempt: int) -> tuple[list, list]:
+            if attempt:
+                tokens = await self.cache.redis.hmget(SESSION_KEY_PREFIX + session_id, "refresh", "access")
+                current = [token.decode() if token else "" for token in tokens]
+            else:
+                # обычно сессия хранит именно предъявленную пару
+                current = [refresh, access]
+            group_keys, group_args = self._group(session_id, *current)
+            return [
+                f"{WHITE_LIST}:{refresh}",
+                REFRESH_USED_KEY_PREFIX + refresh,
+                self.key(user_id),
+                *group_keys,
+                f"{WHITE_LIST}:{new_refresh_payload['self_uuid']}",
+                f"{BLACK_LIST}:{access}",
+            ], [
+                *group_args,
+                int(settings.refresh_reuse_grace * 1000),
+                new_refresh_payload["self_uuid"],
+                max(math.ceil(new_refresh_payload["exp"] - now / 1000), 1),
+                new_access_payload["self_uuid"],
+                math.ceil(new_access_payload["exp"]),
+                access,
+                # exp токенов прежнего формата дробный
+                math.ceil(access_payload["exp"]) if access_payload else "",
+                self.lifetime * 1000,
+                # метка использования живет, пока старый токен мог бы быть предъявлен
+                max(math.ceil(refresh_payload["exp"] - now / 1000), 1),
+                "" if new_session else "1",
+            ]
+
+        status = await self._call(ROTATE_SCRIPT, build)
+        if status == 1:
+            session_stats.rotated += 1
+        elif status == -1:
+            session_stats.reused += 1
+        else:
+            session_stats.rotate_conflicts += 1
+        return status
+
+    async def remove(self, user_id, session_id: Union[str, None] = None, keep: Union[str, None] = None) -> int:
+        """Выход из одной сессии или, без session_id, из всех, кроме keep."""
+
+        async def build(now: int, attempt: int) -> tuple[list, list]:
+            if session_id:
+                session_ids = [session_id]
+            else:
+                session_ids = [
+                    session.decode() for session in await self.cache.redis.zrange(self.key(user_id), 0, -1)
+                    if session.decode() != keep
+                ]
+            keys, args = await self._groups(session_ids)
+            return [self.key(user_id), *keys], [session_id or "", keep or "", *args]
+
+        removed = await self._call(REMOVE_SCRIPT, build)
+        session_stats.removed += removed
+        return removed
+
+    async def list(self, user_id) -> list[dict]:
+        """Сессии пользователя, последние обновленные - первыми."""
+        session_ids = [
+            session_id.decode() for session_id in await self.cache.redis.zrevrange(self.key(user_id), 0, -1)
+        ]
+        async with self.cache.redis.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.hgetall(SESSION_KEY_PREFIX + session_id)
+            results = await pipe.execute()
+        sessions, expired = [], []
+        for session_id, data in zip(session_ids, results):
+            if not data:
+                expired.append(session_id)
+                continue
+            sessions.append({
+                "session_id": session_id,
+                "user_agent": data.get(b"user_agent", b"").decode() or None,
+                "created_at": int(data[b"created_at"]) / 1000,
+                "last_seen": int(data[b"last_seen"]) / 1000,
+            })
+        if expired:
+            # hash сессии истек раньше записи в sorted set
+            await self.cache.redis.zrem(self.key(user_id), *expired)
+        return sessions
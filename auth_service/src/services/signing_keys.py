@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from typing import Optional, Union
+
+import jwt
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+from core import metrics
+from core.config import settings
+from core.constains import SIGNING_KEYS_KEY, SIGNING_KEYS_LOCK
+from db.redis_db import RedisCache
+
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = {"RS256": RSAAlgorithm, "EdDSA": OKPAlgorithm}
+
+
+def hs256_accepted() -> bool:
+    """Принимаются ли токены без kid при асимметричной подписи (переход с HS256)."""
+    until = settings.jwt_hs256_accept_until
+    return settings.jwt_accept_hs256 and (until is None or time.time() < until.timestamp())
+
+
+def generate_private_key(algorithm: str):
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return ed25519.Ed25519PrivateKey.generate()
+
+
+class SigningKey:
+    """Ключ подписи: подписывает с sign_from до sign_until, проверяет до verify_until."""
+
+    def __init__(
+        self,
+        kid: str,
+        algorithm: str,
+        private_key,
+        sign_from: float,
+        sign_until: float,
+        verify_until: float,
+    ):
+        self.kid = kid
+        self.algorithm = algorithm
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.sign_from = sign_from
+        self.sign_until = sign_until
+        self.verify_until = verify_until
+
+    @classmethod
+    def generate(cls, algorithm: str, sign_from: float, sign_until: float, verify_until: float) -> "SigningKey":
+        return cls(uuid.uuid4().hex, algorithm, generate_private_key(algorithm), sign_from, sign_until, verify_until)
+
+    def jwk(self) -> dict:
+        jwk = ASYMMETRIC_ALGORITHMS[self.algorithm].to_jwk(self.public_key, as_dict=True)
+        jwk.update(kid=self.kid, alg=self.algorithm, use="sig")
+        return jwk
+
+    def dump(self, passphrase: str) -> str:
+        encryption = (
+            serialization.BestAvailableEncryption(passphrase.encode())
+            if passphrase else serialization.NoEncryption()
+        )
+        pem = self.private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, encryption
+        )
+        return json.dumps({
+            "kid": self.kid,
+            "alg": self.algorithm,
+            "key": pem.decode(),
+            "sign_from": self.sign_from,
+            "sign_until": self.sign_until,
+            "verify_until": self.verify_until,
+        })
+
+    @classmethod
+    def load(cls, entry: dict, passphrase: str) -> "SigningKey":
+        private_key = serialization.load_pem_private_key(
+            entry["key"].encode(), password=passphrase.encode() if passphrase else None
+        )
+        return cls(
+            entry["kid"], entry["alg"], private_key,
+            entry["sign_from"], entry["sign_until"], entry["verify_until"],
+        )
+
+
+class SigningKeyRing:
+    """Ключи подписи токенов, общие для всех воркеров и экземпляров (Redis).
+
+    Новый ключ создается за publish_ahead секунд до конца срока текущего,
+    чтобы потребители успели получить его из JWKS до первого токена с ним.
+    Ключ остается в JWKS, пока могут быть действительны подписанные им токены.
+    В режиме HS256 токены подписываются общим секретом, как раньше.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        rotation_interval: int,
+        publish_ahead: int,
+        verify_after: int,
+        check_interval: int,
+        passphrase: str,
+    ):
+        self.algorithm = algorithm
+        self.rotation_interval = rotation_interval
+        self.publish_ahead = publish_ahead
+        self.verify_after = verify_after
+        self.check_interval = check_interval
+        self.passphrase = passphrase
+        self.keys: dict[str, SigningKey] = {}
+        self.current: Optional[SigningKey] = None
+        self.rotations = 0
+        self.cache: Optional[RedisCache] = None
+
+    @property
+    def asymmetric(self) -> bool:
+        return self.algorithm in ASYMMETRIC_ALGORITHMS
+
+    def check_passphrase(self) -> None:
+        # без пароля закрытые ключи лежали бы в общем Redis открыто: любой,
+        # кто читает Redis, мог бы выпускать токены от имени любого пользователя
+        if self.asymmetric and not self.passphrase:
+            raise RuntimeError(
+                f"JWT_KEYS_PASSPHRASE обязателен при JWT_ALGORITHM={self.algorithm}: "
+                "закрытые ключи подписи хранятся в Redis зашифрованными"
+            )
+
+    async def start(self, cache: RedisCache) -> None:
+        """Загрузка ключей до приема запросов; при необходимости - первый ключ."""
+        self.check_passphrase()
+        self.cache = cache
+        await self.refresh()
+        # первый ключ мог создавать другой воркер, пока этот ждал блокировку
+        for _ in range(10):
+            if self.current is not None or not self.asymmetric:
+                break
+            await asyncio.sleep(0.5)
+            await self.refresh()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Не удалось обновить ключи подписи: {e}")
+
+    async def refresh(self) -> None:
+        if self.asymmetric and settings.jwt_auto_rotate:
+            await self.rotate()
+        await self.load()
+
+    async def load(self) -> None:
+        raw = await self.cache.redis.hgetall(SIGNING_KEYS_KEY)
+        now = time.time()
+        keys = {}
+        for data in raw.values():
+            entry = json.loads(data)
+            if entry["verify_until"] <= now:
+                continue
+            # закрытый ключ разбирается один раз (с паролем это дорого)
+            keys[entry["kid"]] = self.keys.get(entry["kid"]) or SigningKey.load(entry, self.passphrase)
+        self.keys = keys
+        self.current = self._select(now)
+
+    def _select(self, now: float) -> Optional[SigningKey]:
+        active = [
+            key for key in self.keys.values()
+            if key.algorithm == self.algorithm and key.sign_from <= now < key.sign_until
+        ]
+        return max(active, key=lambda key: key.sign_from, default=None)
+
+    async def rotate(self, force: bool = False) -> Optional[SigningKey]:
+        """Создает следующий ключ, если срок текущего подходит к концу, и удаляет истекшие.
+
+        force - внеплановый ключ, подписывающий через два интервала проверки,
+        когда его уже загрузят все воркеры (например, при компрометации текущего;
+        сам скомпрометированный ключ нужно удалить из SIGNING_KEYS_KEY).
+        """
+        self.check_passphrase()
+        redis = self.cache.redis
+        # ротацию выполняет один воркер
+        if not await redis.set(SIGNING_KEYS_LOCK, 1, nx=True, ex=30):
+            return None
+        try:
+            raw = await redis.hgetall(SIGNING_KEYS_KEY)
+            now = time.time()
+            entries = [json.loads(data) for data in raw.values()]
+            expired = [entry["kid"] for entry in entries if entry["verify_until"] <= now]
+            latest_until = max(
+                (
+                    entry["sign_until"] for entry in entries
+                    if entry["alg"] == self.algorithm and entry["verify_until"] > now
+                ),
+                default=0,
+            )
+            key = None
+            if force or latest_until - now < self.publish_ahead:
+                sign_from = now + 2 * self.check_interval if force else max(now, latest_until)
+                key = SigningKey.generate(
+                    self.algorithm,
+                    sign_from=sign_from,
+                    sign_until=sign_from + self.rotation_interval,
+                    verify_until=sign_from + self.rotation_interval + self.verify_after,
+                )
+                logger.info(f"Новый ключ подписи {key.kid} ({self.algorithm}), действует с {sign_from:.0f}")
+                self.rotations += 1
+            async with self.cache.batch() as pipe:
+                if key is not None:
+                    pipe.hset(SIGNING_KEYS_KEY, key.kid, key.dump(self.passphrase))
+                if expired:
+                    pipe.hdel(SIGNING_KEYS_KEY, *expired)
+            return key
+        finally:
+            await redis.delete(SIGNING_KEYS_LOCK)
+
+    def sign(self, payload: dict) -> str:
+        if not self.asymmetric:
+            return jwt.encode(payload, settings.auth_jwt.secret_key, settings.auth_jwt.algorithm)
+        now = time.time()
+        if self.current is None or now >= self.current.sign_until:
+            # срок ключа истек между загрузками - следующий уже опубликован
+            self.current = self._select(now)
+        if self.current is None:
+            raise RuntimeError("Нет действующего ключа подписи")
+        return jwt.encode(
+            payload, self.current.private_key, self.algorithm, headers={"kid": self.current.kid}
+        )
+
+    def verification_key(self, token: str) -> tuple[Union[str, object], list[str]]:
+        """Ключ и допустимый алгоритм для проверки токена по kid из заголовка."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            if self.asymmetric and not hs256_accepted():
+                raise jwt.exceptions.InvalidAlgorithmError("HS256 tokens are not accepted")
+            return settings.auth_jwt.secret_key, [settings.auth_jwt.algorithm]
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.exceptions.InvalidSignatureError(f"Unknown key {kid}")
+        return key.public_key, [key.algorithm]
+
+    def jwks(self) -> dict:
+        return {"keys": [key.jwk() for key in self.keys.values()]}
+
+    def stats(self) -> dict:
+        return {
+            "algorithm": self.algorithm,
+            "current_kid": self.current.kid if self.current is not None else None,
+            "keys": len(self.keys),
+            "rotations": self.rotations,
+        }
+
+
+signing_keys = SigningKeyRing(
+    algorithm=settings.jwt_algorithm,
+    rotation_interval=settings.jwt_key_rotation_days * 24 * 60 * 60,
+    publish_ahead=settings.jwt_key_publish_ahead,
+    # ключ нужен для проверки, пока живы выданные им токены (самые долгие - refresh)
+    verify_after=settings.auth_jwt.refresh_token_expire_minutes * 60,
+    check_interval=settings.jwt_key_check_interval,
+    passphrase=settings.jwt_keys_passphrase,
+)
+metrics.register("signing_keys", signing_keys.stats)
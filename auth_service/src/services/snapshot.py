@@ -0,0 +1,66 @@
+from pydantic import BaseModel
+from typing import Union
+
+from models.entity import User, Roles
+
+
+# Версия формата снимков: при изменении состава полей старые ключи
+# просто перестают читаться и истекают сами
+SNAPSHOT_VERSION = 1
+
+
+class UserSnapshot(BaseModel):
+    """Компактный снимок пользователя для кэша."""
+
+    id: str
+    email: str
+    first_name: Union[str, None] = None
+    last_name: Union[str, None] = None
+    active: bool = True
+    is_superuser: bool = False
+    role_id: Union[str, None] = None
+    # название роли не кэшируется вместе с пользователем, а подставляется
+    # из снимка роли, чтобы переименование роли не требовало сброса пользователей
+    role: Union[str, None] = None
+
+    @classmethod
+    def from_orm_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=str(user.id),
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            active=bool(user.active),
+            is_superuser=bool(user.is_superuser),
+            role_id=str(user.role_id) if user.role_id else None,
+        )
+
+    def dump(self) -> str:
+        return self.model_dump_json(exclude={"role"})
+
+
+class RoleSnapshot(BaseModel):
+    """Снимок роли с названиями ее разрешений."""
+
+    id: str
+    type: str
+    permissions: list[str] = []
+
+    @classmethod
+    def from_orm_role(cls, role: Roles) -> "RoleSnapshot":
+        return cls(
+            id=str(role.id),
+            type=role.type,
+            permissions=[perm.name for perm in role.permissions],
+        )
+
+    def dump(self) -> str:
+        return self.model_dump_json()
+
+
+def user_snapshot_key(user_id) -> str:
+    return f"snapshot:v{SNAPSHOT_VERSION}:user:{user_id}"
+
+
+def role_snapshot_key(role_id) -> str:
+    return f"snapshot:v{SNAPSHOT_VERSION}:role:{role_id}"
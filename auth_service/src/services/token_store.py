@@ -0,0 +1,104 @@
+import math
+import time
+
+from typing import Iterable
+
+from core.constains import REVOKED_TOKENS_KEY, REVOKED_TOKENS_CHANNEL
+from db.redis_db import RedisCache
+from services.revocation_filter import RevocationFilter, revocation_filter
+
+
+WHITE_LIST = "white_list"
+BLACK_LIST = "black_list"
+
+# В качестве значения хранится только маркер: сам токен не нужен,
+# достаточно факта наличия self_uuid в списке
+TOKEN_MARKER = b"1"
+
+
+class TokenStore:
+    """Белый и черный списки токенов в Redis.
+
+    Ключ - "<список>:<self_uuid>", время жизни ключа равно оставшемуся
+    времени жизни токена (exp - now), поэтому записи исчезают вместе с токеном.
+    """
+
+    def __init__(self, cache: RedisCache, revocation_filter: RevocationFilter = revocation_filter):
+        self.cache = cache
+        self.revocation_filter = revocation_filter
+
+    @staticmethod
+    def key(list_name: str, payload: dict) -> str:
+        return f"{list_name}:" + payload["self_uuid"]
+
+    @staticmethod
+    def ttl(payload: dict) -> int:
+        """Оставшееся время жизни токена в секундах."""
+        return math.ceil(payload["exp"] - time.time())
+
+    async def add(self, list_name: str, payload: dict):
+        if list_name == BLACK_LIST:
+            await self.update(black_list=[payload])
+        else:
+            await self.update(white_list=[payload])
+
+    async def contains(self, list_name: str, payload: dict) -> bool:
+        if list_name == BLACK_LIST and not self.revocation_filter.might_be_revoked(
+            payload["self_uuid"]
+        ):
+            return False
+        return await self.cache.get(self.key(list_name, payload)) is not None
+
+    async def contains_many(self, items: list[tuple[str, dict]]) -> list[bool]:
+        """contains для пар (список, payload) одним MGET."""
+        found = [False] * len(items)
+        keys, positions = [], []
+        for position, (list_name, payload) in enumerate(items):
+            if list_name == BLACK_LIST and not self.revocation_filter.might_be_revoked(
+                payload["self_uuid"]
+            ):
+                continue
+            keys.append(self.key(list_name, payload))
+            positions.append(position)
+        for position, value in zip(positions, await self.cache.get_many(keys)):
+            found[position] = value is not None
+        return found
+
+    async def remove(self, list_name: str, payload: dict):
+        await self.cache.delete(self.key(list_name, payload))
+
+    async def update(
+        self,
+        black_list: Iterable[dict] = (),
+        white_list: Iterable[dict] = (),
+        del_white_list: Iterable[dict] = (),
+    ):
+        """Изменение списков одной транзакцией MULTI/EXEC."""
+        entries = []
+        revoked = {}
+        for list_name, payloads in ((BLACK_LIST, black_list), (WHITE_LIST, white_list)):
+            for payload in payloads:
+                ttl = self.ttl(payload)
+                # истекший токен и так будет отклонен по exp, хранить его незачем
+                if ttl > 0:
+                    entries.append((self.key(list_name, payload), ttl))
+                    if list_name == BLACK_LIST:
+                        revoked[payload["self_uuid"]] = payload["exp"]
+        del_keys = [self.key(WHITE_LIST, payload) for payload in del_white_list]
+        if not entries and not del_keys:
+            return
+
+        async with self.cache.batch() as pipe:
+            for key, ttl in entries:
+                pipe.set(key, TOKEN_MARKER, ex=ttl)
+            if del_keys:
+                pipe.delete(*del_keys)
+            if revoked:
+                # журнал отзывов для синхронизации фильтров в воркерах
+                pipe.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", time.time())
+                pipe.zadd(REVOKED_TOKENS_KEY, revoked)
+                for self_uuid, expire_at in revoked.items():
+                    pipe.publish(REVOKED_TOKENS_CHANNEL, f"{self_uuid}:{expire_at}")
+        # свой воркер учитывает отзыв сразу, не дожидаясь сообщения из канала
+        for self_uuid, expire_at in revoked.items():
+            self.revocation_filter.add(self_uuid, expire_at)
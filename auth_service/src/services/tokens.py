@@ -0,0 +1,82 @@
+import uuid
+
+from fastapi import Depends, HTTPException
+from functools import lru_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.postgres_db import get_session
+from db.redis_db import RedisCache, get_redis
+from .base_service import BaseService
+from .token_store import BLACK_LIST, WHITE_LIST
+from .utils import ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE, decode_jwt
+
+
+class TokenService(BaseService):
+    async def introspect(self, tokens: list[str]) -> list[dict]:
+        """Проверка пачки токенов для других сервисов.
+
+        Подпись и срок проверяются локально, отзыв - одним MGET по спискам,
+        пользователи и роли - MGET снимков и не более чем одним запросом
+        к Postgres на каждую из таблиц. Результаты - в порядке tokens.
+        """
+        results: list[dict] = []
+        payloads: dict[int, dict] = {}
+        for position, token in enumerate(tokens):
+            try:
+                payload = decode_jwt(jwt_token=token)
+            except HTTPException as e:
+                results.append({"active": False, "error": e.detail})
+                continue
+            token_type = payload.get("type")
+            if token_type not in (ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE):
+                results.append({"active": False, "error": "invalid token type"})
+                continue
+            try:
+                uuid.UUID(str(payload.get("sub")))
+            except ValueError:
+                results.append({"active": False, "error": "invalid token subject"})
+                continue
+            results.append({"active": False, "token_type": token_type, "exp": payload["exp"]})
+            payloads[position] = payload
+
+        # access токен отозван, если он в черном списке, refresh - если его нет в белом
+        checks = [
+            (BLACK_LIST if payload["type"] == ACCESS_TOKEN_TYPE else WHITE_LIST, payload)
+            for payload in payloads.values()
+        ]
+        listed = await self.token_store.contains_many(checks)
+        valid = {}
+        for (position, payload), (list_name, _), found in zip(payloads.items(), checks, listed):
+            revoked = found if list_name == BLACK_LIST else not found
+            results[position]["revoked"] = revoked
+            if not revoked:
+                valid[position] = payload
+
+        users = await self.get_user_snapshots(payload["sub"] for payload in valid.values())
+        roles = await self.get_role_snapshots(
+            user.role_id for user in users.values() if user.role_id is not None
+        )
+        for position, payload in valid.items():
+            user = users.get(payload["sub"])
+            if user is None:
+                results[position]["error"] = "user not found"
+                continue
+            role = roles.get(user.role_id) if user.role_id is not None else None
+            results[position].update(
+                active=user.active,
+                user_id=user.id,
+                is_superuser=user.is_superuser,
+                role=role.type if role is not None else None,
+                permissions=role.permissions if role is not None else [],
+            )
+            if not user.active:
+                results[position]["error"] = "Inactive user"
+        return results
+
+
+@lru_cache()
+def get_token_service(
+    redis: RedisCache = Depends(get_redis),
+    db: AsyncSession = Depends(get_session),
+) -> TokenService:
+    return TokenService(redis, db)
@@ -1,9 +1,18 @@
+import logging
+
+from typing import Union
+
 from fastapi import Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
 from functools import lru_cache
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.entity import User
 from .base_service import BaseService
+from .snapshot import UserSnapshot
+from .permission_index import permission_index
+from .session_store import SessionStore
+from .password import password_hasher
 from .oauth.yandex import YandexOAuthService
 from models.auth import Tokens
 from .utils import (
@@ -11,6 +20,7 @@ from .utils import (
     create_access_token,
     decode_jwt,
     check_date_and_type_token,
+    new_session_id,
     ACCESS_TOKEN_TYPE,
     REFRESH_TOKEN_TYPE,
 )
@@ -19,10 +29,14 @@ from db.postgres_db import get_session
 from db.redis_db import RedisCache, get_redis
 
 
+logger = logging.getLogger(__name__)
+
+
 class UserService(BaseService):
     def __init__(self, cache: RedisCache, storage: AsyncSession):
         super().__init__(cache, storage)
         self.model = User
+        self.sessions = SessionStore(cache, self.token_store)
 
     def token_decode(self, token):
         return decode_jwt(jwt_token=token)
@@ -33,7 +47,8 @@ class UserService(BaseService):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="invalid email"
             )
-        if not user.check_password(user_password):  # если пароль не совпадает
+        valid, new_hash = await password_hasher.verify_and_update(user.password, user_password)
+        if not valid:  # если пароль не совпадает
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="uncorrect password"
             )
@@ -41,6 +56,10 @@ class UserService(BaseService):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="user is deactive"
             )
+        if new_hash is not None:
+            # хеш другой схемы или другого cost - сохраняем пересчитанный
+            user.password = new_hash
+            await self.storage.commit()
 
         return user
 
@@ -51,34 +70,57 @@ class UserService(BaseService):
         if check_date_and_type_token(payload, ACCESS_TOKEN_TYPE):
             # проверка access токена в блэк листе redis
             if not await self.get_from_black_list(access_token):
+                user_data = jsonable_encoder(user_data)
+                if user_data.get("password") is not None:
+                    user_data["password"] = await password_hasher.hash(user_data["password"])
                 user = await self.change_instance_data(user_uuid, user_data)
                 if user is None:  # если в бд пг не нашли такой uuid
                     raise HTTPException(
                         status_code=status.HTTP_401_UNAUTHORIZED,
                         detail="user not found or email exists",
                     )
+                await self.invalidate_user_status(user.id)
             else:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN, detail="uncorrect token"
                 )
         return user
 
+    async def set_user_active(self, user_id: str, active: bool) -> Union[User, None]:
+        """Активация/деактивация пользователя с оповещением других сервисов."""
+        user = await self.change_instance_data(user_id, {"active": active})
+        if user is not None:
+            if not active:
+                # токены деактивированного пользователя отзываются вместе с его сессиями
+                await self.sessions.remove(user.id)
+            await self.invalidate_user_status(user.id)
+        return user
+
     async def create_user(self, user_params) -> User:
-        user = await self.create_new_instance(user_params)
+        params = jsonable_encoder(user_params)
+        params["hashed_password"] = await password_hasher.hash(params.pop("password"))
+        user = await self.create_new_instance(params)
         return user
 
-    async def generate_and_save_tokens(self, user: User) -> Tokens:
+    async def generate_and_save_tokens(self, user: User, user_agent: Union[str, None] = None) -> Tokens:
         user_role = user.role.type if user.role else None
-        access_token = create_access_token(user, user_role)
-        refresh_token = create_refresh_token(user)
+        session_id = new_session_id()
+        access_token = create_access_token(
+            user, user_role, permission_index.mask(user.role_id), session_id
+        )
+        refresh_token = create_refresh_token(user, session_id)
 
         # добавление refresh токена в вайт-лист редиса
-        await self.add_to_white_list(refresh_token, REFRESH_TOKEN_TYPE)
+        await self.add_to_white_list(refresh_token)
+        # новая сессия; сверх лимита завершаются давно не обновлявшиеся
+        await self.sessions.save(
+            user.id, session_id, decode_jwt(access_token), decode_jwt(refresh_token), user_agent
+        )
         return Tokens(access_token=access_token, refresh_token=refresh_token)
 
-    async def login(self, user_email: str, user_password: str) -> Tokens:
+    async def login(self, user_email: str, user_password: str, user_agent: Union[str, None] = None) -> Tokens:
         user = await self.get_validate_user(user_email, user_password)
-        return await self.generate_and_save_tokens(user), user
+        return await self.generate_and_save_tokens(user, user_agent), user
 
     async def login_by_yandex(
         self,
@@ -103,40 +145,91 @@ class UserService(BaseService):
         return tokens
 
     async def logout(self, access_token: str, refresh_token: str) -> bool:
-        await self.add_to_black_list(access_token, ACCESS_TOKEN_TYPE)
-        await self.del_from_white_list(refresh_token)
+        payload = self.token_decode(access_token)
+        await self.update_token_lists(
+            black_list=[access_token],
+            del_white_list=[refresh_token],
+        )
+        if payload.get("session_id"):
+            await self.sessions.remove(payload["sub"], payload["session_id"])
         return True
 
+    async def list_sessions(self, access_token: str) -> list[dict]:
+        payload = self.token_decode(access_token)
+        sessions = await self.sessions.list(payload["sub"])
+        for session in sessions:
+            session["current"] = session["session_id"] == payload.get("session_id")
+        return sessions
+
+    async def end_session(self, access_token: str, session_id: str) -> bool:
+        """Выход на одном устройстве; False - у пользователя нет такой сессии."""
+        payload = self.token_decode(access_token)
+        return await self.sessions.remove(payload["sub"], session_id) > 0
+
+    async def logout_everywhere(self, access_token: str, keep_current: bool = False) -> int:
+        """Выход со всех устройств (кроме текущего при keep_current); число завершенных сессий."""
+        payload = self.token_decode(access_token)
+        keep = payload.get("session_id") if keep_current else None
+        return await self.sessions.remove(payload["sub"], keep=keep)
+
     async def refresh_access_token(
         self,
-        access_token: str,
+        access_token: Union[str, None],
         refresh_token: str
     ) -> Tokens:
-        # Декодирование refresh-токена
+        """Обмен refresh токена на новую пару одним вызовом скрипта в Redis.
+
+        Пользователь - из снимка (Postgres только при промахе кэша), роль и
+        маска разрешений - из индекса разрешений. access_token необязателен:
+        истекший или отсутствующий просто не отзывается отдельно.
+        """
         payload = self.token_decode(refresh_token)
-        user_uuid = payload.get("sub")
+        check_date_and_type_token(payload, REFRESH_TOKEN_TYPE)
+        user = await self.get_user_snapshot(payload.get("sub"))
+        if user is None or not user.active:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="uncorrect token"
+            )
+        role = permission_index.role_type(user.role_id)
+        if role is None and user.role_id:
+            role_snapshot = await self.get_role_snapshot(user.role_id)
+            role = role_snapshot.type if role_snapshot is not None else None
+        # токены, выданные до появления сессий, получают новую сессию
+        session_id = payload.get("session_id") or new_session_id()
+        new_access_token = create_access_token(
+            user, role, permission_index.mask(user.role_id), session_id
+        )
+        new_refresh_token = create_refresh_token(user, session_id)
+        status_code = await self.sessions.rotate(
+            user.id,
+            session_id,
+            payload,
+            decode_jwt(new_access_token),
+            decode_jwt(new_refresh_token),
+            self._access_payload(access_token, user.id),
+            new_session=payload.get("session_id") is None,
+        )
+        if status_code == -1:
+            logger.warning(
+                f"Повторное использование refresh токена, сессия {session_id} пользователя {user.id} завершена"
+            )
+        if status_code != 1:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="uncorrect token"
+            )
+        return Tokens(access_token=new_access_token, refresh_token=new_refresh_token)
 
-        # Проверка типа и срока действия токена
-        if check_date_and_type_token(payload, REFRESH_TOKEN_TYPE):
-            # проверка наличия refresh токена в бд redis (хорошо, если он там есть)
-            if await self.get_from_white_list(refresh_token):
-                # наити пользователя по user_uuid, вернуть (модель User)
-                user = await self.get_instance_by_id(user_uuid)
-                new_access_token = create_access_token(user, user.role)
-                new_refresh_token = create_refresh_token(user)
-                # добавить старый access токен в блэк-лист redis
-                await self.add_to_black_list(access_token, ACCESS_TOKEN_TYPE)
-                # удалить старый refresh токен из вайт-листа redis
-                await self.del_from_white_list(refresh_token)
-                # добавить новый refresh токен в вайт-лист redis
-                await self.add_to_white_list(new_refresh_token, REFRESH_TOKEN_TYPE)
-                return Tokens(
-                    access_token=new_access_token, refresh_token=new_refresh_token
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN, detail="uncorrect token"
-                )
+    def _access_payload(self, access_token: Union[str, None], user_id: str) -> Union[dict, None]:
+        """Payload предъявленного access токена того же пользователя или None."""
+        if not access_token:
+            return None
+        try:
+            payload = self.token_decode(access_token)
+        except HTTPException:
+            return None
+        if payload.get("type") != ACCESS_TOKEN_TYPE or payload.get("sub") != user_id:
+            return None
+        return payload
 
     async def check_permissions(
         self, access_token: str,
@@ -144,31 +237,37 @@ class UserService(BaseService):
     ) -> bool:
         """Проверка прав доступа у пользователя."""
         payload = self.token_decode(access_token)
+        # быстрый путь: роль из токена и индекс разрешений в памяти, без обращения к БД
+        role_permissions = permission_index.get(payload.get("role_id"))
+        if role_permissions is not None:
+            return required_permissions in role_permissions
+        # индекс ролей недоступен: маска из токена (разрешения роли на момент выдачи)
+        bit = permission_index.bit(required_permissions)
+        mask = payload.get("permissions")
+        if mask is not None and bit is not None:
+            return bool(mask >> bit & 1)
+
         user_uuid = payload.get("sub")
-        user = await self.get_instance_by_id(user_uuid)
+        user = await self.get_user_snapshot(user_uuid)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="user not found",
             )
-        try:
-            user_role = await self.get_user_role(user_uuid)
-            user_permissions = []
-            for perm in user_role._data[0].permissions:
-                user_permissions.append(perm.name)
-
-            if required_permissions not in user_permissions:
-                return False
-        except AttributeError:
+        if user.role_id is None:
+            return False
+        user_role = await self.get_role_snapshot(user.role_id)
+        if user_role is None:
             return False
+        return required_permissions in user_role.permissions
 
     async def get_current_user(
         self,
         access_token: str
-    ) -> User:
+    ) -> UserSnapshot:
         payload = self.token_decode(access_token)
         user_uuid = payload.get("sub")
-        user: User = await self.get_instance_by_id(user_uuid)
+        user = await self.get_user_snapshot(user_uuid)
 
         if not user:
             raise HTTPException(
@@ -181,6 +280,9 @@ class UserService(BaseService):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
             )
+        if user.role_id is not None:
+            role = await self.get_role_snapshot(user.role_id)
+            user.role = role.type if role is not None else None
         return user
 
 
@@ -0,0 +1,165 @@
+import csv
+import json
+import uuid
+
+from datetime import datetime
+from functools import lru_cache
+from typing import AsyncIterator, Union
+
+from fastapi import Depends
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.v1.schemas.users import UserParams
+from core.config import settings
+from models.entity import User
+from .base_service import BaseService
+from .password import password_hasher
+
+from db.postgres_db import get_session
+from db.redis_db import RedisCache, get_redis
+
+
+IMPORT_FIELDS = ("email", "password", "first_name", "last_name")
+# ограничения длины колонок users: одна слишком длинная строка
+# иначе уронила бы INSERT всей пачки
+MAX_LENGTHS = {"email": 255, "first_name": 50, "last_name": 50}
+
+CSV_FORMAT = "csv"
+NDJSON_FORMAT = "ndjson"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Разбивает поток байтов на строки без загрузки всего тела в память."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode().rstrip("\r")
+    if buffer:
+        yield buffer.decode().rstrip("\r")
+
+
+async def parse_rows(lines: AsyncIterator[str], data_format: str) -> AsyncIterator[tuple[int, Union[dict, str]]]:
+    """Пары (номер строки, данные пользователя или текст ошибки)."""
+    header = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        if data_format == CSV_FORMAT:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [value.strip() for value in values]
+                continue
+            row = dict(zip(header, values))
+        else:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, "invalid json"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, "row must be an object"
+                continue
+        yield line_number, validate_row(row)
+
+
+def validate_row(row: dict) -> Union[dict, str]:
+    """Данные пользователя для вставки или текст ошибки."""
+    row = {field: row.get(field) or None for field in IMPORT_FIELDS}
+    if not row["email"] or not row["password"]:
+        return "email and password are required"
+    try:
+        params = UserParams(**row)
+    except ValidationError as e:
+        return str(e.errors()[0]["msg"])
+    for field, max_length in MAX_LENGTHS.items():
+        value = getattr(params, field)
+        if value is not None and len(value) > max_length:
+            return f"{field} is longer than {max_length}"
+    return params.model_dump()
+
+
+class UserImportService(BaseService):
+    def __init__(self, cache: RedisCache, storage: AsyncSession):
+        super().__init__(cache, storage)
+        self.model = User
+
+    async def import_users(
+        self,
+        lines: AsyncIterator[str],
+        data_format: str,
+        batch_size: int = settings.bulk_import_batch_size,
+    ) -> AsyncIterator[dict]:
+        """Потоковый импорт: результаты по строкам отдаются по мере обработки пачек."""
+        batch = []
+        async for line_number, row in parse_rows(lines, data_format):
+            if isinstance(row, str):
+                yield {"line": line_number, "status": "invalid", "error": row}
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= batch_size:
+                for result in await self._import_batch(batch):
+                    yield result
+                batch = []
+        if batch:
+            for result in await self._import_batch(batch):
+                yield result
+
+    async def _import_batch(self, batch: list[tuple[int, dict]]) -> list[dict]:
+        results = {}
+        unique = {}
+        for line_number, row in batch:
+            email = row["email"]
+            if email in unique:
+                results[line_number] = {"line": line_number, "email": email, "status": "exists"}
+            else:
+                unique[email] = (line_number, row)
+
+        rows = [row for _, row in unique.values()]
+        hashes = await password_hasher.hash_many([row["password"] for row in rows])
+        now = datetime.now()
+        values = [
+            {
+                "id": uuid.uuid4(),
+                "email": row["email"],
+                "password": hashed,
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "created_at": now,
+                "active": True,
+                "is_superuser": False,
+            }
+            for row, hashed in zip(rows, hashes)
+        ]
+        # одна команда на пачку; уже существующие email пропускаются
+        stmt = (
+            insert(User)
+            .values(values)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.id, User.email)
+        )
+        result = await self.storage.execute(stmt)
+        created = {email: user_id for user_id, email in result.all()}
+        await self.storage.commit()
+
+        for email, (line_number, _) in unique.items():
+            if email in created:
+                results[line_number] = {
+                    "line": line_number, "email": email, "status": "created", "id": str(created[email])
+                }
+            else:
+                results[line_number] = {"line": line_number, "email": email, "status": "exists"}
+        return [results[line_number] for line_number in sorted(results)]
+
+
+@lru_cache()
+def get_user_import_service(
+    redis: RedisCache = Depends(get_redis),
+    db: AsyncSession = Depends(get_session),
+) -> UserImportService:
+    return UserImportService(redis, db)
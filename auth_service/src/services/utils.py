@@ -1,68 +1,141 @@
+import base64
+import binascii
 import jwt
 import uuid
 import string
 
-from datetime import timedelta, datetime, timezone
+from datetime import datetime, timezone
 from fastapi import HTTPException, status
 from secrets import choice as secrets_choice
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from typing import Optional, Union
 
 from core.config import settings
 from models.value_objects import Role_names
+from services.signing_keys import signing_keys
 
 
 ACCESS_TOKEN_TYPE = "access"
 REFRESH_TOKEN_TYPE = "refresh"
 
+# Компактный формат claims (v=2): короткие имена, UUID в base64url (22 символа
+# вместо 36), флаги и разрешения роли битами. После проверки подписи токен
+# приводится к прежнему виду (normalize_claims), код сервисов работает с ним.
+# Формат должен совпадать с content_service (utils/auth.py)
+CLAIMS_VERSION = 2
+TOKEN_TYPES = {ACCESS_TOKEN_TYPE: "a", REFRESH_TOKEN_TYPE: "r"}
+TOKEN_TYPE_NAMES = {short: name for name, short in TOKEN_TYPES.items()}
+FLAG_ADMIN = 1
+FLAG_SUPERUSER = 2
 
-def create_jwt(token_type: str, token_data: dict, expire_minutes: int) -> str:
-    jwt_payload = {"type": token_type}
-    jwt_payload.update(token_data)
 
-    now_utc = datetime.now(timezone.utc)
-    now_unix = now_utc.timestamp()
-    expire_utc = datetime.now(timezone.utc) + timedelta(minutes=expire_minutes)
-    expire_unix = expire_utc.timestamp()
+def compact_uuid(value) -> str:
+    return base64.urlsafe_b64encode(uuid.UUID(str(value)).bytes).rstrip(b"=").decode()
+
+
+def expand_uuid(value: str) -> str:
+    # без создания uuid.UUID: разбор на каждом запросе
+    digits = binascii.a2b_base64(value.replace("-", "+").replace("_", "/") + "==").hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def new_session_id() -> str:
+    return compact_uuid(uuid.uuid4())
+
 
+def create_jwt(
+    token_type: str, token_data: dict, expire_minutes: int, session_id: Optional[str] = None
+) -> str:
+    now_unix = int(datetime.now(timezone.utc).timestamp())
+    expire_unix = now_unix + expire_minutes * 60
+    if settings.jwt_claims_version == CLAIMS_VERSION:
+        jwt_payload = {"v": CLAIMS_VERSION, "t": TOKEN_TYPES[token_type]}
+    else:
+        jwt_payload = {"type": token_type}
+    jwt_payload.update(token_data)
+    # сессия (services/session_store.py) - общая для токенов одного входа
+    if session_id is not None:
+        jwt_payload["sid" if settings.jwt_claims_version == CLAIMS_VERSION else "session_id"] = session_id
     jwt_payload.update(exp=expire_unix, iat=now_unix)
     return encode_jwt(jwt_payload)
 
 
-def create_access_token(user, user_role: Role_names = Role_names.user):
-    # в теле токена хранится UUID пользователя, его роли и UUID самого токена
-    payload = {
-        "sub": str(user.id),  # userid
-        "role_id": str(user.role_id) if user.role_id else None,
-        "self_uuid": str(uuid.uuid4()),
-        "is_admin": user_role == Role_names.admin,
-        "is_superuser": user.is_superuser,
-    }
+def create_access_token(
+    user,
+    user_role: Role_names = Role_names.user,
+    permissions: Optional[int] = None,
+    session_id: Optional[str] = None,
+):
+    """permissions - маска разрешений роли (PermissionIndex.mask), None - неизвестна."""
+    # роль передается названием или объектом Roles
+    is_admin = getattr(user_role, "type", user_role) == Role_names.admin
+    if settings.jwt_claims_version == CLAIMS_VERSION:
+        flags = (FLAG_ADMIN if is_admin else 0) | (FLAG_SUPERUSER if user.is_superuser else 0)
+        payload = {"sub": compact_uuid(user.id), "jti": compact_uuid(uuid.uuid4())}
+        # пустые claims не передаются; маска передается и нулевой,
+        # ее отсутствие означает, что разрешения при выдаче были неизвестны
+        if user.role_id:
+            payload["rid"] = compact_uuid(user.role_id)
+        if flags:
+            payload["f"] = flags
+        if permissions is not None:
+            payload["p"] = permissions
+    else:
+        # в теле токена хранится UUID пользователя, его роли и UUID самого токена
+        payload = {
+            "sub": str(user.id),  # userid
+            "role_id": str(user.role_id) if user.role_id else None,
+            "self_uuid": str(uuid.uuid4()),
+            "is_admin": is_admin,
+            "is_superuser": user.is_superuser,
+        }
     return create_jwt(
-        ACCESS_TOKEN_TYPE, payload, settings.auth_jwt.access_token_expire_minutes
+        ACCESS_TOKEN_TYPE, payload, settings.auth_jwt.access_token_expire_minutes, session_id
     )
 
 
-def create_refresh_token(user):
-    payload = {"sub": str(user.id), "self_uuid": str(uuid.uuid4())}
+def create_refresh_token(user, session_id: Optional[str] = None):
+    if settings.jwt_claims_version == CLAIMS_VERSION:
+        payload = {"sub": compact_uuid(user.id), "jti": compact_uuid(uuid.uuid4())}
+    else:
+        payload = {"sub": str(user.id), "self_uuid": str(uuid.uuid4())}
     return create_jwt(
-        REFRESH_TOKEN_TYPE, payload, settings.auth_jwt.refresh_token_expire_minutes
+        REFRESH_TOKEN_TYPE, payload, settings.auth_jwt.refresh_token_expire_minutes, session_id
     )
 
 
-def encode_jwt(
-    payload: dict,
-    private_key: str = settings.auth_jwt.secret_key,
-    algorithm: str = settings.auth_jwt.algorithm,
-):
-    return jwt.encode(payload, private_key, algorithm)
+def normalize_claims(payload: dict) -> dict:
+    """Claims любой версии в прежнем виде; permissions - маска разрешений или None,
+    session_id - None у токенов, выданных до появления сессий."""
+    if payload.get("v") != CLAIMS_VERSION:
+        payload.setdefault("permissions", None)
+        payload.setdefault("session_id", None)
+        return payload
+    flags = payload.get("f", 0)
+    return {
+        "type": TOKEN_TYPE_NAMES.get(payload.get("t")),
+        "sub": expand_uuid(payload["sub"]),
+        "role_id": expand_uuid(payload["rid"]) if "rid" in payload else None,
+        # идентификатор токена нужен только как ключ (списки отзыва) - без разбора
+        "self_uuid": payload["jti"],
+        "is_admin": bool(flags & FLAG_ADMIN),
+        "is_superuser": bool(flags & FLAG_SUPERUSER),
+        "permissions": payload.get("p"),
+        "session_id": payload.get("sid"),
+        "exp": payload["exp"],
+        "iat": payload["iat"],
+    }
 
 
-def decode_jwt(
-    jwt_token: str,
-    private_key: str = settings.auth_jwt.secret_key,
-    algorithm: str = settings.auth_jwt.algorithm,
-):
+def encode_jwt(payload: dict) -> str:
+    return signing_keys.sign(payload)
+
+
+def decode_jwt(jwt_token: str) -> dict:
     try:
-        decoded = jwt.decode(jwt_token, private_key, algorithms=[algorithm])
+        key, algorithms = signing_keys.verification_key(jwt_token)
+        decoded = normalize_claims(jwt.decode(jwt_token, key, algorithms=algorithms))
     except jwt.exceptions.DecodeError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,9 +154,32 @@ def decode_jwt(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired, refresh token",
         )
+    except (jwt.exceptions.InvalidTokenError, KeyError, ValueError):
+        # KeyError/ValueError - подписанный, но неполный или искаженный v2 токен
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
     return decoded
 
 
+def token_subject(headers: Headers) -> Union[str, None]:
+    """UUID пользователя из access токена (cookie или Bearer) без проверки отзыва.
+
+    Только для выбора ключей (лимиты запросов, реплики); доступ проверяют эндпоинты.
+    """
+    token = cookie_parser(headers.get("cookie", "")).get("access_token")
+    authorization = headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):]
+    if not token:
+        return None
+    try:
+        return decode_jwt(jwt_token=token).get("sub")
+    except (HTTPException, jwt.exceptions.InvalidTokenError):
+        return None
+
+
 def hash_password(
     password: str,
 ) -> bytes:
@@ -0,0 +1,91 @@
+import hashlib
+import math
+import time
+
+from typing import Optional
+
+
+class BloomFilter:
+    """Классический фильтр Блума на bytearray с двойным хешированием."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+
+class RotatingBloomFilter:
+    """Набор фильтров Блума, разложенных по корзинам времени истечения.
+
+    Элемент попадает в корзину по своему exp, и корзина целиком удаляется,
+    когда все ее элементы истекли. Если корзина переполнена, в нее
+    добавляется новый фильтр, чтобы вероятность ложного срабатывания
+    не росла сверх заданной.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, bucket_seconds: int):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bucket_seconds = bucket_seconds
+        self._buckets: dict[int, list[BloomFilter]] = {}
+
+    def add(self, item: str, expire_at: float) -> None:
+        if expire_at <= time.time():
+            return
+        bucket = int(expire_at // self.bucket_seconds)
+        filters = self._buckets.setdefault(bucket, [])
+        if not filters or filters[-1].count >= self.capacity:
+            filters.append(BloomFilter(self.capacity, self.error_rate))
+        filters[-1].add(item)
+
+    def __contains__(self, item: str) -> bool:
+        for filters in self._buckets.values():
+            for bloom in filters:
+                if item in bloom:
+                    return True
+        return False
+
+    def rotate(self, now: Optional[float] = None) -> None:
+        """Удаляет корзины, все элементы которых уже истекли."""
+        current = int((now or time.time()) // self.bucket_seconds)
+        for bucket in [bucket for bucket in self._buckets if bucket < current]:
+            del self._buckets[bucket]
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        filters = [bloom for bucket in self._buckets.values() for bloom in bucket]
+        return {
+            "buckets": len(self._buckets),
+            "filters": len(filters),
+            "items": sum(bloom.count for bloom in filters),
+            "memory_bytes": sum(bloom.memory_bytes for bloom in filters),
+            "error_rate": self.error_rate,
+        }
@@ -1,20 +1,240 @@
-import datetime
+import logging
+import math
+import time
+import uuid
+
+from typing import Optional
+
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+from core import metrics
 from core.config import settings
+from core.constains import RATE_LIMIT_KEY_PREFIX
+from db import redis_db
+from services.utils import token_subject
 
-from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+
+# Сколько клиентов, заблокированных локально, держать в памяти воркера
+LOCAL_BLOCK_MAX = 10000
+
+# Журнал запросов в скользящем окне: sorted set, score - время запроса в мс.
+# Отклоненные запросы в журнал не пишутся. Время берется у Redis, чтобы
+# воркеры на разных хостах считали одно и то же окно.
+# Возвращает {allowed, remaining, reset_ms, retry_ms}
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], window)
+    count = count + 1
+    allowed = 1
+end
+local reset = 0
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+local retry = 0
+if allowed == 0 then
+    retry = reset
+end
+return {allowed, limit - count, reset, retry}
+"""
+
+# Маркерное ведро: hash {tokens, ts}, емкость limit, полное пополнение за period.
+# Возвращает {allowed, remaining, reset_ms, retry_ms}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local rate = capacity / period
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], period)
+return {allowed, math.floor(tokens), math.ceil((capacity - tokens) / rate), retry}
+"""
+
+SCRIPTS = {"sliding_window": SLIDING_WINDOW_SCRIPT, "token_bucket": TOKEN_BUCKET_SCRIPT}
+
+
+def parse_limit(value: str) -> tuple[int, int]:
+    """'20/minute' -> (20, 60)."""
+    count, _, period = value.partition("/")
+    return int(count), PERIODS[period.strip()]
+
+
+class LimitDecision:
+    """Результат проверки лимита; reset и retry_after - в секундах."""
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset: float, retry_after: float = 0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+
+
+class RateLimiter:
+    """Лимит запросов по маршруту и клиенту: один атомарный вызов Lua на запрос.
+
+    Клиент - пользователь из access токена, без токена - IP. Лимит клиента
+    (identities) важнее лимита маршрута (routes, по самому длинному префиксу
+    пути), тот - лимита по умолчанию. Отказ запоминается в памяти воркера до
+    Retry-After, и повторные запросы клиента отклоняются без обращения к Redis.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        default: str,
+        routes: dict[str, str],
+        identities: dict[str, str],
+        local_block: bool = True,
+    ):
+        self.algorithm = algorithm
+        self.default = parse_limit(default)
+        # длинные префиксы проверяются первыми
+        self.routes = sorted(
+            ((prefix, parse_limit(limit)) for prefix, limit in routes.items()),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.identities = {identity: parse_limit(limit) for identity, limit in identities.items()}
+        self.local_block = local_block
+        self._blocked: dict[str, float] = {}
+        self._script: Optional[AsyncScript] = None
+        self._client: Optional[Redis] = None
+        self.checks = 0
+        self.redis_calls = 0
+        self.rejected = 0
+        self.rejected_locally = 0
+        self.errors = 0
+
+    @staticmethod
+    def identity(scope: Scope, headers: Headers) -> str:
+        user_id = token_subject(headers)
+        if user_id:
+            return f"user:{user_id}"
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            return f"ip:{forwarded.split(',')[0].strip()}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    def rule(self, path: str, identity: str) -> tuple[str, tuple[int, int]]:
+        """(имя правила для ключа, (лимит, период в секундах))."""
+        if identity in self.identities:
+            return identity, self.identities[identity]
+        for prefix, limit in self.routes:
+            if path.startswith(prefix):
+                return prefix, limit
+        return "*", self.default
+
+    def script(self, client: Redis) -> AsyncScript:
+        # EVALSHA; при отсутствии скрипта на сервере redis-py загружает его сам
+        if self._script is None or self._client is not client:
+            self._script = client.register_script(SCRIPTS[self.algorithm])
+            self._client = client
+        return self._script
+
+    async def check(self, scope: Scope) -> Optional[LimitDecision]:
+        """None - лимит не проверялся (Redis недоступен или не подключен)."""
+        if redis_db.redis is None:
+            return None
+        self.checks += 1
+        identity = self.identity(scope, Headers(scope=scope))
+        rule, (limit, period) = self.rule(scope.get("path", ""), identity)
+        key = f"{RATE_LIMIT_KEY_PREFIX}{rule}:{identity}"
+
+        now = time.monotonic()
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            if blocked_until > now:
+                self.rejected_locally += 1
+                return LimitDecision(False, limit, 0, blocked_until - now, blocked_until - now)
+            del self._blocked[key]
+
+        try:
+            allowed, remaining, reset_ms, retry_ms = await self.script(redis_db.redis.redis)(
+                keys=[key], args=[limit, period * 1000, uuid.uuid4().hex]
+            )
+        except Exception as e:
+            # при недоступном Redis запросы пропускаются
+            self.errors += 1
+            logger.warning(f"Не удалось проверить лимит запросов: {e}")
+            return None
+        self.redis_calls += 1
+        decision = LimitDecision(bool(allowed), limit, remaining, reset_ms / 1000, retry_ms / 1000)
+        if not decision.allowed:
+            self.rejected += 1
+            if self.local_block:
+                self._block(key, now + decision.retry_after)
+        return decision
+
+    def _block(self, key: str, until: float) -> None:
+        if len(self._blocked) >= LOCAL_BLOCK_MAX:
+            now = time.monotonic()
+            self._blocked = {key: until for key, until in self._blocked.items() if until > now}
+            if len(self._blocked) >= LOCAL_BLOCK_MAX:
+                return
+        self._blocked[key] = until
+
+    def stats(self) -> dict:
+        return {
+            "algorithm": self.algorithm,
+            "checks": self.checks,
+            "redis_calls": self.redis_calls,
+            "rejected": self.rejected,
+            "rejected_locally": self.rejected_locally,
+            "blocked_clients": len(self._blocked),
+            "errors": self.errors,
+        }
 
 
-redis_conn = Redis(host=settings.redis_host, port=settings.redis_port)
+rate_limiter = RateLimiter(
+    algorithm=settings.rate_limit_algorithm,
+    default=settings.rate_limit_default or f"{settings.REQUEST_LIMIT_PER_MINUTE}/minute",
+    routes=settings.rate_limit_routes,
+    identities=settings.rate_limit_identities,
+    local_block=settings.rate_limit_local_block,
+)
+metrics.register("rate_limit", rate_limiter.stats)
 
 
-async def check_limit(user_id: str) -> Optional[bool]:
-     pipe = redis_conn.pipeline()
-     now = datetime.datetime.now()
-     key = f'{user_id}:{now.minute}'
-     await pipe.incr(key, 1)
-     await pipe.expire(key, 59)
-     result = await pipe.execute()
-     request_number = result[0]
-     if request_number > settings.REQUEST_LIMIT_PER_MINUTE:
-         return True
\ No newline at end of file
+async def check_limit(scope: Scope) -> Optional[LimitDecision]:
+    return await rate_limiter.check(scope)
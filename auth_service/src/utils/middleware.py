@@ -0,0 +1,139 @@
+import logging
+
+from typing import Awaitable, Callable, Optional
+
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from opentelemetry import trace
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from db import sql_profiler
+from utils.limits import LimitDecision
+
+
+logger = logging.getLogger(__name__)
+
+Limiter = Callable[[Scope], Awaitable[Optional[LimitDecision]]]
+
+# открытые ключи запрашивают сервисы напрямую, минуя nginx, который добавляет X-Request-Id
+REQUEST_ID_OPTIONAL_PATHS = frozenset(("/.well-known/jwks.json", "/auth/.well-known/jwks.json"))
+
+
+class RequestContextMiddleware:
+    """ASGI-middleware: проверка X-Request-Id, лимит запросов и трассировка.
+
+    Обработчик вызывается ровно один раз, а запросы без X-Request-Id
+    (кроме REQUEST_ID_OPTIONAL_PATHS) отклоняются до обращения к Redis
+    и к самому приложению.
+    Итог проверки лимита отдается в заголовках X-RateLimit-*, при отказе -
+    429 с Retry-After.
+    При profile_sql SQL-команды запроса профилируются (db/sql_profiler.py):
+    итоги пишутся в атрибуты span, при sql_headers - в заголовки X-DB-*.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Optional[Limiter] = None,
+        enable_tracer: bool = False,
+        profile_sql: bool = False,
+        sql_headers: bool = False,
+    ) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.tracer = trace.get_tracer(__name__) if enable_tracer else None
+        self.profile_sql = profile_sql
+        self.sql_headers = sql_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_id = headers.get("x-request-id")
+        if not request_id and scope["path"] not in REQUEST_ID_OPTIONAL_PATHS:
+            response = ORJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": "X-Request-Id is required"},
+            )
+            await response(scope, receive, send)
+            return
+
+        if self.limiter is not None:
+            rate_limit = await self.limiter(scope)
+            if rate_limit is not None:
+                if not rate_limit.allowed:
+                    response = ORJSONResponse(
+                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        content={"detail": "Too many requests"},
+                        headers=rate_limit.headers(),
+                    )
+                    await response(scope, receive, send)
+                    return
+                send = self._send_with_headers(send, rate_limit.headers())
+
+        profile = None
+        if self.profile_sql:
+            profile = sql_profiler.start()
+            if self.sql_headers:
+                send = self._send_with_sql_headers(send, profile)
+
+        if self.tracer is None:
+            await self.app(scope, receive, send)
+            self._report(scope, profile)
+            return
+
+        with self.tracer.start_as_current_span(
+            "http", attributes={"http.request_id": request_id or ""}
+        ) as span:
+            await self.app(scope, receive, send)
+            if profile is not None:
+                span.set_attributes({
+                    "db.statements": profile.statements,
+                    "db.duration_ms": round(profile.duration * 1000, 3),
+                    "db.repeated_statements": profile.repeated_count,
+                })
+                if profile.budget is not None:
+                    span.set_attribute("db.query_budget", profile.budget)
+            self._report(scope, profile)
+
+    @staticmethod
+    def _report(scope: Scope, profile: Optional[sql_profiler.SQLProfile]) -> None:
+        if profile is None:
+            return
+        path = scope.get("path")
+        if profile.over_budget:
+            logger.warning(f"{path}: {profile.statements} SQL-команд при бюджете {profile.budget}")
+        if profile.repeated_count >= settings.sql_repeat_warning:
+            statement, count = max(profile.repeated.items(), key=lambda item: item[1])
+            logger.warning(f"{path}: возможный N+1, команда выполнена {count} раз: {statement}")
+
+    @staticmethod
+    def _send_with_headers(send: Send, extra: dict[str, str]) -> Send:
+        async def wrapped(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in extra.items():
+                    headers.append(name, value)
+            await send(message)
+
+        return wrapped
+
+    @staticmethod
+    def _send_with_sql_headers(send: Send, profile: sql_profiler.SQLProfile) -> Send:
+        """Добавляет заголовки X-DB-* с итогами профилирования SQL запроса."""
+
+        async def wrapped(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Queries", str(profile.statements))
+                headers.append("X-DB-Time-Ms", f"{profile.duration * 1000:.3f}")
+                headers.append("X-DB-Repeated", str(profile.repeated_count))
+                if profile.budget is not None:
+                    headers.append("X-DB-Query-Budget", str(profile.budget))
+            await send(message)
+
+        return wrapped
@@ -0,0 +1,38 @@
+"""Пропускная способность /users/check_permission.
+
+Сравнение с кэшем снимков и без него: запустить сервис с
+SNAPSHOT_CACHE_ENABLED=true, затем с SNAPSHOT_CACHE_ENABLED=false,
+и оба раза выполнить из каталога auth_service:
+    python tests/benchmarks/bench_check_permission.py --requests 5000
+"""
+import asyncio
+
+import aiohttp
+
+from http_load import base_parser, login, print_result, request_headers, run_load
+
+
+async def main(args):
+    async with aiohttp.ClientSession() as session:
+        cookies = await login(session, args.url, args.email, args.password)
+
+        async def check_permission():
+            async with session.post(
+                args.url + "/users/check_permission",
+                params={"name": args.permission},
+                cookies=cookies,
+                headers=request_headers(),
+            ) as response:
+                await response.read()
+                return response.status
+
+        # прогрев кэша
+        await check_permission()
+        result = await run_load(check_permission, args.requests, args.concurrency)
+        print_result("/users/check_permission", result)
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--permission", default="read")
+    asyncio.run(main(parser.parse_args()))
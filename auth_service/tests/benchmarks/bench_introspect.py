@@ -0,0 +1,61 @@
+"""Проверка многих токенов: по одному через /users/me против /tokens/introspect.
+
+Токены - --sessions входов суперпользователя, в пачке повторяются по кругу
+до --batch штук. Каждый вызов проверяет пачку: либо --batch параллельными
+запросами /users/me, либо одним запросом introspect. Печатается число
+проверенных токенов в секунду и задержка проверки всей пачки.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_introspect.py --requests 200 --batch 50
+"""
+import asyncio
+
+import aiohttp
+
+from http_load import base_parser, login, print_result, request_headers, run_load
+
+
+async def main(args):
+    async with aiohttp.ClientSession() as session:
+        tokens = [
+            (await login(session, args.url, args.email, args.password))["access_token"]
+            for _ in range(args.sessions)
+        ]
+        batch = [tokens[number % len(tokens)] for number in range(args.batch)]
+
+        async def users_me(token: str) -> int:
+            async with session.get(
+                args.url + "/users/me",
+                headers={**request_headers(), "Authorization": f"Bearer {token}"},
+            ) as response:
+                await response.read()
+                return response.status
+
+        async def one_by_one():
+            statuses = await asyncio.gather(*(users_me(token) for token in batch))
+            return max(statuses)
+
+        async def introspect():
+            async with session.post(
+                args.url + "/tokens/introspect",
+                json={"tokens": batch},
+                # клиент проверки - сам суперпользователь
+                headers={**request_headers(), "Authorization": f"Bearer {tokens[0]}"},
+            ) as response:
+                results = await response.json()
+                assert all(result["active"] for result in results), results
+                return response.status
+
+        for name, call in ((f"{args.batch} x /users/me", one_by_one), ("/tokens/introspect", introspect)):
+            await call()
+            result = await run_load(call, args.requests, args.concurrency)
+            print_result(name, result)
+            print(f"{'':<32} {result['rps'] * args.batch:>9.0f} токенов/s")
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.set_defaults(requests=200, concurrency=4)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,62 @@
+"""Бенчмарк подписи и проверки токенов: HS256 против RS256 и EdDSA.
+
+Для каждого алгоритма - подписей и проверок в секунду и размер access токена
+с теми же claims, что выдает сервис. Подпись выполняется только в auth_service,
+проверка - во всех сервисах на каждом запросе (без кэша токенов).
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_jwt_algorithms.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from services.signing_keys import SigningKey  # noqa: E402
+
+SECRET = "secret-key"
+
+
+def payload() -> dict:
+    now = int(time.time())
+    return {
+        "sub": str(uuid.uuid4()),
+        "roles": ["subscriber"],
+        "iat": now,
+        "exp": now + 20 * 60,
+        "type": "access",
+    }
+
+
+def rate(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - started)
+
+
+def main(args):
+    claims = payload()
+    cases = {"HS256": (SECRET, SECRET, {})}
+    for algorithm in ("RS256", "EdDSA"):
+        now = time.time()
+        key = SigningKey.generate(algorithm, now, now + 60, now + 60)
+        cases[algorithm] = (key.private_key, key.public_key, {"kid": key.kid})
+
+    print(f"{'algorithm':<10}{'sign/s':>12}{'verify/s':>12}{'token bytes':>13}")
+    for algorithm, (private_key, public_key, headers) in cases.items():
+        token = jwt.encode(claims, private_key, algorithm, headers=headers)
+        sign = rate(lambda: jwt.encode(claims, private_key, algorithm, headers=headers), args.iterations)
+        verify = rate(lambda: jwt.decode(token, public_key, algorithms=[algorithm]), args.iterations)
+        print(f"{algorithm:<10}{sign:>12.0f}{verify:>12.0f}{len(token):>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    main(parser.parse_args())
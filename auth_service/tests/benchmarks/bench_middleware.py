@@ -0,0 +1,104 @@
+"""Микробенчмарк цепочки middleware auth_service.
+
+Считает количество вызовов обработчика и накладные расходы на запрос
+для прежнего BaseHTTPMiddleware (с двойным call_next) и для
+RequestContextMiddleware.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_middleware.py --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from utils.middleware import RequestContextMiddleware  # noqa: E402
+
+
+class CountingApp:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await PlainTextResponse("ok")(scope, receive, send)
+
+
+async def no_limit(scope):
+    return None
+
+
+class LegacyMiddleware(BaseHTTPMiddleware):
+    """Копия прежнего before_request: обработчик вызывается дважды."""
+
+    async def dispatch(self, request, call_next):
+        await no_limit(request.headers.get("X-Forwarded-For"))
+        response = await call_next(request)
+        response = await call_next(request)
+        return response
+
+
+def make_scope(request_id="bench"):
+    headers = [(b"host", b"bench")]
+    if request_id:
+        headers.append((b"x-request-id", request_id.encode()))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/",
+        "raw_path": b"/",
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+
+async def run(app, requests, request_id="bench"):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(make_scope(request_id), receive, send)
+    return time.perf_counter() - started
+
+
+async def main(requests):
+    baseline = CountingApp()
+    base_time = await run(baseline, requests)
+
+    cases = {
+        "legacy BaseHTTPMiddleware": lambda a: LegacyMiddleware(a),
+        "RequestContextMiddleware": lambda a: RequestContextMiddleware(a, limiter=no_limit),
+    }
+    print(f"{'middleware':<28}{'handler calls':>15}{'overhead, us/req':>20}")
+    for name, factory in cases.items():
+        handler = CountingApp()
+        elapsed = await run(factory(handler), requests)
+        overhead = (elapsed - base_time) / requests * 1e6
+        print(f"{name:<28}{handler.calls:>15}{overhead:>20.2f}")
+
+    handler = CountingApp()
+    await run(RequestContextMiddleware(handler, limiter=no_limit), requests, request_id=None)
+    print(f"без X-Request-Id обработчик вызван {handler.calls} раз")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
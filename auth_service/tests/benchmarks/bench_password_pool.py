@@ -0,0 +1,78 @@
+"""Параллельные /login и /user_registration и задержка event loop.
+
+Пока идет нагрузка, отдельная корутина раз в --probe-interval секунд
+запрашивает легкий /metrics от имени суперпользователя. Если bcrypt блокирует event loop, задержка
+этих проб растет вместе с нагрузкой; с пулом процессов она остается ровной.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_password_pool.py --requests 500 --concurrency 50
+"""
+import asyncio
+import statistics
+import time
+import uuid
+
+import aiohttp
+
+from http_load import base_parser, login, print_result, request_headers, run_load
+
+
+async def probe_loop(session, url, cookies, interval, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with session.get(url + "/metrics", headers=request_headers(), cookies=cookies) as response:
+            await response.read()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def with_probe(session, args, cookies, name, call):
+    stop = asyncio.Event()
+    latencies = []
+    probe = asyncio.create_task(probe_loop(session, args.url, cookies, args.probe_interval, stop, latencies))
+    result = await run_load(call, args.requests, args.concurrency)
+    stop.set()
+    await probe
+    print_result(name, result)
+    latencies.sort()
+    print(
+        f"{'  задержка проб /metrics':<32} p50 {statistics.median(latencies):>7.2f} ms  "
+        f"max {latencies[-1]:>7.2f} ms  ({len(latencies)} проб)"
+    )
+
+
+async def main(args):
+    async with aiohttp.ClientSession() as session:
+        cookies = await login(session, args.url, args.email, args.password)
+        password = "benchmark-password"
+        emails = []
+
+        async def registration():
+            email = f"bench-{uuid.uuid4()}@example.com"
+            emails.append(email)
+            async with session.post(
+                args.url + "/users/user_registration",
+                params={"email": email, "password": password},
+                headers=request_headers(),
+            ) as response:
+                await response.read()
+                return response.status
+
+        async def user_login():
+            email = emails[int(time.perf_counter() * 1e6) % len(emails)]
+            async with session.post(
+                args.url + "/users/login",
+                params={"email": email, "password": password},
+                headers=request_headers(),
+            ) as response:
+                await response.read()
+                return response.status
+
+        await with_probe(session, args, cookies, "/users/user_registration", registration)
+        await with_probe(session, args, cookies, "/users/login", user_login)
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,146 @@
+"""Бенчмарк лимитера запросов против локального Redis.
+
+Сравнивает прежний фиксированный счетчик (INCR+EXPIRE в pipeline на ключ
+user_id:minute) со скользящим окном и маркерным ведром на Lua:
+  - команд Redis и сетевых вызовов на запрос (по INFO commandstats);
+  - задержку проверки;
+  - сколько запросов пропускается всплеском на границе окна (у фиксированного
+    счетчика - до 2x лимита);
+  - сколько обращений к Redis экономит локальная блокировка для клиента,
+    продолжающего слать запросы сверх лимита.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_rate_limit.py --requests 5000 --limit 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from db import redis_db  # noqa: E402
+from db.redis_db import RedisCache  # noqa: E402
+from utils.limits import RateLimiter  # noqa: E402
+
+
+class FixedWindow:
+    """Прежний check_limit с окном window секунд вместо минуты."""
+
+    def __init__(self, client: Redis, limit: int, window: int):
+        self.client = client
+        self.limit = limit
+        self.window = window
+        self.redis_calls = 0
+
+    async def allowed(self, identity: str) -> bool:
+        key = f"bench_fixed:{identity}:{int(time.time() // self.window)}"
+        pipe = self.client.pipeline()
+        pipe.incr(key, 1)
+        pipe.expire(key, self.window)
+        count, _ = await pipe.execute()
+        self.redis_calls += 1
+        return count <= self.limit
+
+
+class LuaLimiter:
+    def __init__(self, algorithm: str, limit: int, window: int, local_block: bool):
+        self.limiter = RateLimiter(algorithm, f"{limit}/{window_name(window)}", {}, {}, local_block)
+
+    @property
+    def redis_calls(self) -> int:
+        return self.limiter.redis_calls
+
+    async def allowed(self, identity: str) -> bool:
+        decision = await self.limiter.check(make_scope(identity))
+        return decision is None or decision.allowed
+
+
+def window_name(window: int) -> str:
+    return {1: "second", 60: "minute", 3600: "hour"}[window]
+
+
+def make_scope(identity: str) -> dict:
+    return {"type": "http", "path": "/auth/api/v1/users/me", "headers": [], "client": (identity, 1)}
+
+
+async def commands(client: Redis) -> int:
+    stats = await client.info("commandstats")
+    return sum(value["calls"] for name, value in stats.items() if name != "cmdstat_info")
+
+
+async def measure(client: Redis, limiter, requests: int, clients: int) -> tuple[float, float, float]:
+    """Команд Redis и вызовов на запрос, мкс на запрос; клиенты в пределах лимита."""
+    identities = [f"10.{i // 256}.{i % 256}.{uuid.uuid4().int % 250}" for i in range(clients)]
+    before, calls_before = await commands(client), limiter.redis_calls
+    started = time.perf_counter()
+    for number in range(requests):
+        await limiter.allowed(identities[number % clients])
+    elapsed = time.perf_counter() - started
+    # сам INFO тоже учитывается одной командой
+    used = await commands(client) - before - 1
+    return used / requests, (limiter.redis_calls - calls_before) / requests, elapsed / requests * 1e6
+
+
+async def boundary_burst(make, limit: int) -> int:
+    """Лимит запросов в конце окна и еще лимит сразу после его смены."""
+    limiter = make()
+    identity = f"burst-{uuid.uuid4().hex[:8]}"
+    # ждем последние 100 мс секундного окна
+    await asyncio.sleep(1 - time.time() % 1 + 0.9)
+    allowed = 0
+    for _ in range(limit):
+        allowed += await limiter.allowed(identity)
+    await asyncio.sleep(1 - time.time() % 1 + 0.01)
+    for _ in range(limit):
+        allowed += await limiter.allowed(identity)
+    return allowed
+
+
+async def abusive_client(make, limit: int, requests: int) -> int:
+    """Обращений к Redis от клиента, шлющего requests запросов подряд."""
+    limiter = make()
+    identity = f"abuse-{uuid.uuid4().hex[:8]}"
+    for _ in range(requests):
+        await limiter.allowed(identity)
+    return limiter.redis_calls
+
+
+async def main(args):
+    client = Redis(host=args.redis_host, port=args.redis_port)
+    redis_db.redis = RedisCache(client)
+    cases = {
+        "fixed window INCR+EXPIRE": lambda window: FixedWindow(client, args.limit, window),
+        "sliding window (Lua)": lambda window: LuaLimiter("sliding_window", args.limit, window, True),
+        "token bucket (Lua)": lambda window: LuaLimiter("token_bucket", args.limit, window, True),
+    }
+
+    print(f"{'limiter':<28}{'cmds/req':>10}{'calls/req':>11}{'us/req':>9}"
+          f"{'burst allowed':>15}{'abuse calls':>13}")
+    for name, make in cases.items():
+        cmds, calls, latency = await measure(client, make(60), args.requests, args.clients)
+        burst = await boundary_burst(lambda: make(1), args.limit)
+        abuse = await abusive_client(lambda: make(60), args.limit, args.abuse_requests)
+        burst_share = f"{burst}/{2 * args.limit}"
+        print(f"{name:<28}{cmds:>10.2f}{calls:>11.2f}{latency:>9.0f}{burst_share:>15}{abuse:>13}")
+
+    no_block = LuaLimiter("sliding_window", args.limit, 60, False)
+    abuse = await abusive_client(lambda: no_block, args.limit, args.abuse_requests)
+    print(f"sliding window без локальной блокировки: {abuse} обращений к Redis "
+          f"на {args.abuse_requests} запросов")
+    await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--abuse-requests", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
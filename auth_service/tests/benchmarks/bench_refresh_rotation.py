@@ -0,0 +1,128 @@
+"""Бенчмарк обмена refresh токена против локального Redis.
+
+Сравнивает прежнюю последовательность (GET белого списка, транзакция
+обновления списков, скрипт сохранения сессии - три сетевых вызова; загрузка
+пользователя из Postgres не учитывается) с одним вызовом ROTATE_SCRIPT:
+  - команд Redis и сетевых вызовов на обмен (по INFO commandstats);
+  - задержку обмена;
+  - сколько из --parallel одновременных обменов одного токена завершаются
+    успехом (должен ровно один).
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_refresh_rotation.py --rotations 5000 --parallel 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from db.redis_db import RedisCache  # noqa: E402
+from services.session_store import SessionStore  # noqa: E402
+from services.token_store import WHITE_LIST, TokenStore  # noqa: E402
+
+
+def payload(ttl: int) -> dict:
+    return {"self_uuid": uuid.uuid4().hex, "exp": int(time.time()) + ttl}
+
+
+class Session:
+    """Текущая пара токенов сессии бенчмарка."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.session_id = uuid.uuid4().hex
+        self.access = payload(300)
+        self.refresh = payload(3600)
+
+    def next_pair(self) -> tuple[dict, dict]:
+        return payload(300), payload(3600)
+
+
+async def sequential(store: SessionStore, session: Session) -> bool:
+    """Прежний refresh_access_token без обращения к Postgres."""
+    if not await store.token_store.contains(WHITE_LIST, session.refresh):
+        return False
+    access, refresh = session.next_pair()
+    await store.token_store.update(
+        black_list=[session.access], white_list=[refresh], del_white_list=[session.refresh]
+    )
+    await store.save(session.user_id, session.session_id, access, refresh)
+    session.access, session.refresh = access, refresh
+    return True
+
+
+async def atomic(store: SessionStore, session: Session) -> bool:
+    access, refresh = session.next_pair()
+    status = await store.rotate(
+        session.user_id, session.session_id, session.refresh, access, refresh, session.access
+    )
+    if status != 1:
+        return False
+    session.access, session.refresh = access, refresh
+    return True
+
+
+async def start_session(store: SessionStore) -> Session:
+    session = Session(f"bench-{uuid.uuid4().hex[:8]}")
+    await store.token_store.update(white_list=[session.refresh])
+    await store.save(session.user_id, session.session_id, session.access, session.refresh)
+    return session
+
+
+async def commands(client: Redis) -> int:
+    stats = await client.info("commandstats")
+    return sum(value["calls"] for name, value in stats.items() if name != "cmdstat_info")
+
+
+async def measure(client: Redis, store: SessionStore, rotate, rotations: int) -> tuple[float, float]:
+    """Команд Redis на обмен и мкс на обмен."""
+    session = await start_session(store)
+    before = await commands(client)
+    started = time.perf_counter()
+    for _ in range(rotations):
+        assert await rotate(store, session)
+    elapsed = time.perf_counter() - started
+    # сам INFO тоже учитывается одной командой
+    used = await commands(client) - before - 1
+    return used / rotations, elapsed / rotations * 1e6
+
+
+async def race(store: SessionStore, rotate, parallel: int) -> int:
+    """Успешных обменов из parallel одновременных с одной и той же парой токенов."""
+    session = await start_session(store)
+    copies = []
+    for _ in range(parallel):
+        copy = Session(session.user_id)
+        copy.session_id, copy.access, copy.refresh = session.session_id, session.access, session.refresh
+        copies.append(copy)
+    results = await asyncio.gather(*(rotate(store, copy) for copy in copies))
+    return sum(results)
+
+
+async def main(args):
+    client = Redis(host=args.redis_host, port=args.redis_port, max_connections=args.parallel * 2)
+    cache = RedisCache(client)
+    store = SessionStore(cache, TokenStore(cache))
+    cases = {"GET + MULTI + save (прежний)": (sequential, 3), "ROTATE_SCRIPT": (atomic, 1)}
+
+    print(f"{'rotation':<30}{'calls/op':>10}{'cmds/op':>9}{'us/op':>8}{'race winners':>14}")
+    for name, (rotate, calls) in cases.items():
+        cmds, latency = await measure(client, store, rotate, args.rotations)
+        winners = await race(store, rotate, args.parallel)
+        print(f"{name:<30}{calls:>10}{cmds:>9.1f}{latency:>8.0f}{f'{winners}/{args.parallel}':>14}")
+    await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--rotations", type=int, default=5000)
+    parser.add_argument("--parallel", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""Проверка черного списка: фильтр Блума против Redis GET.
+
+Заполняет RotatingBloomFilter N отозванными self_uuid с exp, распределенным
+по времени жизни access токена, и измеряет память, долю ложных срабатываний
+и время проверки. Для сравнения замеряется GET отсутствующего ключа в Redis.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_revocation_filter.py --revoked 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from utils.bloom import RotatingBloomFilter  # noqa: E402
+
+
+def fill_filter(args) -> RotatingBloomFilter:
+    bloom = RotatingBloomFilter(args.capacity, args.error_rate, args.bucket_seconds)
+    now = time.time()
+    for _ in range(args.revoked):
+        bloom.add(str(uuid.uuid4()), now + random.uniform(1, args.token_lifetime))
+    return bloom
+
+
+async def redis_latency(host: str, port: int, checks: int) -> float:
+    redis = Redis(host=host, port=port)
+    try:
+        started = time.perf_counter()
+        for _ in range(checks):
+            await redis.get("black_list:" + str(uuid.uuid4()))
+        return (time.perf_counter() - started) / checks
+    finally:
+        await redis.close()
+
+
+def main(args):
+    started = time.perf_counter()
+    bloom = fill_filter(args)
+    print(f"заполнение {args.revoked} элементов: {time.perf_counter() - started:.1f} с")
+    print(f"статистика: {bloom.stats()}")
+
+    probes = [str(uuid.uuid4()) for _ in range(args.checks)]
+    started = time.perf_counter()
+    false_positives = sum(1 for item in probes if item in bloom)
+    bloom_latency = (time.perf_counter() - started) / args.checks
+    print(f"ложные срабатывания: {false_positives / args.checks:.4%}")
+    print(f"проверка в фильтре:  {bloom_latency * 1e6:>8.2f} мкс")
+
+    if not args.skip_redis:
+        latency = asyncio.run(redis_latency(args.host, args.port, args.checks))
+        print(f"Redis GET:           {latency * 1e6:>8.2f} мкс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--revoked", type=int, default=1000000)
+    parser.add_argument("--checks", type=int, default=10000)
+    parser.add_argument("--capacity", type=int, default=100000)
+    parser.add_argument("--error-rate", type=float, default=0.001)
+    parser.add_argument("--bucket-seconds", type=int, default=3600)
+    parser.add_argument("--token-lifetime", type=int, default=20 * 60 * 60)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--skip-redis", action="store_true")
+    main(parser.parse_args())
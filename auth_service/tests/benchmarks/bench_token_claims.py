@@ -0,0 +1,79 @@
+"""Бенчмарк формата claims access токена: прежний (v1) против компактного (v2).
+
+Для каждого алгоритма подписи - размер токена, размер заголовка Cookie
+с access и refresh токенами, время проверки с приведением claims к общему
+виду (decode_jwt). Заодно проверяется, что токены обеих версий
+расшифровываются в одинаковые claims.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_token_claims.py --iterations 5000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from core.config import settings  # noqa: E402
+from models.value_objects import Role_names  # noqa: E402
+from services import utils  # noqa: E402
+from services.signing_keys import SigningKey, signing_keys  # noqa: E402
+
+COMPARED_CLAIMS = ("type", "sub", "role_id", "is_admin", "is_superuser")
+
+
+def use_algorithm(algorithm: str) -> None:
+    signing_keys.algorithm = algorithm
+    if signing_keys.asymmetric:
+        now = time.time()
+        key = SigningKey.generate(algorithm, now, now + 3600, now + 3600)
+        signing_keys.keys = {key.kid: key}
+        signing_keys.current = key
+
+
+def issue(version: int, user, mask: int) -> tuple[str, str]:
+    settings.jwt_claims_version = version
+    return (
+        utils.create_access_token(user, Role_names.admin, mask),
+        utils.create_refresh_token(user),
+    )
+
+
+def decode_rate(token: str, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        utils.decode_jwt(token)
+    return iterations / (time.perf_counter() - started)
+
+
+def main(args):
+    user = SimpleNamespace(id=uuid.uuid4(), role_id=uuid.uuid4(), is_superuser=False)
+    mask = (1 << args.permissions) - 1
+
+    print(f"{'algorithm':<10}{'claims':>7}{'token bytes':>13}{'cookie bytes':>14}{'decode/s':>10}")
+    for algorithm in args.algorithm:
+        use_algorithm(algorithm)
+        decoded = {}
+        for version in (1, 2):
+            access, refresh = issue(version, user, mask)
+            cookie = f"access_token={access}; refresh_token={refresh}"
+            decoded[version] = utils.decode_jwt(access)
+            rate = decode_rate(access, args.iterations)
+            print(f"{algorithm:<10}{'v' + str(version):>7}{len(access):>13}{len(cookie):>14}{rate:>10.0f}")
+        for claim in COMPARED_CLAIMS:
+            assert decoded[1][claim] == decoded[2][claim], claim
+        assert decoded[2]["permissions"] == mask
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--permissions", type=int, default=16, help="битов в маске разрешений")
+    parser.add_argument("--algorithm", action="append", default=None, help="HS256, RS256, EdDSA")
+    args = parser.parse_args()
+    args.algorithm = args.algorithm or ["HS256", "RS256", "EdDSA"]
+    main(args)
@@ -0,0 +1,75 @@
+"""Объем памяти Redis под белый/черный списки токенов.
+
+Моделирует N логинов и сравнивает прежний формат записей (значение - весь
+токен в JSON, TTL из настроек) с форматом TokenStore (значение - маркер,
+TTL - остаток жизни токена). Использует отдельную базу Redis и очищает ее.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_token_store_memory.py --logins 1000000 --db 15
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import jwt
+from redis.asyncio import Redis
+
+BATCH = 10000
+
+
+def make_refresh_token(now: float) -> tuple[str, dict]:
+    payload = {
+        "type": "refresh",
+        "sub": str(uuid.uuid4()),
+        "self_uuid": str(uuid.uuid4()),
+        "exp": now + 30 * 24 * 60 * 60,
+        "iat": now,
+    }
+    return jwt.encode(payload, "secret-key", "HS256"), payload
+
+
+async def used_memory(redis: Redis) -> int:
+    info = await redis.info("memory")
+    return info["used_memory"]
+
+
+async def fill(redis: Redis, logins: int, legacy: bool) -> int:
+    await redis.flushdb()
+    before = await used_memory(redis)
+    now = time.time()
+    for start in range(0, logins, BATCH):
+        async with redis.pipeline(transaction=False) as pipe:
+            for _ in range(min(BATCH, logins - start)):
+                token, payload = make_refresh_token(now)
+                key = "white_list:" + payload["self_uuid"]
+                if legacy:
+                    pipe.set(key, json.dumps(token), ex=30 * 24 * 60 * 60)
+                else:
+                    pipe.set(key, b"1", ex=int(payload["exp"] - now))
+            await pipe.execute()
+    return await used_memory(redis) - before
+
+
+async def main(args):
+    redis = Redis(host=args.host, port=args.port, db=args.db)
+    try:
+        for name, legacy in (("токен в значении", True), ("TokenStore", False)):
+            delta = await fill(redis, args.logins, legacy)
+            print(
+                f"{name:<18} {args.logins} ключей: {delta / 1024 / 1024:>9.1f} MiB, "
+                f"{delta / args.logins:>6.0f} байт/ключ"
+            )
+    finally:
+        await redis.flushdb()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=15)
+    parser.add_argument("--logins", type=int, default=1000000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""Массовый импорт пользователей: строк в секунду на 10k/100k/1M.
+
+Генерирует синтетический NDJSON и отправляет его потоком в /users/import
+от имени суперпользователя. Пароли хешируются пулом процессов, поэтому
+результат в основном определяется PASSWORD_HASH_WORKERS и cost bcrypt;
+для оценки самой вставки запустите сервис с PASSWORD_BCRYPT_ROUNDS=4.
+
+Запуск из каталога auth_service:
+    python tests/benchmarks/bench_user_import.py --sizes 10000 100000 1000000
+"""
+import asyncio
+import json
+import time
+import uuid
+
+import aiohttp
+
+from http_load import base_parser, login, request_headers
+
+
+async def generate(size: int, run_id: str, chunk_rows: int = 1000):
+    chunk = []
+    for i in range(size):
+        chunk.append(json.dumps({
+            "email": f"import-{run_id}-{i}@example.com",
+            "password": "benchmark-password",
+            "first_name": "Bench",
+            "last_name": str(i),
+        }))
+        if len(chunk) >= chunk_rows:
+            yield ("\n".join(chunk) + "\n").encode()
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode()
+
+
+async def import_once(session, args, cookies, size: int) -> None:
+    run_id = uuid.uuid4().hex[:8]
+    started = time.perf_counter()
+    async with session.post(
+        args.url + "/users/import",
+        params={"data_format": "ndjson"},
+        data=generate(size, run_id),
+        headers={**request_headers(), "Content-Type": "application/x-ndjson"},
+        cookies=cookies,
+        timeout=aiohttp.ClientTimeout(total=None),
+    ) as response:
+        statuses = {}
+        async for line in response.content:
+            if line.strip():
+                result = json.loads(line)
+                statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    elapsed = time.perf_counter() - started
+    print(f"{size:>9} строк  {elapsed:>8.1f} s  {size / elapsed:>9.0f} строк/с  {statuses}")
+
+
+async def main(args):
+    async with aiohttp.ClientSession() as session:
+        cookies = await login(session, args.url, args.email, args.password)
+        for size in args.sizes:
+            await import_once(session, args, cookies, size)
+
+
+if __name__ == "__main__":
+    parser = base_parser(__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+"""Общие функции HTTP-бенчмарков против запущенного auth_service."""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import aiohttp
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--url", default=os.getenv("AUTH_URL", "http://127.0.0.1:8000/auth/api/v1")
+    )
+    parser.add_argument("--email", default=os.getenv("SU_email", "superuser"))
+    parser.add_argument("--password", default=os.getenv("SU_password", "superuser"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    return parser
+
+
+def request_headers() -> dict:
+    return {"X-Request-Id": str(uuid.uuid4())}
+
+
+async def login(session: aiohttp.ClientSession, url: str, email: str, password: str) -> dict:
+    async with session.post(
+        url + "/users/login",
+        params={"email": email, "password": password},
+        headers=request_headers(),
+    ) as response:
+        assert response.status == 200, await response.text()
+        return {
+            "access_token": response.cookies["access_token"].value,
+            "refresh_token": response.cookies["refresh_token"].value,
+        }
+
+
+async def run_load(call, requests: int, concurrency: int) -> dict:
+    """Выполняет call() requests раз с ограничением параллельности."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            status = await call()
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "statuses": statuses,
+    }
+
+
+def print_result(name: str, result: dict) -> None:
+    print(
+        f"{name:<32} {result['rps']:>9.0f} req/s  "
+        f"p50 {result['p50_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms  "
+        f"статусы {result['statuses']}"
+    )
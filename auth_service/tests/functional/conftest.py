@@ -23,3 +23,28 @@ def make_put_request():
         return response
 
     return inner
+
+
+@pytest_asyncio.fixture()
+def assert_db_queries():
+    """Проверяет SQL-профиль запроса по заголовкам X-DB-*.
+
+    Заголовки отдаются сервисом при SQL_DEBUG_HEADERS=True. Число команд
+    сравнивается с бюджетом, объявленным у эндпоинта (X-DB-Query-Budget),
+    и с budget, если он передан; повторы одной команды (N+1) не допускаются.
+    """
+    def inner(response, budget: int = None, repeated: int = 0):
+        assert "X-DB-Queries" in response.headers, "SQL_DEBUG_HEADERS is disabled"
+        count = int(response.headers["X-DB-Queries"])
+        declared = response.headers.get("X-DB-Query-Budget")
+        if declared is not None:
+            assert count <= int(declared), (
+                f"{response.url}: {count} SQL statements, declared budget {declared}"
+            )
+        if budget is not None:
+            assert count <= budget, f"{response.url}: {count} SQL statements, budget {budget}"
+        assert int(response.headers["X-DB-Repeated"]) <= repeated, (
+            f"{response.url}: repeated SQL statements (N+1)"
+        )
+
+    return inner
@@ -10,12 +10,30 @@ class TestSettings(BaseSettings):
     SERVICE_HOST: str = Field(default={env.get("SERVICE_HOST")})
     SERVICE_PORT: int = Field(default={env.get("SERVICE_PORT")})
 
+    DB_NAME: str = Field(default={env.get("DB_NAME")})
+    DB_USER: str = Field(default={env.get("DB_USER")})
+    DB_PASSWORD: str = Field(default={env.get("DB_PASSWORD")})
+    DB_HOST: str = Field(default={env.get("DB_HOST")})
+    DB_PORT: int = Field(default={env.get("DB_PORT")})
+
+    REDIS_HOST: str = Field(default={env.get("REDIS_HOST")})
+    REDIS_PORT: int = Field(default={env.get("REDIS_PORT")})
+
     SU_email: str = Field(default={env.get("SU_email")})
     SU_password: str = Field(default={env.get("SU_password")})
 
+    # общий секрет сервиса (auth_jwt.secret_key) - для токенов прежнего формата
+    JWT_SECRET_KEY: str = Field(default="secret-key")
+    # токен сервиса для /tokens/introspect (INTROSPECT_CLIENT_TOKENS сервиса)
+    INTROSPECT_CLIENT_TOKEN: str = Field(default="introspect-test-client")
+
     @property
     def SERVISE_URL(self):
         return f"http://{self.SERVICE_HOST}:{self.SERVICE_PORT}"
 
+    @property
+    def DB_DSN(self):
+        return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
 
 test_settings = TestSettings()
@@ -0,0 +1,72 @@
+import uuid
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+
+
+@pytest.mark.asyncio
+async def test_introspect_batch():
+    """Результаты в порядке токенов; отозванный и испорченный токены неактивны."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        headers = {"X-Request-Id": str(uuid.uuid4())}
+        login = await client.post(
+            "/api/v1/users/login", params={"email": "superuser", "password": "superuser"}, headers=headers
+        )
+        access, refresh = login.cookies.get("access_token"), login.cookies.get("refresh_token")
+        revoked = await client.post(
+            "/api/v1/users/login", params={"email": "superuser", "password": "superuser"}, headers=headers
+        )
+        await client.post("/api/v1/users/logout", headers=headers, cookies=revoked.cookies)
+
+        client_headers = {**headers, "Authorization": f"Bearer {test_settings.INTROSPECT_CLIENT_TOKEN}"}
+        response = await client.post(
+            "/api/v1/tokens/introspect",
+            json={"tokens": [access, refresh, revoked.cookies.get("access_token"), "broken"]},
+            headers=client_headers,
+        )
+        too_many = await client.post(
+            "/api/v1/tokens/introspect", json={"tokens": [access] * 1000}, headers=client_headers
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    active_access, active_refresh, revoked_access, broken = response.json()
+    assert active_access["active"] and active_access["token_type"] == "access"
+    assert active_access["is_superuser"]
+    assert active_access["user_id"]
+    assert active_refresh["active"] and active_refresh["token_type"] == "refresh"
+    assert not revoked_access["active"] and revoked_access["revoked"]
+    assert not broken["active"] and broken["error"]
+    assert too_many.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_introspect_requires_client_authentication():
+    """Без токена сервиса или суперпользователя проверка токенов недоступна."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        headers = {"X-Request-Id": str(uuid.uuid4())}
+        login = await client.post(
+            "/api/v1/users/login", params={"email": "superuser", "password": "superuser"}, headers=headers
+        )
+        access = login.cookies.get("access_token")
+        anonymous = await client.post("/api/v1/tokens/introspect", json={"tokens": [access]}, headers=headers)
+        wrong_client = await client.post(
+            "/api/v1/tokens/introspect",
+            json={"tokens": [access]},
+            headers={**headers, "Authorization": "Bearer not-a-client"},
+        )
+        superuser = await client.post(
+            "/api/v1/tokens/introspect",
+            json={"tokens": [access]},
+            headers={**headers, "Authorization": f"Bearer {access}"},
+        )
+
+    assert anonymous.status_code == HTTPStatus.UNAUTHORIZED
+    assert wrong_client.status_code == HTTPStatus.UNAUTHORIZED
+    assert superuser.status_code == HTTPStatus.OK
+    assert superuser.json()[0]["active"]
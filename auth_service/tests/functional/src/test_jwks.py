@@ -0,0 +1,50 @@
+import uuid
+from http import HTTPStatus
+
+import jwt
+import pytest
+from httpx import AsyncClient
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+
+
+@pytest.mark.asyncio
+async def test_access_token_verified_by_jwks():
+    """Access токен подписан ключом из JWKS и проверяется без общего секрета."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        headers = {"X-Request-Id": str(uuid.uuid4())}
+        login = await client.post(
+            "/api/v1/users/login", params={"email": "superuser", "password": "superuser"}, headers=headers
+        )
+        jwks = await client.get("/.well-known/jwks.json", headers=headers)
+
+    assert login.status_code == HTTPStatus.OK
+    assert jwks.status_code == HTTPStatus.OK
+    assert "max-age" in jwks.headers["Cache-Control"]
+
+    token = login.cookies.get("access_token")
+    header = jwt.get_unverified_header(token)
+    keys = {key["kid"]: key for key in jwks.json()["keys"]}
+    assert header["kid"] in keys
+
+    key = jwt.PyJWK(keys[header["kid"]])
+    claims = jwt.decode(token, key.key, algorithms=[key.algorithm_name])
+    assert claims["sub"]
+
+
+@pytest.mark.asyncio
+async def test_jwks_served_without_request_id():
+    """content_service запрашивает JWKS напрямую, без nginx и X-Request-Id."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        jwks = await client.get("/.well-known/jwks.json")
+        # путь из AUTH_JWKS_URL content_service
+        prefixed = await client.get("/auth/.well-known/jwks.json")
+        other = await client.get("/api/v1/users/me")
+
+    assert jwks.status_code == HTTPStatus.OK
+    assert jwks.json()["keys"]
+    assert prefixed.status_code == HTTPStatus.OK
+    assert other.status_code == HTTPStatus.BAD_REQUEST
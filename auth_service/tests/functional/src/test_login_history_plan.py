@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import asyncpg
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from ..settings import test_settings
+
+# исходники сервиса: в образе тестов - AUTH_SRC, локально - каталог src сервиса
+sys.path.insert(0, os.environ.get("AUTH_SRC", os.path.join(os.path.dirname(__file__), "..", "..", "..", "src")))
+
+from services.base_service import login_history_stmt  # noqa: E402
+
+
+INDEX_SUFFIXES = ("user_id_date_auth", "user_id_date_auth_idx")
+
+
+def login_history_query(user_id: uuid.UUID, date_from: datetime, date_to: datetime) -> str:
+    """SQL, который BaseService.get_login_history выполняет для второй и далее страниц."""
+    stmt = login_history_stmt(user_id, 11, (date_to, uuid.uuid4()), date_from, date_to)
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def scan_nodes(plan: dict):
+    if "Relation Name" in plan:
+        yield plan
+    for child in plan.get("Plans", []):
+        yield from scan_nodes(child)
+
+
+@pytest.mark.asyncio
+async def test_login_history_uses_index_and_prunes_partitions():
+    connection = await asyncpg.connect(test_settings.DB_DSN)
+    try:
+        # на маленькой тестовой таблице seq scan дешевле, проверяем, что индекс пригоден
+        await connection.execute("SET enable_seqscan = off")
+        partitions = await connection.fetchval(
+            """SELECT count(*) FROM pg_inherits
+               JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+               WHERE parent.relname = 'authentication'"""
+        )
+        now = datetime.now()
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        query = login_history_query(uuid.uuid4(), month_start, now)
+        plan = json.loads(await connection.fetchval("EXPLAIN (FORMAT JSON) " + query))[0]["Plan"]
+    finally:
+        await connection.close()
+
+    nodes = list(scan_nodes(plan))
+    assert nodes
+    for node in nodes:
+        assert node["Node Type"] in ("Index Scan", "Index Only Scan"), node["Node Type"]
+        assert node["Index Name"].endswith(INDEX_SUFFIXES), node["Index Name"]
+    # диапазон внутри одного месяца - читается одна партиция
+    if partitions > 1:
+        assert len(nodes) == 1
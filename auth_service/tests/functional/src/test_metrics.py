@@ -0,0 +1,41 @@
+import uuid
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+
+
+async def login(client: AsyncClient, email: str, password: str):
+    return await client.post(
+        "/api/v1/users/login",
+        params={"email": email, "password": password},
+        headers={"X-Request-Id": str(uuid.uuid4())},
+    )
+
+
+@pytest.mark.asyncio
+async def test_metrics_only_for_superuser():
+    """Метрики (стоимость хеширования, пулы, реплики) отдаются только суперпользователю."""
+    email, password = f"metrics-{uuid.uuid4()}", "test"
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        headers = {"X-Request-Id": str(uuid.uuid4())}
+        await client.post(
+            "/api/v1/users/user_registration", params={"email": email, "password": password}, headers=headers
+        )
+        user = await login(client, email, password)
+        superuser = await login(client, "superuser", "superuser")
+
+        anonymous = await client.get("/api/v1/metrics", headers=headers)
+        forbidden = await client.get("/api/v1/metrics", headers=headers, cookies=user.cookies)
+        allowed = await client.get("/api/v1/metrics", headers=headers, cookies=superuser.cookies)
+
+    # check_jwt без cookie с токенами
+    assert anonymous.status_code == HTTPStatus.NOT_FOUND
+    assert forbidden.status_code == HTTPStatus.FORBIDDEN
+    assert allowed.status_code == HTTPStatus.OK
+    assert "password_hasher" in allowed.json()
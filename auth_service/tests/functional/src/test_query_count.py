@@ -0,0 +1,120 @@
+import uuid
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+
+
+def headers():
+    return {"X-Request-Id": str(uuid.uuid4())}
+
+
+@pytest.mark.asyncio
+async def test_write_paths_query_count(assert_db_queries):
+    """Операции записи - одна команда INSERT/UPDATE ... RETURNING без refresh().
+
+    Кроме явных значений проверяются бюджеты, объявленные у эндпоинтов (query_budget).
+    """
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        response = await client.post(
+            "/api/v1/users/login",
+            params={"email": test_settings.SU_email, "password": test_settings.SU_password},
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        superuser = dict(response.cookies)
+
+        email = str(uuid.uuid4())
+        response = await client.post(
+            "/api/v1/users/user_registration",
+            params={"email": email, "password": "test"},
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+        user_id = response.json()["uuid"]
+
+        response = await client.post(
+            "/api/v1/users/login", params={"email": email, "password": "test"}, headers=headers()
+        )
+        assert response.status_code == HTTPStatus.OK
+        # SELECT пользователя; UPDATE, если хеш пароля пересчитывается
+        assert_db_queries(response, 2)
+        user = dict(response.cookies)
+
+        response = await client.put(
+            "/api/v1/users/change_user_info",
+            params={"first_name": "ivan"},
+            cookies=user,
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+
+        response = await client.post(
+            "/api/v1/users/login_history",
+            params={"page_size": 10},
+            cookies=user,
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        # только SELECT страницы
+        assert_db_queries(response, 1)
+
+        response = await client.post(
+            "/api/v1/roles/create",
+            params={"type": str(uuid.uuid4())},
+            cookies=superuser,
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+        role_id = response.json()["uuid"]
+
+        response = await client.post(
+            f"/api/v1/roles/set/{user_id}/{role_id}", cookies=superuser, headers=headers()
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+
+        response = await client.post(
+            "/api/v1/permissions/create_permission",
+            params={"name": str(uuid.uuid4())},
+            cookies=superuser,
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+        permission = {"role_id": role_id, "permissions_id": response.json()["uuid"]}
+
+        response = await client.post(
+            "/api/v1/permissions/assign_permission_to_role",
+            params=permission,
+            cookies=superuser,
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+
+        response = await client.post(
+            "/api/v1/permissions/remove_permission_from_role",
+            params=permission,
+            cookies=superuser,
+            headers=headers(),
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+
+        response = await client.post(
+            f"/api/v1/roles/delete/{user_id}", cookies=superuser, headers=headers()
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert_db_queries(response, 1)
+
+        response = await client.delete(f"/api/v1/roles/{role_id}", cookies=superuser, headers=headers())
+        assert response.status_code == HTTPStatus.OK
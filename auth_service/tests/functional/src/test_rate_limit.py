@@ -0,0 +1,26 @@
+import uuid
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_headers():
+    """Каждый ответ несет остаток лимита; запрос расходует одну единицу."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        # отдельный клиент, чтобы не зависеть от запросов других тестов
+        headers = {"X-Request-Id": str(uuid.uuid4()), "X-Forwarded-For": f"10.0.0.{uuid.uuid4().int % 250}"}
+        first = await client.post("/api/v1/users/user_registration", headers=headers)
+        second = await client.post("/api/v1/users/user_registration", headers=headers)
+
+    for response in (first, second):
+        assert response.status_code != HTTPStatus.TOO_MANY_REQUESTS
+        assert int(response.headers["X-RateLimit-Remaining"]) <= int(response.headers["X-RateLimit-Limit"])
+        assert "X-RateLimit-Reset" in response.headers
+    assert int(second.headers["X-RateLimit-Remaining"]) == int(first.headers["X-RateLimit-Remaining"]) - 1
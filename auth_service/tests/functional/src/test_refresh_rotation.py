@@ -0,0 +1,119 @@
+import asyncio
+import base64
+import time
+import uuid
+from http import HTTPStatus
+
+import jwt
+import pytest
+from httpx import AsyncClient
+from redis.asyncio import Redis
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+# больше REFRESH_REUSE_GRACE из template.env
+REUSE_DELAY = 1.5
+
+
+async def login(client: AsyncClient) -> dict:
+    response = await client.post(
+        "/api/v1/users/login",
+        params={"email": "superuser", "password": "superuser"},
+        headers={"X-Request-Id": str(uuid.uuid4())},
+    )
+    assert response.status_code == HTTPStatus.OK
+    return {
+        "access_token": response.cookies.get("access_token"),
+        "refresh_token": response.cookies.get("refresh_token"),
+    }
+
+
+async def refresh(client: AsyncClient, cookies: dict):
+    return await client.post(
+        "/api/v1/users/refresh_token", headers={"X-Request-Id": str(uuid.uuid4())}, cookies=cookies
+    )
+
+
+@pytest.mark.asyncio
+async def test_parallel_refresh_single_winner():
+    """Из параллельных обменов одного refresh токена успешен ровно один."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        cookies = await login(client)
+        responses = await asyncio.gather(*(refresh(client, cookies) for _ in range(10)))
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [HTTPStatus.OK] + [HTTPStatus.FORBIDDEN] * 9
+
+
+@pytest.mark.asyncio
+async def test_refresh_reuse_revokes_session():
+    """Повторное предъявление обменянного refresh токена завершает сессию."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        stolen = await login(client)
+        rotated = await refresh(client, stolen)
+        assert rotated.status_code == HTTPStatus.OK
+        owner = {
+            "access_token": rotated.cookies.get("access_token"),
+            "refresh_token": rotated.cookies.get("refresh_token"),
+        }
+        await asyncio.sleep(REUSE_DELAY)
+
+        reused = await refresh(client, stolen)
+        owner_refresh = await refresh(client, owner)
+        owner_sessions = await client.get(
+            "/api/v1/sessions", headers={"X-Request-Id": str(uuid.uuid4())}, cookies=owner
+        )
+
+    assert reused.status_code == HTTPStatus.FORBIDDEN
+    assert owner_refresh.status_code == HTTPStatus.FORBIDDEN
+    assert owner_sessions.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_refresh_without_access_token():
+    """Для обмена достаточно refresh токена: access токен мог истечь и быть удален."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        cookies = await login(client)
+        response = await refresh(client, {"refresh_token": cookies["refresh_token"]})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.cookies.get("access_token") is not None
+    assert response.cookies.get("refresh_token") is not None
+
+
+@pytest.mark.asyncio
+async def test_refresh_legacy_tokens_with_float_exp():
+    """Токены прежнего формата (exp из datetime.timestamp()) обмениваются на новые."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        claims = jwt.decode((await login(client))["access_token"], options={"verify_signature": False})
+        user_id = str(uuid.UUID(bytes=base64.urlsafe_b64decode(claims["sub"] + "==")))
+        now = time.time()
+        legacy = {}
+        for token_type, ttl in (("access", 60), ("refresh", 3600)):
+            legacy[token_type] = {
+                "type": token_type,
+                "sub": user_id,
+                "role_id": None,
+                "self_uuid": str(uuid.uuid4()),
+                "is_admin": False,
+                "is_superuser": True,
+                "exp": now + ttl + 0.5,
+                "iat": now,
+            }
+        # refresh токен прежнего формата выдавался вместе с записью в белом списке
+        redis = Redis(host=test_settings.REDIS_HOST, port=test_settings.REDIS_PORT)
+        await redis.set(f"white_list:{legacy['refresh']['self_uuid']}", b"1", ex=3600)
+        cookies = {
+            f"{token_type}_token": jwt.encode(payload, test_settings.JWT_SECRET_KEY, "HS256")
+            for token_type, payload in legacy.items()
+        }
+        response = await refresh(client, cookies)
+        # предъявленный access токен отозван обменом, срок записи - целые секунды до exp
+        revoked_ttl = await redis.ttl(f"black_list:{legacy['access']['self_uuid']}")
+        await redis.close()
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.cookies.get("refresh_token") is not None
+    assert 0 < revoked_ttl <= 61
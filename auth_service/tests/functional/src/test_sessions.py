@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+
+
+async def login(client: AsyncClient, user_agent: str) -> dict:
+    response = await client.post(
+        "/api/v1/users/login",
+        params={"email": "superuser", "password": "superuser"},
+        headers={"X-Request-Id": str(uuid.uuid4()), "User-Agent": user_agent},
+    )
+    assert response.status_code == HTTPStatus.OK
+    return {
+        "access_token": response.cookies.get("access_token"),
+        "refresh_token": response.cookies.get("refresh_token"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_sessions_list_and_logout_everywhere():
+    """Сессии видны по устройствам; выход со всех, кроме текущего, отзывает токены остальных."""
+    phone, laptop = f"phone-{uuid.uuid4()}", f"laptop-{uuid.uuid4()}"
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        phone_cookies = await login(client, phone)
+        laptop_cookies = await login(client, laptop)
+        headers = {"X-Request-Id": str(uuid.uuid4())}
+
+        listed = await client.get("/api/v1/sessions", headers=headers, cookies=laptop_cookies)
+        ended = await client.post(
+            "/api/v1/sessions/logout_all", params={"keep_current": True}, headers=headers, cookies=laptop_cookies
+        )
+        phone_after = await client.get("/api/v1/sessions", headers=headers, cookies=phone_cookies)
+        laptop_after = await client.get("/api/v1/sessions", headers=headers, cookies=laptop_cookies)
+        missing = await client.delete(f"/api/v1/sessions/{uuid.uuid4()}", headers=headers, cookies=laptop_cookies)
+
+    assert listed.status_code == HTTPStatus.OK
+    sessions = {session["user_agent"]: session for session in listed.json()}
+    assert sessions[laptop]["current"] and not sessions[phone]["current"]
+
+    assert ended.status_code == HTTPStatus.OK
+    assert ended.json() >= 1
+    assert phone_after.status_code == HTTPStatus.UNAUTHORIZED
+    assert laptop_after.status_code == HTTPStatus.OK
+    assert [session["user_agent"] for session in laptop_after.json()] == [laptop]
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_refresh_does_not_undo_logout_everywhere():
+    """Обмен токена, параллельный выходу со всех устройств, не восстанавливает сессию."""
+    laptop = f"laptop-{uuid.uuid4()}"
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        for _ in range(5):
+            phone_cookies = await login(client, f"phone-{uuid.uuid4()}")
+            laptop_cookies = await login(client, laptop)
+            ended, refreshed = await asyncio.gather(
+                client.post(
+                    "/api/v1/sessions/logout_all",
+                    params={"keep_current": True},
+                    headers={"X-Request-Id": str(uuid.uuid4())},
+                    cookies=laptop_cookies,
+                ),
+                client.post(
+                    "/api/v1/users/refresh_token",
+                    headers={"X-Request-Id": str(uuid.uuid4())},
+                    cookies=phone_cookies,
+                ),
+            )
+            assert ended.status_code == HTTPStatus.OK
+            if refreshed.status_code == HTTPStatus.OK:
+                # обмен успел раньше выхода: новая пара токенов тоже отозвана
+                phone_cookies = {
+                    "access_token": refreshed.cookies.get("access_token"),
+                    "refresh_token": refreshed.cookies.get("refresh_token"),
+                }
+            else:
+                assert refreshed.status_code == HTTPStatus.FORBIDDEN
+
+            headers = {"X-Request-Id": str(uuid.uuid4())}
+            phone_sessions = await client.get("/api/v1/sessions", headers=headers, cookies=phone_cookies)
+            phone_refresh = await client.post(
+                "/api/v1/users/refresh_token", headers=headers, cookies=phone_cookies
+            )
+            laptop_sessions = await client.get("/api/v1/sessions", headers=headers, cookies=laptop_cookies)
+
+            assert phone_sessions.status_code == HTTPStatus.UNAUTHORIZED
+            assert phone_refresh.status_code == HTTPStatus.FORBIDDEN
+            assert [session["user_agent"] for session in laptop_sessions.json()] == [laptop]
@@ -0,0 +1,83 @@
+import base64
+import time
+import uuid
+from http import HTTPStatus
+
+import jwt
+import pytest
+from httpx import AsyncClient
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+
+
+async def login(client: AsyncClient) -> str:
+    response = await client.post(
+        "/api/v1/users/login",
+        params={"email": "superuser", "password": "superuser"},
+        headers={"X-Request-Id": str(uuid.uuid4())},
+    )
+    assert response.status_code == HTTPStatus.OK
+    return response.cookies.get("access_token")
+
+
+def expand_uuid(value: str) -> str:
+    return str(uuid.UUID(bytes=base64.urlsafe_b64decode(value + "==")))
+
+
+@pytest.mark.asyncio
+async def test_compact_claims():
+    """Новый токен: версия 2, короткие имена, целые метки времени, UUID в base64url."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        token = await login(client)
+        me = await client.get(
+            "/api/v1/users/me",
+            headers={"Authorization": f"Bearer {token}", "X-Request-Id": str(uuid.uuid4())},
+        )
+
+    claims = jwt.decode(token, options={"verify_signature": False})
+    assert claims["v"] == 2
+    assert claims["t"] == "a"
+    assert isinstance(claims["exp"], int) and isinstance(claims["iat"], int)
+    assert len(claims["sub"]) == 22 and len(claims["jti"]) == 22
+    assert claims["f"] & 2  # суперпользователь
+    assert not {"type", "self_uuid", "role_id", "is_admin", "is_superuser"} & claims.keys()
+    assert me.status_code == HTTPStatus.ACCEPTED
+    assert me.json()["uuid"] == expand_uuid(claims["sub"])
+
+
+@pytest.mark.asyncio
+async def test_legacy_claims_accepted():
+    """Токен прежнего формата (выдан до обновления) по-прежнему принимается."""
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        claims = jwt.decode(await login(client), options={"verify_signature": False})
+        now = int(time.time())
+        legacy = jwt.encode(
+            {
+                "type": "access",
+                "sub": expand_uuid(claims["sub"]),
+                "role_id": None,
+                "self_uuid": str(uuid.uuid4()),
+                "is_admin": False,
+                "is_superuser": True,
+                "exp": now + 60,
+                "iat": now,
+            },
+            test_settings.JWT_SECRET_KEY,
+            "HS256",
+        )
+        headers = {"X-Request-Id": str(uuid.uuid4())}
+        me = await client.get("/api/v1/users/me", headers={**headers, "Authorization": f"Bearer {legacy}"})
+        permission = await client.post(
+            "/api/v1/users/check_permission",
+            params={"name": f"missing-{uuid.uuid4()}"},
+            headers=headers,
+            cookies={"access_token": legacy, "refresh_token": legacy},
+        )
+
+    assert me.status_code == HTTPStatus.ACCEPTED
+    assert me.json()["uuid"] == expand_uuid(claims["sub"])
+    assert permission.status_code == HTTPStatus.OK
+    assert permission.json() is False
@@ -153,9 +153,9 @@ async def test_refresh_token(make_post_request):
     assert access_token is not None
     assert refresh_token is not None
     assert response.status == HTTPStatus.OK
-    # проверяем со старыми токенами
+    # проверяем со старыми токенами: refresh токен уже обменян
     response = await make_post_request(url, cookie=cookies)
-    assert response.status == HTTPStatus.UNAUTHORIZED
+    assert response.status == HTTPStatus.FORBIDDEN
 
 
 @pytest.mark.order(5)
@@ -176,6 +176,11 @@ async def test_login_history(make_post_request):
 
     assert response.status == HTTPStatus.OK
     assert len(body) == 1
+    # записей меньше размера страницы - следующей страницы нет
+    assert response.headers.get("X-Next-Cursor") is None
+    # невалидный курсор
+    response = await make_post_request(url, {"page_size": 1, "cursor": "broken"}, cookie=cookies)
+    assert response.status == HTTPStatus.BAD_REQUEST
 
 
 @pytest.mark.order(6)
@@ -0,0 +1,71 @@
+import uuid
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+from redis.asyncio import Redis
+
+from ..settings import test_settings
+
+
+SERVICE_URL = test_settings.SERVISE_URL
+# ключ и канал кэша статуса пользователей content_service (utils/user_status_cache.py)
+USER_STATUS_KEY_PREFIX = "user_status:"
+USER_STATUS_CHANNEL = "user_status:invalidate"
+
+
+async def login(client: AsyncClient, email: str, password: str):
+    return await client.post(
+        "/api/v1/users/login",
+        params={"email": email, "password": password},
+        headers={"X-Request-Id": str(uuid.uuid4())},
+    )
+
+
+@pytest.mark.asyncio
+async def test_deactivation_invalidates_content_service_cache():
+    """Деактивация сбрасывает L2 кэш статуса и оповещает воркеры content_service."""
+    email, password = f"deactivate-{uuid.uuid4()}", "test"
+    redis = Redis(host=test_settings.REDIS_HOST, port=test_settings.REDIS_PORT)
+    pubsub = redis.pubsub()
+    async with AsyncClient(base_url=SERVICE_URL) as client:
+        headers = {"X-Request-Id": str(uuid.uuid4())}
+        registered = await client.post(
+            "/api/v1/users/user_registration", params={"email": email, "password": password}, headers=headers
+        )
+        user_id = registered.json()["uuid"]
+        user = await login(client, email, password)
+        superuser = await login(client, "superuser", "superuser")
+
+        # запись, которую content_service кэширует после ответа /users/me
+        await redis.set(USER_STATUS_KEY_PREFIX + user_id, b"1", ex=60)
+        await pubsub.subscribe(USER_STATUS_CHANNEL)
+        await pubsub.get_message(timeout=1)  # подтверждение подписки
+
+        forbidden = await client.put(f"/api/v1/users/{user_id}/active", params={"active": False},
+                                     headers=headers, cookies=user.cookies)
+        deactivated = await client.put(f"/api/v1/users/{user_id}/active", params={"active": False},
+                                       headers=headers, cookies=superuser.cookies)
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=5)
+        cached = await redis.get(USER_STATUS_KEY_PREFIX + user_id)
+
+        me = await client.get(
+            "/api/v1/users/me",
+            headers={**headers, "Authorization": f"Bearer {user.cookies.get('access_token')}"},
+        )
+        relogin = await login(client, email, password)
+        refreshed = await client.post("/api/v1/users/refresh_token", headers=headers, cookies=user.cookies)
+        missing = await client.put(f"/api/v1/users/{uuid.uuid4()}/active", params={"active": False},
+                                   headers=headers, cookies=superuser.cookies)
+    await pubsub.close()
+    await redis.close()
+
+    assert forbidden.status_code == HTTPStatus.FORBIDDEN
+    assert deactivated.status_code == HTTPStatus.OK
+    assert message is not None and message["data"].decode() == user_id
+    assert cached is None
+    # content_service кэширует этот ответ как отрицательный
+    assert me.status_code == HTTPStatus.BAD_REQUEST
+    assert relogin.status_code == HTTPStatus.FORBIDDEN
+    assert refreshed.status_code == HTTPStatus.FORBIDDEN
+    assert missing.status_code == HTTPStatus.NOT_FOUND
@@ -1,4 +1,6 @@
 import os
+from datetime import datetime
+from typing import Optional
 from logging import config as logging_config
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings
@@ -44,6 +46,32 @@ class Settings(BaseSettings):
     auth_jwt: AuthJWT = AuthJWT()
     pwd_context: CryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
     oauth2_scheme: OAuth2PasswordBearer = OAuth2PasswordBearer(tokenUrl="token")
+    # Размер локального кэша проверенных токенов (0 - кэш отключен)
+    jwt_cache_size: int = 10000
+
+    # Настройки обращения к сервису авторизации
+    auth_user_info_url: str = 'http://127.0.0.1:8080/api/v1/users/me'
+    auth_http_limit: int = 100
+    auth_http_limit_per_host: int = 0
+    auth_http_timeout: float = 5.0
+    auth_http_keepalive_timeout: float = 30.0
+
+    # Открытые ключи подписи токенов (JWKS) сервиса авторизации
+    auth_jwks_url: str = 'http://127.0.0.1:8080/auth/.well-known/jwks.json'
+    auth_jwks_refresh_interval: int = 300
+    auth_jwks_min_refetch_interval: float = 10.0
+    # принимать токены без kid, подписанные общим секретом, - только на время
+    # перехода auth_service на RS256/EdDSA и не позже auth_hs256_accept_until
+    auth_accept_hs256: bool = False
+    auth_hs256_accept_until: Optional[datetime] = None
+    # Файл с JWKS для проверки токенов до первого ответа auth_service
+    auth_jwks_file: Optional[str] = None
+
+    # Кэш результатов проверки пользователя (/users/me), секунды
+    user_status_ttl: int = 60
+    user_status_negative_ttl: int = 10
+    user_status_local_ttl: int = 5
+    user_status_local_size: int = 10000
 
     class Config:
         env_file = ".env"
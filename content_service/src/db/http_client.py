@@ -0,0 +1,28 @@
+from typing import Union
+
+import aiohttp
+
+
+def create_session(
+    limit: int = 100,
+    limit_per_host: int = 0,
+    timeout: float = 5.0,
+    keepalive_timeout: float = 30.0,
+) -> aiohttp.ClientSession:
+    """Сессия с keep-alive пулом соединений на все время жизни приложения."""
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
+
+
+session: Union[aiohttp.ClientSession, None] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    return session
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 import multiprocessing
 
 import gunicorn.app.base
@@ -11,7 +13,12 @@ from contextlib import asynccontextmanager
 from core.config import settings
 from db import elastic
 from db import redis
+from db import http_client
 from api.v1 import films, genres, persons
+from utils import jwks, user_status_cache
+
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -19,9 +26,39 @@ async def lifespan(app: FastAPI):
     redis.redis = Redis(host=settings.redis_host, port=settings.redis_port)
     elastic.es = AsyncElasticsearch(
         hosts=[f'http://{settings.elastic_host}:{settings.elastic_port}'])
+    http_client.session = http_client.create_session(
+        limit=settings.auth_http_limit,
+        limit_per_host=settings.auth_http_limit_per_host,
+        timeout=settings.auth_http_timeout,
+        keepalive_timeout=settings.auth_http_keepalive_timeout,
+    )
+    user_status_cache.cache = user_status_cache.UserStatusCache(
+        redis.redis,
+        ttl=settings.user_status_ttl,
+        negative_ttl=settings.user_status_negative_ttl,
+        local_ttl=settings.user_status_local_ttl,
+        local_size=settings.user_status_local_size,
+    )
+    invalidation_listener = asyncio.create_task(user_status_cache.cache.listen())
+    jwks.jwks = jwks.JWKSCache(
+        settings.auth_jwks_url,
+        refresh_interval=settings.auth_jwks_refresh_interval,
+        min_refetch_interval=settings.auth_jwks_min_refetch_interval,
+    )
+    if settings.auth_jwks_file:
+        jwks.jwks.preload_file(settings.auth_jwks_file)
+    try:
+        await jwks.jwks.fetch()
+    except Exception as e:
+        # сервис стартует и без auth_service: ключи подгрузятся при первом токене
+        logger.warning(f"Не удалось загрузить JWKS: {e}")
+    jwks_refresher = asyncio.create_task(jwks.jwks.run())
     yield
+    jwks_refresher.cancel()
+    invalidation_listener.cancel()
     await redis.redis.close()
     await elastic.es.close()
+    await http_client.session.close()
 
 
 app = FastAPI(
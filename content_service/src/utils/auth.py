@@ -1,20 +1,79 @@
+import binascii
+import time
+import uuid
+
 import jwt
-import aiohttp
 
 from fastapi import status, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from typing import Optional
 
 from core.config import settings
+from db import http_client
+from utils import jwks, user_status_cache
+from utils.token_cache import TokenCache
+
+
+token_cache = TokenCache(max_size=settings.jwt_cache_size)
+
+# Компактный формат claims (v=2) должен совпадать с auth_service (services/utils.py)
+CLAIMS_VERSION = 2
+TOKEN_TYPE_NAMES = {"a": "access", "r": "refresh"}
+FLAG_ADMIN = 1
+FLAG_SUPERUSER = 2
+
+
+def expand_uuid(value: str) -> str:
+    # без создания uuid.UUID: разбор на каждом запросе
+    digits = binascii.a2b_base64(value.replace("-", "+").replace("_", "/") + "==").hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def normalize_claims(payload: dict) -> dict:
+    """Claims любой версии в прежнем виде; permissions - маска разрешений или None,
+    session_id - None у токенов, выданных до появления сессий."""
+    if payload.get("v") != CLAIMS_VERSION:
+        payload.setdefault("permissions", None)
+        payload.setdefault("session_id", None)
+        return payload
+    flags = payload.get("f", 0)
+    return {
+        "type": TOKEN_TYPE_NAMES.get(payload.get("t")),
+        "sub": expand_uuid(payload["sub"]),
+        "role_id": expand_uuid(payload["rid"]) if "rid" in payload else None,
+        # идентификатор токена нужен только как ключ (списки отзыва) - без разбора
+        "self_uuid": payload["jti"],
+        "is_admin": bool(flags & FLAG_ADMIN),
+        "is_superuser": bool(flags & FLAG_SUPERUSER),
+        "permissions": payload.get("p"),
+        "session_id": payload.get("sid"),
+        "exp": payload["exp"],
+        "iat": payload["iat"],
+    }
+
+
+def hs256_accepted() -> bool:
+    until = settings.auth_hs256_accept_until
+    return settings.auth_accept_hs256 and (until is None or time.time() < until.timestamp())
 
 
-def decode_jwt(
-    jwt_token: str,
-    private_key: str = settings.auth_jwt.secret_key,
-    algorithm: str = settings.auth_jwt.algorithm,
-):
+async def verification_key(jwt_token: str) -> tuple:
+    """Открытый ключ из JWKS по kid; токены без kid подписаны общим секретом (HS256)."""
+    kid = jwt.get_unverified_header(jwt_token).get("kid")
+    if kid is None:
+        if not hs256_accepted():
+            raise jwt.exceptions.InvalidAlgorithmError("HS256 tokens are not accepted")
+        return settings.auth_jwt.secret_key, [settings.auth_jwt.algorithm]
+    key = await jwks.jwks.get(kid) if jwks.jwks is not None else None
+    if key is None:
+        raise jwt.exceptions.InvalidSignatureError(f"Unknown key {kid}")
+    return key.key, [key.algorithm_name]
+
+
+async def decode_jwt(jwt_token: str):
     try:
-        decoded = jwt.decode(jwt_token, private_key, algorithms=[algorithm])
+        key, algorithms = await verification_key(jwt_token)
+        decoded = normalize_claims(jwt.decode(jwt_token, key, algorithms=algorithms))
     except jwt.exceptions.DecodeError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -33,6 +92,11 @@ def decode_jwt(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired, refresh token",
         )
+    except (jwt.exceptions.InvalidTokenError, KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+        )
     return decoded
 
 
@@ -48,18 +112,13 @@ class JWTBearer(HTTPBearer):
         if not credentials.scheme == 'Bearer':
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail='Only Bearer token might be accepted')
-        decoded_token = self.parse_token(credentials.credentials)
+        decoded_token = await self.parse_token(credentials.credentials)
         if not decoded_token:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Invalid or expired token.')
 
         if self.check_user:
-            # проверить usera в бд
-            response = await self.check(
-                'http://127.0.0.1:8080/api/v1/users/me',
-                params={},
-                headers={'Authorization': f'Bearer {credentials.credentials}'}
-            )
-            if response.status != status.HTTP_202_ACCEPTED:
+            is_active = await self.user_is_active(request, credentials.credentials, decoded_token)
+            if not is_active:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="User doesn't exist"
@@ -67,15 +126,46 @@ class JWTBearer(HTTPBearer):
 
         return decoded_token
 
+    async def user_is_active(self, request: Request, token: str, decoded_token: dict) -> bool:
+        user_id = decoded_token.get('sub')
+        cache = user_status_cache.cache
+        if cache is not None and user_id:
+            is_active = await cache.get(user_id)
+            if is_active is not None:
+                return is_active
+
+        # проверить usera в бд
+        response_status = await self.check(
+            settings.auth_user_info_url,
+            params={},
+            headers={
+                'Authorization': f'Bearer {token}',
+                'X-Request-Id': request.headers.get('X-Request-Id') or str(uuid.uuid4()),
+            }
+        )
+        is_active = response_status == status.HTTP_202_ACCEPTED
+        # по user_id кэшируется только ответ о пользователе: 202 и 400 "Inactive user".
+        # 401 относится к самому токену (истек, отозван) и не должен блокировать
+        # другие токены пользователя; ошибки сервиса авторизации (5xx, 429) не кэшируем
+        if cache is not None and user_id and (is_active or response_status == status.HTTP_400_BAD_REQUEST):
+            await cache.set(user_id, is_active)
+        return is_active
+
     @staticmethod
-    def parse_token(jwt_token: str) -> Optional[dict]:
-        return decode_jwt(jwt_token=jwt_token)
+    async def parse_token(jwt_token: str) -> Optional[dict]:
+        # подпись проверяется только при первом появлении токена,
+        # далее claims берутся из кэша до наступления exp
+        decoded = token_cache.get(jwt_token)
+        if decoded is None:
+            decoded = await decode_jwt(jwt_token=jwt_token)
+            token_cache.set(jwt_token, decoded)
+        return decoded
 
     @staticmethod
-    async def check(query: str, params: dict = {}, headers: dict = {}, json: dict = {}):
-        async with aiohttp.ClientSession(headers=headers) as client:
-            response = await client.get(query, json=json, params=params)
-        return response
+    async def check(query: str, params: dict = {}, headers: dict = {}, json: dict = {}) -> int:
+        # соединение возвращается в пул после выхода из контекста
+        async with http_client.session.get(query, json=json, params=params, headers=headers) as response:
+            return response.status
 
 
 security_jwt = JWTBearer()
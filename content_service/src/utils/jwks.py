@@ -0,0 +1,93 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from typing import Optional
+
+import jwt
+
+from db import http_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """Открытые ключи сервиса авторизации (JWKS) для локальной проверки подписи.
+
+    Ключи обновляются фоном раз в refresh_interval секунд. Токен с незнакомым kid
+    (ключ ротировали раньше очередного обновления) вызывает внеочередную загрузку,
+    но не чаще раза в min_refetch_interval секунд, чтобы поддельные kid
+    не превращали каждый запрос в обращение к auth_service.
+    """
+
+    def __init__(self, url: str, refresh_interval: int = 300, min_refetch_interval: float = 10.0):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.keys: dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self.fetches = 0
+        self.errors = 0
+        self.unknown_kid = 0
+
+    def load(self, jwks: dict) -> None:
+        keys = {}
+        for data in jwks.get("keys", []):
+            try:
+                keys[data["kid"]] = jwt.PyJWK(data)
+            except (KeyError, jwt.exceptions.PyJWKError) as e:
+                logger.warning(f"Пропущен ключ JWKS {data.get('kid')}: {e}")
+        self.keys = keys
+
+    def preload_file(self, path: str) -> None:
+        """Ключи из файла - проверка токенов до первого ответа auth_service."""
+        with open(path) as file:
+            self.load(json.load(file))
+
+    async def fetch(self) -> None:
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+        try:
+            async with http_client.session.get(self.url, headers={"X-Request-Id": str(uuid.uuid4())}) as response:
+                response.raise_for_status()
+                self.load(await response.json())
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.fetch()
+            except Exception as e:
+                logger.warning(f"Не удалось обновить JWKS: {e}")
+
+    async def get(self, kid: str) -> Optional[jwt.PyJWK]:
+        key = self.keys.get(kid)
+        if key is not None:
+            return key
+        self.unknown_kid += 1
+        async with self._lock:
+            # ключ мог загрузить запрос, ожидавший блокировку раньше
+            if kid not in self.keys and time.monotonic() - self._fetched_at >= self.min_refetch_interval:
+                try:
+                    await self.fetch()
+                except Exception as e:
+                    logger.warning(f"Не удалось загрузить JWKS: {e}")
+        return self.keys.get(kid)
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self.keys),
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "unknown_kid": self.unknown_kid,
+        }
+
+
+jwks: Optional[JWKSCache] = None
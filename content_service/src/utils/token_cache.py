@@ -0,0 +1,65 @@
+import hashlib
+import time
+
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenCache:
+    """Ограниченный LRU-кэш расшифрованных JWT с временем жизни до exp.
+
+    Ключом служит sha256 от токена, поэтому в памяти не хранятся сами токены.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expire_at, claims = entry
+        if time.time() >= expire_at:
+            # токен истек: удаляем и заставляем вызывающего заново проверить подпись
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        if self.max_size <= 0:
+            return
+        expire_at = claims.get("exp")
+        if expire_at is None:
+            return
+        key = self._key(token)
+        self._data[key] = (float(expire_at), claims)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
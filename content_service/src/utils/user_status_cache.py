@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+
+from collections import OrderedDict
+from typing import Optional, Union
+
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as conn_err_redis
+
+
+# Формат ключей и канал должны совпадать с auth_service (core/constains.py)
+USER_STATUS_KEY_PREFIX = "user_status:"
+USER_STATUS_CHANNEL = "user_status:invalidate"
+
+logger = logging.getLogger(__name__)
+
+
+class UserStatusCache:
+    """Двухуровневый кэш результата проверки /users/me.
+
+    L1 - словарь в памяти воркера, L2 - Redis, общий для всех воркеров.
+    Хранится только признак "пользователь существует и активен".
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        ttl: int = 60,
+        negative_ttl: int = 10,
+        local_ttl: int = 5,
+        local_size: int = 10000,
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self._local: OrderedDict[str, tuple[float, bool]] = OrderedDict()
+
+    def _get_local(self, user_id: str) -> Optional[bool]:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        expire_at, is_active = entry
+        if time.monotonic() >= expire_at:
+            del self._local[user_id]
+            return None
+        return is_active
+
+    def _set_local(self, user_id: str, is_active: bool) -> None:
+        ttl = self.local_ttl if is_active else min(self.local_ttl, self.negative_ttl)
+        self._local[user_id] = (time.monotonic() + ttl, is_active)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def get(self, user_id: str) -> Optional[bool]:
+        is_active = self._get_local(user_id)
+        if is_active is not None:
+            return is_active
+        try:
+            data = await self.redis.get(USER_STATUS_KEY_PREFIX + user_id)
+        except conn_err_redis:
+            return None
+        if data is None:
+            return None
+        is_active = data == b"1"
+        self._set_local(user_id, is_active)
+        return is_active
+
+    async def set(self, user_id: str, is_active: bool) -> None:
+        self._set_local(user_id, is_active)
+        try:
+            await self.redis.set(
+                USER_STATUS_KEY_PREFIX + user_id,
+                b"1" if is_active else b"0",
+                ex=self.ttl if is_active else self.negative_ttl,
+            )
+        except conn_err_redis:
+            pass
+
+    def invalidate_local(self, user_id: Union[str, bytes]) -> None:
+        if isinstance(user_id, bytes):
+            user_id = user_id.decode()
+        self._local.pop(user_id, None)
+
+    async def listen(self) -> None:
+        """Слушает канал инвалидации, который публикует auth_service."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(USER_STATUS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.invalidate_local(message["data"])
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except conn_err_redis:
+                logger.warning("Потеряно соединение с каналом инвалидации, переподключение")
+                # пока канал недоступен, события могли потеряться - сбрасываем L1
+                self._local.clear()
+                await pubsub.close()
+                await asyncio.sleep(1)
+
+
+cache: Union[UserStatusCache, None] = None
@@ -0,0 +1,86 @@
+"""Нагрузочный тест проверки пользователя через локальную заглушку auth-сервиса.
+
+Сравнивает новую сессию на каждый запрос (прежнее поведение JWTBearer.check)
+с общей сессией из db.http_client и считает открытые TCP-соединения.
+
+Запуск из каталога content_service:
+    python tests/benchmarks/bench_auth_client.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from db.http_client import create_session  # noqa: E402
+
+HOST, PORT = "127.0.0.1", 18080
+URL = f"http://{HOST}:{PORT}/api/v1/users/me"
+
+
+class StubAuth:
+    def __init__(self):
+        self.connections = set()
+
+    async def users_me(self, request):
+        self.connections.add(request.transport.get_extra_info("peername"))
+        return web.json_response({"uuid": "stub"}, status=202)
+
+
+async def per_request_session():
+    async with aiohttp.ClientSession() as client:
+        async with client.get(URL) as response:
+            return response.status
+
+
+def pooled(session):
+    async def inner():
+        async with session.get(URL) as response:
+            return response.status
+    return inner
+
+
+async def load(call, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            assert await call() == 202
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - started
+
+
+async def main(requests, concurrency):
+    stub = StubAuth()
+    app = web.Application()
+    app.router.add_get("/api/v1/users/me", stub.users_me)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+
+    try:
+        elapsed = await load(per_request_session, requests, concurrency)
+        print(f"сессия на запрос: {requests / elapsed:>8.0f} req/s, соединений {len(stub.connections)}")
+
+        stub.connections.clear()
+        session = create_session(limit=concurrency)
+        elapsed = await load(pooled(session), requests, concurrency)
+        await session.close()
+        print(f"общая сессия:     {requests / elapsed:>8.0f} req/s, соединений {len(stub.connections)}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,59 @@
+"""Сравнение проверки JWT с локальным кэшем и без него.
+
+Запуск из каталога content_service:
+    python tests/benchmarks/bench_token_cache.py --tokens 100 --requests 100000
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from utils.token_cache import TokenCache  # noqa: E402
+
+SECRET = "secret-key"
+
+
+def make_tokens(count):
+    exp = time.time() + 3600
+    return [
+        jwt.encode({"sub": str(uuid.uuid4()), "type": "access", "exp": exp}, SECRET, "HS256")
+        for _ in range(count)
+    ]
+
+
+def verify(token):
+    return jwt.decode(token, SECRET, algorithms=["HS256"])
+
+
+def main(tokens_count, requests):
+    tokens = make_tokens(tokens_count)
+
+    started = time.perf_counter()
+    for i in range(requests):
+        verify(tokens[i % tokens_count])
+    plain = time.perf_counter() - started
+
+    cache = TokenCache(max_size=tokens_count)
+    started = time.perf_counter()
+    for i in range(requests):
+        token = tokens[i % tokens_count]
+        if cache.get(token) is None:
+            cache.set(token, verify(token))
+    cached = time.perf_counter() - started
+
+    print(f"jwt.decode:        {requests / plain:>12.0f} req/s")
+    print(f"TokenCache + decode: {requests / cached:>10.0f} req/s")
+    print(f"статистика кэша: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.tokens, args.requests)